@@ -0,0 +1,4 @@
+"""Benchmarks for the installers and the CLI.
+
+Run with `python -m benchmarks`, see `python -m benchmarks --help`.
+"""
@@ -0,0 +1,345 @@
+"""Run the benchmarks and compare the results between commits.
+
+Each benchmark runs against synthetic data in a temporary directory, so the
+suite works offline and never touches the real home directory. Results are
+saved to `.benchmarks/<commit>.json`, and `--compare <commit>` reports the
+change from the results of another commit.
+"""
+
+from __future__ import annotations
+
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from shutil import copytree, rmtree
+from tempfile import TemporaryDirectory
+from typing import TYPE_CHECKING
+
+import click
+from click.testing import CliRunner
+from result import Err, Result
+
+from benchmarks.data import SCALES, Scale, make_terminal_settings, make_tree, write_json
+from configurator.cli import cfg
+from configurator.hashing import HashCache, get_hash_cache
+from configurator.installer.config import InstallerConfig
+from configurator.installer.copy import CopyInstaller
+from configurator.installer.paths import get_path_cache
+from configurator.installer.setup import get_installer_names
+from configurator.installer.terminal import TerminalInstaller
+from configurator.manifest import get_source_manifest
+from configurator.settings import get_settings
+from configurator.snapshot import get_snapshot_store
+from configurator.template import get_template_cache
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    Setup = Callable[[], object]
+    Run = Callable[[], object]
+
+RESULTS_DIR = Path(__file__).parent.parent / ".benchmarks"
+
+
+@dataclass(frozen=True)
+class Case:
+    """A benchmark.
+
+    Attributes:
+        name: Name of the benchmark.
+        prepare: Creates the data for the benchmark in a work directory, and
+            returns the untimed setup run before each repeat and the timed run.
+    """
+
+    name: str
+    prepare: Callable[[Path, Scale], tuple[Setup, Run]]
+
+
+def _copy_installer(source: Path, target: Path, *, incremental: bool) -> CopyInstaller:
+
+    target.mkdir(parents=True, exist_ok=True)
+    config = InstallerConfig(
+        name="bench",
+        source=source,
+        target=target,
+        incremental=incremental,
+    )
+    return CopyInstaller(config, hash_cache=HashCache())
+
+
+def _expect_ok(result: Result[str, str]) -> None:
+    match result:
+        case Err(e):
+            raise RuntimeError(e)
+
+
+def prepare_copy_install_cold(work: Path, scale: Scale) -> tuple[Setup, Run]:
+    """Incremental install to an empty target."""
+    source, target = work / "source", work / "target"
+    make_tree(source, scale)
+
+    def setup() -> None:
+        rmtree(target, ignore_errors=True)
+
+    return setup, lambda: _expect_ok(
+        _copy_installer(source, target, incremental=True).install(),
+    )
+
+
+def prepare_copy_install_warm(work: Path, scale: Scale) -> tuple[Setup, Run]:
+    """Incremental install to a target that is already up to date."""
+    source, target = work / "source", work / "target"
+    make_tree(source, scale)
+    installer = _copy_installer(source, target, incremental=True)
+    _expect_ok(installer.install())
+
+    return lambda: None, lambda: _expect_ok(installer.install())
+
+
+def prepare_copy_install_full(work: Path, scale: Scale) -> tuple[Setup, Run]:
+    """Non-incremental install, copying every file with copytree."""
+    source, target = work / "source", work / "target"
+    make_tree(source, scale)
+    installer = _copy_installer(source, target, incremental=False)
+    _expect_ok(installer.install())
+
+    return lambda: None, lambda: _expect_ok(installer.install())
+
+
+def prepare_copy_write_to_source(work: Path, scale: Scale) -> tuple[Setup, Run]:
+    """Copy back a target where one in a hundred files was edited."""
+    source, target = work / "source", work / "target"
+    rel_paths = make_tree(source, scale)
+    installer = _copy_installer(source, target, incremental=True)
+    _expect_ok(installer.install())
+
+    def setup() -> None:
+        for rel_path in rel_paths[::100]:
+            with (target / rel_path).open("ab") as f:
+                f.write(f"# edited {time.time_ns()}\n".encode())
+
+    return setup, lambda: _expect_ok(installer.write_to_source())
+
+
+def prepare_terminal_install(work: Path, scale: Scale) -> tuple[Setup, Run]:
+    """Merge the Windows Terminal settings into a large target file."""
+    source, target = work / "source", work / "target"
+    source_data, target_data = make_terminal_settings(scale)
+    write_json(source / "settings.json", source_data)
+    write_json(target / "settings.json", target_data)
+    target_bytes = (target / "settings.json").read_bytes()
+
+    installer = TerminalInstaller(
+        InstallerConfig(name="terminal", source=source, target=target),
+    )
+
+    def setup() -> None:
+        (target / "settings.json").write_bytes(target_bytes)
+
+    return setup, lambda: _expect_ok(installer.install())
+
+
+def prepare_cli_install(work: Path, scale: Scale) -> tuple[Setup, Run]:
+    """Run `cfg install` for all configs of the platform, to an empty home."""
+    root, home = work / "hwconfig", work / "home"
+    tree = work / "tree"
+    make_tree(tree, scale)
+    for name in get_installer_names().unwrap_or([]):
+        copytree(tree, root / "data_repo" / name)
+
+    env = {"HOME": str(home), "USERPROFILE": str(home), "HWCONFIG_ROOT_DIR": str(root)}
+
+    def setup() -> None:
+        rmtree(home, ignore_errors=True)
+        rmtree(root / "cache", ignore_errors=True)
+        rmtree(root / "snapshots", ignore_errors=True)
+        home.mkdir()
+        for cached in (
+            get_settings,
+            get_hash_cache,
+            get_path_cache,
+            get_snapshot_store,
+            get_source_manifest,
+            get_template_cache,
+        ):
+            cached.cache_clear()
+
+    def run() -> None:
+        result = CliRunner(env=env).invoke(cfg, ["install"])
+        if result.exit_code != 0 or "failed" in result.output:
+            raise RuntimeError(result.output)
+
+    return setup, run
+
+
+CASES = [
+    Case("copy.install.cold", prepare_copy_install_cold),
+    Case("copy.install.warm", prepare_copy_install_warm),
+    Case("copy.install.copytree", prepare_copy_install_full),
+    Case("copy.write_to_source", prepare_copy_write_to_source),
+    Case("terminal.install", prepare_terminal_install),
+    Case("cli.install", prepare_cli_install),
+]
+
+
+def run_case(case: Case, scale: Scale, repeat: int) -> list[float]:
+    """Run a benchmark in a temporary directory.
+
+    Args:
+        case: The benchmark to run.
+        scale: The size of the generated data.
+        repeat: The number of timed runs.
+
+    Returns:
+        The wall time of each run, in seconds.
+    """
+    with TemporaryDirectory(prefix="cfg-bench-") as tmp:
+        setup, run = case.prepare(Path(tmp), scale)
+        times: list[float] = []
+
+        for _ in range(repeat):
+            setup()
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+
+    return times
+
+
+def git_commit() -> str:
+    """Get the short hash of the checked out commit, marked when the tree is dirty.
+
+    Returns:
+        The commit, or "unknown" outside a git repo.
+    """
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],  # noqa: S607
+            text=True,
+        ).strip()
+        dirty = subprocess.check_output(
+            ["git", "status", "--porcelain", "--untracked-files=no"],  # noqa: S607
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+    return f"{commit}-dirty" if dirty else commit
+
+
+def load_results(ref: str, scale: str) -> dict[str, dict[str, float]]:
+    """Load saved results by commit, or from a results file.
+
+    Args:
+        ref: A commit, e.g. "HEAD~1", or the path to a results file.
+        scale: The scale the results must have been run at.
+
+    Returns:
+        The saved results by benchmark name.
+
+    Raises:
+        click.ClickException: If no results are saved for the commit at the scale.
+    """
+    file = Path(ref)
+    if not file.is_file():
+        try:
+            commit = subprocess.check_output(  # noqa: S603
+                ["git", "rev-parse", "--short", ref],  # noqa: S607
+                text=True,
+            ).strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = ref
+        file = RESULTS_DIR / f"{commit}.json"
+
+    if not file.is_file():
+        msg = f"No saved results for {ref}, run the benchmarks on it with --save"
+        raise click.ClickException(msg)
+
+    data = json.loads(file.read_text(encoding="utf-8"))
+    if data["scale"] != scale:
+        msg = f"Results for {ref} were run at the {data['scale']} scale, not {scale}"
+        raise click.ClickException(msg)
+
+    return data["results"]
+
+
+@click.command()
+@click.option(
+    "--scale",
+    type=click.Choice(list(SCALES)),
+    default="default",
+    show_default=True,
+    help="Size of the generated data repos.",
+)
+@click.option("--repeat", "-r", default=5, show_default=True, help="Timed runs.")
+@click.option("--filter", "-k", "pattern", default="", help="Only run matching.")
+@click.option("--save", is_flag=True, help="Save the results for this commit.")
+@click.option("--compare", "ref", help="Compare with the results of a commit.")
+@click.option(
+    "--threshold",
+    default=10.0,
+    show_default=True,
+    help="Slowdown in percent reported as a regression by --compare.",
+)
+def main(  # noqa: PLR0913, PLR0917
+    scale: str,
+    repeat: int,
+    pattern: str,
+    save: bool,  # noqa: FBT001
+    ref: str | None,
+    threshold: float,
+) -> None:
+    """Benchmark the installers and the CLI on synthetic data repos."""
+    baseline = load_results(ref, scale) if ref else {}
+    results: dict[str, dict[str, float]] = {}
+    regressions: list[str] = []
+
+    for case in CASES:
+        if pattern not in case.name:
+            continue
+
+        times = run_case(case, SCALES[scale], repeat)
+        results[case.name] = {
+            "min": min(times),
+            "median": statistics.median(times),
+            "mean": statistics.fmean(times),
+        }
+
+        line = f"{case.name:<24} median {results[case.name]['median'] * 1e3:9.1f} ms"
+        line += f"  min {results[case.name]['min'] * 1e3:9.1f} ms"
+        if case.name in baseline:
+            before = baseline[case.name]["median"]
+            change = (results[case.name]["median"] - before) / before * 100
+            line += f"  {change:+6.1f}%"
+            if change > threshold:
+                regressions.append(case.name)
+                line = click.style(line, fg="red")
+        click.echo(line)
+
+    if save:
+        commit = git_commit()
+        RESULTS_DIR.mkdir(exist_ok=True)
+        data = {
+            "commit": commit,
+            "scale": scale,
+            "repeat": repeat,
+            "python": platform.python_version(),
+            "platform": sys.platform,
+            "results": results,
+        }
+        file = RESULTS_DIR / f"{commit}.json"
+        file.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        click.echo(f"Saved results to {file}")
+
+    if regressions:
+        click.echo(f"Regressions over {threshold}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
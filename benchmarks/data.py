@@ -0,0 +1,116 @@
+"""Synthetic data repos for the benchmarks."""
+from __future__ import annotations
+
+import json
+import random
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+@dataclass(frozen=True)
+class Scale:
+    """Size of the generated data.
+
+    Attributes:
+        files: Number of files in a generated config tree.
+        depth: Maximum depth of the directories in the tree.
+        file_size: Average size of a file in bytes.
+        schemes: Number of color schemes in the Windows Terminal settings.
+        profiles: Number of profiles in the Windows Terminal settings.
+    """
+
+    files: int
+    depth: int
+    file_size: int
+    schemes: int
+    profiles: int
+
+
+SCALES = {
+    "quick": Scale(files=500, depth=4, file_size=1024, schemes=200, profiles=50),
+    "default": Scale(files=5000, depth=8, file_size=2048, schemes=20000, profiles=500),
+}
+
+
+def make_tree(root: Path, scale: Scale, seed: int = 0) -> list[str]:
+    """Generate a config tree of text files.
+
+    Args:
+        root: The directory to generate the tree in.
+        scale: The size of the tree.
+        seed: Seed for the random file sizes and layout.
+
+    Returns:
+        The paths of the generated files, relative to `root`.
+    """
+    rng = random.Random(seed)  # noqa: S311
+    rel_paths: list[str] = []
+
+    for i in range(scale.files):
+        parts = [f"dir{rng.randrange(8)}" for _ in range(rng.randrange(scale.depth))]
+        rel_path = "/".join([*parts, f"file{i}.conf"])
+        size = rng.randrange(scale.file_size // 2, scale.file_size * 3 // 2)
+
+        path = root / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(f"# {rel_path}\n".encode().ljust(size, b"x"))
+        rel_paths.append(rel_path)
+
+    return rel_paths
+
+
+def _scheme(name: str, rng: random.Random) -> dict[str, str]:
+    colors = ["background", "foreground", "black", "red", "green", "yellow", "blue"]
+    return {"name": name, **{c: f"#{rng.randrange(1 << 24):06X}" for c in colors}}
+
+
+def make_terminal_settings(scale: Scale, seed: int = 0) -> tuple[Any, Any]:
+    """Generate Windows Terminal source and target settings.
+
+    The target has all schemes and many profiles, like a long used install,
+    and the source updates a tenth of the schemes and adds as many new ones.
+
+    Args:
+        scale: The number of schemes and profiles.
+        seed: Seed for the random colors.
+
+    Returns:
+        The source and target settings data.
+    """
+    rng = random.Random(seed)  # noqa: S311
+    target = {
+        "$schema": "https://aka.ms/terminal-profiles-schema",
+        "defaultProfile": "{00000000-0000-0000-0000-000000000000}",
+        "profiles": {
+            "defaults": {"font": {"face": "Cascadia Mono", "size": 12}},
+            "list": [
+                {"guid": f"{{{i:08d}-0000-0000-0000-000000000000}}", "name": f"P{i}"}
+                for i in range(scale.profiles)
+            ],
+        },
+        "schemes": [_scheme(f"Scheme {i}", rng) for i in range(scale.schemes)],
+    }
+    changed = scale.schemes // 10
+    source = {
+        "application": {"copyOnSelect": True, "alwaysShowTabs": True},
+        "profiles": {"defaults": {"font": {"face": "MesloLGM NF", "size": 16}}},
+        "schemes": [
+            _scheme(f"Scheme {i}", rng)
+            for i in range(scale.schemes - changed, scale.schemes + changed)
+        ],
+    }
+    return source, target
+
+
+def write_json(file: Path, data: Any) -> None:  # noqa: ANN401
+    """Write JSON data the way Windows Terminal does.
+
+    Args:
+        file: The file to write.
+        data: The data to write.
+    """
+    file.parent.mkdir(parents=True, exist_ok=True)
+    file.write_text(json.dumps(data, indent=4), encoding="utf-8")
@@ -1,13 +1,31 @@
 """configurator: A tool for managing config files."""
+from __future__ import annotations
+
+import json
+import sys
+import time
+from dataclasses import asdict
+from datetime import timedelta
+from pathlib import Path
 from shutil import rmtree
+from typing import TYPE_CHECKING
 
 import click
-from git import Repo
-from result import Err, Ok
+from result import Err, Ok, Result
 
-from configurator.installer.protocol import Installer
-from configurator.installer.setup import get_installers
-from configurator.settings import get_settings
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+    from configurator.fleet import RootResult
+    from configurator.installer.protocol import Installer
+    from configurator.installer.sync import DriftReport
+    from configurator.output import OutputFormat, RecordWriter
+    from configurator.repo import RepoStatus
+    from configurator.snapshot import Snapshot, SnapshotStore
+    from configurator.trace import TraceFormat
+
+# NOTE: GitPython, pydantic and the installer modules are imported inside the
+# commands that use them, so short commands and `--help` start quickly.
 
 # TODO: Test coverage (util module, terminal installer)
 # TODO: CLI Tests
@@ -22,41 +40,101 @@ def click_echo_success(string: str) -> None:
     click.echo(click.style(string, fg="green"))
 
 
-def click_echo_error(string: str) -> None:
+def click_echo_error(string: str, *, err: bool = False) -> None:
     """Error formatted `click.echo`.
 
     Args:
         string: The string to echo.
+        err: Echo to stderr instead of stdout.
     """
-    click.echo(click.style(string, fg="red"))
+    click.echo(click.style(string, fg="red"), err=err)
 
 
-def click_echo_warning(string: str) -> None:
+def click_echo_warning(string: str, *, err: bool = False) -> None:
     """Warning formatted `click.echo`.
 
     Args:
         string: The string to echo.
+        err: Echo to stderr instead of stdout.
     """
-    click.echo(click.style(string, fg="orange"))
+    click.echo(click.style(string, fg="yellow"), err=err)
+
+
+def output_option(func: Callable[..., None]) -> Callable[..., None]:
+    """Add the `--output` option for machine readable output to a command.
+
+    Args:
+        func: The command function, taking an `output` argument.
+
+    Returns:
+        The decorated command function.
+    """
+    return click.option(
+        "--output",
+        "-o",
+        type=click.Choice(["text", "json", "ndjson"]),
+        default="text",
+        show_default=True,
+        help="Print text, a JSON document when done, or a JSON record per line "
+        "as each installer finishes.",
+    )(func)
 
 
 @click.group()
-def cfg() -> None:
+@click.option(
+    "--profile",
+    type=click.Path(dir_okay=False, allow_dash=True, path_type=Path),
+    envvar="HWCONFIG_TRACE",
+    help="Write timing spans of the command to FILE, or to stderr for '-'.",
+)
+@click.option(
+    "--profile-format",
+    type=click.Choice(["jsonl", "chrome"]),
+    envvar="HWCONFIG_TRACE_FORMAT",
+    help="Format of the spans, defaults to chrome for .json files, else jsonl.",
+)
+@click.pass_context
+def cfg(
+    ctx: click.Context,
+    profile: Path | None,
+    profile_format: TraceFormat | None,
+) -> None:
     """configurator: A tool for managing config files."""
+    if profile is None:
+        return
+
+    from configurator import trace
+
+    tracer = trace.start()
+    file = None if str(profile) == "-" else profile
+
+    def write_trace() -> None:
+        trace.stop()
+        try:
+            tracer.write(file, profile_format)
+        except OSError as e:
+            click_echo_error(f"Failed to write profile: {e}")
+
+    # Resources are closed in reverse, so the root span ends before the write
+    ctx.call_on_close(write_trace)
+    ctx.with_resource(tracer.span(f"cfg {ctx.invoked_subcommand}"))
 
 
 @cfg.command("pull")
 def pull_data_repo_cmd() -> None:
     """Pull changes from the data repo."""
-    settings = get_settings()
+    from configurator.installer.setup import get_installer_names
+    from configurator.repo import pull_data_repo
+    from configurator.settings import get_settings
 
-    if settings.data_repo_dir.exists():
-        repo = Repo(settings.data_repo_dir)
-        repo.remotes.origin.pull()
-    else:
-        repo = Repo.clone_from(settings.data_repo_url, settings.data_repo_dir)
+    # Installers use the data repo directory named after the config
+    sparse_dirs = get_installer_names().unwrap_or([])
 
-    click_echo_success("Data repo synced.")
+    match pull_data_repo(get_settings(), sparse_dirs):
+        case Ok(_):
+            click_echo_success("Data repo synced.")
+        case Err(e):
+            click_echo_error(e)
 
 
 @cfg.command("push")
@@ -64,6 +142,11 @@ def pull_data_repo_cmd() -> None:
 @click.option("--dry-run", is_flag=True)
 def push_data_repo_cmd(message: str, dry_run: bool) -> None:  # noqa: FBT001
     """Commit and push changes to the data repo."""
+    from git import Repo
+
+    from configurator.repo import commit_and_push, get_repo_status
+    from configurator.settings import get_settings
+
     settings = get_settings()
 
     if not settings.data_repo_dir.exists():
@@ -72,17 +155,22 @@ def push_data_repo_cmd(message: str, dry_run: bool) -> None:  # noqa: FBT001
 
     repo = Repo(settings.data_repo_dir)
 
-    files: list[str] = [item.a_path for item in repo.index.diff(None)]  # type: ignore[partially-unknown-call]
-    files.extend(repo.untracked_files)
+    match get_repo_status(repo):
+        case Ok(v):
+            files = v.paths
+        case Err(e):
+            click_echo_error(e)
+            return
 
     if not files:
         click.echo("No changes to push.")
         return
 
     if not dry_run:
-        repo.index.add(files)  # type: ignore[partially-unknown-call]
-        repo.index.commit(message)
-        repo.remotes.origin.push()
+        match commit_and_push(repo, files, message):
+            case Err(e):
+                click_echo_error(e)
+                return
 
     click_echo_success("\nFiles committed and pushed to data repo:\n")
     for file in files:
@@ -91,51 +179,626 @@ def push_data_repo_cmd(message: str, dry_run: bool) -> None:  # noqa: FBT001
 
 
 @cfg.command("status")
-def status_cmd() -> None:
+@click.option("--short", "-s", "short", is_flag=True, help="Show one line per file.")
+@click.option("--json", "as_json", is_flag=True, help="Print the status as JSON.")
+def status_cmd(short: bool, as_json: bool) -> None:  # noqa: FBT001
     """Get the git status of the data repo."""
+    from git import Repo
+
+    from configurator.repo import get_repo_status
+    from configurator.settings import get_settings
+
     settings = get_settings()
 
     if not settings.data_repo_dir.exists():
         click_echo_warning("Data repo does not exist. Run `cgf pull` to create it.")
         return
 
-    repo = Repo(settings.data_repo_dir)
-    repo.git.status()
-    click.echo(repo.git.status())
+    match get_repo_status(Repo(settings.data_repo_dir)):
+        case Ok(v):
+            status = v
+        case Err(e):
+            click_echo_error(e)
+            return
+
+    if as_json:
+        click.echo(json.dumps(asdict(status), indent=2))
+    elif short:
+        for entry in status.entries:
+            click.echo(f"{entry.short} {entry.path}")
+    else:
+        _echo_repo_status(status)
+
+
+def _echo_repo_status(status: RepoStatus) -> None:
+    click.echo(f"On branch {status.branch or '(detached HEAD)'}")
+    if status.ahead or status.behind:
+        click.echo(f"Ahead {status.ahead}, behind {status.behind} commits")
+
+    if not status.entries:
+        click.echo("Nothing to commit, working tree clean")
+        return
+
+    for entry in status.entries:
+        path = entry.path
+        if entry.orig_path is not None:
+            path = f"{entry.orig_path} -> {entry.path}"
+        click.echo(f"   {entry.short} {path}")
 
 
 @cfg.command("list")
-def list_cmd() -> None:
-    """List available configs."""
-    match get_installers():
+@output_option
+@click.pass_context
+def list_cmd(ctx: click.Context, output: OutputFormat) -> None:
+    """List available configs.
+
+    Exits with 2 when the configs could not be listed.
+    """
+    from configurator.installer.names import get_config_names
+    from configurator.output import EXIT_ERROR, RecordWriter
+
+    match get_config_names():
         case Ok(v):
-            for installer in v:
-                click.echo(installer.config.name)
+            names = v
         case Err(e):
-            click_echo_error(f"Failed to list installers: {e}")
+            click_echo_error(f"Failed to list installers: {e}", err=output != "text")
+            ctx.exit(EXIT_ERROR)
+
+    if output == "text":
+        for name in names:
+            click.echo(name)
+        return
+
+    writer = RecordWriter(output, key="configs")
+    for name in names:
+        writer.add({"name": name})
+    writer.close()
 
 
 @cfg.command("install")
-def install_cmd() -> None:
-    """Install config files, copying from data repo to local paths."""
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of installers, or target roots, to install at the same time.",
+)
+@click.option(
+    "--root",
+    "roots",
+    multiple=True,
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+    help="Install to this directory instead of the home directory. Repeatable.",
+)
+@click.option(
+    "--roots-from",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="File with target roots to install to, one per line.",
+)
+@output_option
+@click.pass_context
+def install_cmd(
+    ctx: click.Context,
+    jobs: int,
+    roots: tuple[Path, ...],
+    roots_from: Path | None,
+    output: OutputFormat,
+) -> None:
+    """Install config files, copying from data repo to local paths.
+
+    Exits with 1 when any installer, or target root, failed and with 2 when
+    the installers could not be set up.
+    """
+    if roots or roots_from:
+        ctx.exit(_install_to_roots(jobs, roots, roots_from, output))
+
+    from configurator.installer.setup import get_installers
+    from configurator.output import EXIT_ERROR, EXIT_FAILED, RecordWriter
+    from configurator.settings import get_settings
+    from configurator.snapshot import get_snapshot_store
+
+    quiet = output != "text"
+
+    match get_installers():
+        case Ok(v):
+            installers = v
+        case Err(e):
+            click_echo_error(f"Failed to get installers: {e}", err=quiet)
+            ctx.exit(EXIT_ERROR)
+
+    store = get_snapshot_store()
+    snapshot = store.begin("install") if get_settings().snapshot_retention else None
+
+    failed = _run_and_report(
+        installers,
+        lambda i: i.install(snapshot=snapshot),
+        jobs=jobs,
+        writer=RecordWriter(output) if quiet else None,
+        on_ok=lambda _, message: click_echo_success(message),
+    )
+
+    if failed and not quiet:
+        names = ", ".join(failed)
+        click_echo_error(f"{len(failed)}/{len(installers)} installers failed: {names}")
+    if snapshot is not None:
+        _save_snapshot(store, snapshot, quiet=quiet)
+    if failed:
+        ctx.exit(EXIT_FAILED)
+
+
+def _run_and_report(
+    installers: list[Installer],
+    action: Callable[[Installer], Result[str, str]],
+    *,
+    jobs: int,
+    writer: RecordWriter | None,
+    on_ok: Callable[[Installer, str], None],
+) -> list[str]:
+    # Writes a record, or calls `on_ok` or echoes the error, for each installer
+    # and returns the names of the failed installers. Only ndjson records are
+    # written as the installers finish, all other output is in installer order.
+    from configurator.installer.run import run_installers
+
+    stream = writer is not None and writer.output == "ndjson"
+    durations: dict[int, float] = {}
+
+    def on_result(
+        installer: Installer,
+        result: Result[str, str],
+        duration: float,
+    ) -> None:
+        if stream:
+            _report_result(installer, result, duration, writer=writer, on_ok=on_ok)
+        else:
+            durations[id(installer)] = duration
+
+    results = run_installers(installers, action, jobs=jobs, on_result=on_result)
+
+    if not stream:
+        for installer, result in zip(installers, results, strict=True):
+            duration = durations[id(installer)]
+            _report_result(installer, result, duration, writer=writer, on_ok=on_ok)
+    if writer is not None:
+        writer.close()
+
+    return [
+        installer.config.name
+        for installer, result in zip(installers, results, strict=True)
+        if isinstance(result, Err)
+    ]
+
+
+def _report_result(
+    installer: Installer,
+    result: Result[str, str],
+    duration: float,
+    *,
+    writer: RecordWriter | None,
+    on_ok: Callable[[Installer, str], None],
+) -> None:
+    from configurator.output import InstallerRecord
+
+    if writer is not None:
+        writer.add(InstallerRecord.from_result(installer, result, duration))
+        return
+
+    match result:
+        case Ok(v):
+            on_ok(installer, v)
+        case Err(e):
+            click_echo_error(f"Error: {e}")
+
+
+@cfg.command("sync")
+@click.argument("configs", nargs=-1)
+@click.option(
+    "--from-local",
+    "from_local",
+    multiple=True,
+    help="Copy the local files of this config to the data repo and push them "
+    "before installing. Repeatable.",
+)
+@click.option("--message", "-m", help="Commit message for the local changes.")
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of installers to run at the same time.",
+)
+@click.pass_context
+def sync_cmd(
+    ctx: click.Context,
+    configs: tuple[str],
+    from_local: tuple[str],
+    message: str | None,
+    jobs: int,
+) -> None:
+    """Pull the data repo and install all configs, or only CONFIGS, in one run.
+
+    Target paths are resolved while the data repo is fetched, and local changes
+    are pushed while the configs are installed. Exits with 1 when any step
+    failed.
+    """
+    import asyncio
+
+    from configurator.pipeline import sync
+    from configurator.settings import get_settings
+    from configurator.snapshot import get_snapshot_store
+
+    settings = get_settings()
+    store = get_snapshot_store()
+    snapshot = store.begin("sync") if settings.snapshot_retention else None
+
+    def on_result(name: str, result: Result[str, str]) -> None:
+        match result:
+            case Ok(v):
+                click_echo_success(v)
+            case Err(e):
+                click_echo_error(f"{name}: {e}")
+
+    ok = asyncio.run(
+        sync(
+            settings,
+            configs or None,
+            from_local=from_local,
+            message=message,
+            jobs=jobs,
+            snapshot=snapshot,
+            on_result=on_result,
+        ),
+    )
+
+    if snapshot is not None:
+        _save_snapshot(store, snapshot)
+    if not ok:
+        ctx.exit(1)
+
+
+def _save_snapshot(
+    store: SnapshotStore,
+    snapshot: Snapshot,
+    *,
+    quiet: bool = False,
+) -> None:
+    # Quiet keeps stdout for the records of machine readable output
+    match snapshot.save():
+        case Ok(_) if snapshot.entries and not quiet:
+            click.echo(
+                f"Snapshot {snapshot.id} of {len(snapshot.entries)} files saved, "
+                "run `cfg rollback` to restore them.",
+            )
+        case Err(e):
+            click_echo_warning(e, err=quiet)
+            return
+
+    match store.gc():
+        case Err(e):
+            click_echo_warning(e, err=quiet)
+
+
+def _install_to_roots(
+    jobs: int,
+    roots: tuple[Path, ...],
+    roots_from: Path | None,
+    output: OutputFormat,
+) -> int:
+    from configurator.fleet import install_roots, read_roots_file
+    from configurator.output import EXIT_ERROR, EXIT_FAILED, EXIT_OK, RecordWriter
+
+    all_roots = list(roots)
+    if roots_from is not None:
+        match read_roots_file(roots_from):
+            case Ok(v):
+                all_roots.extend(v)
+            case Err(e):
+                click_echo_error(e, err=output != "text")
+                return EXIT_ERROR
+
+    if output == "text":
+        failed_roots = _echo_root_results(install_roots(all_roots, jobs=jobs))
+        click.echo(
+            f"\n{len(all_roots) - len(failed_roots)}/{len(all_roots)} roots installed",
+        )
+        return EXIT_FAILED if failed_roots else EXIT_OK
+
+    writer = RecordWriter(output, key="roots")
+    ok = True
+    for root_result in install_roots(all_roots, jobs=jobs):
+        writer.add(_root_record(root_result))
+        ok = ok and root_result.ok
+    writer.close()
+
+    return EXIT_OK if ok else EXIT_FAILED
+
+
+def _echo_root_results(root_results: Iterable[RootResult]) -> list[Path]:
+    failed_roots: list[Path] = []
+
+    for root_result in root_results:
+        if root_result.error is not None:
+            click_echo_error(f"{root_result.root}: {root_result.error}")
+            failed_roots.append(root_result.root)
+            continue
+
+        installed = len(root_result.results) - len(root_result.failed)
+        summary = (
+            f"{root_result.root}: {installed}/{len(root_result.results)} installed"
+        )
+        if root_result.ok:
+            click_echo_success(summary)
+            continue
+
+        click_echo_error(summary)
+        failed_roots.append(root_result.root)
+        for name, result in root_result.results:
+            if isinstance(result, Err):
+                click.echo(f"   {name}: {result.err_value}")
+
+    return failed_roots
+
+
+def _root_record(root_result: RootResult) -> dict[str, object]:
+    return {
+        "root": str(root_result.root),
+        "status": "ok" if root_result.ok else "error",
+        "installed": [n for n, r in root_result.results if isinstance(r, Ok)],
+        "failed": {
+            n: r.err_value for n, r in root_result.results if isinstance(r, Err)
+        },
+        "error": root_result.error,
+    }
+
+
+@cfg.command("check")
+@output_option
+@click.option("--json", "as_json", is_flag=True, help="Same as --output json.")
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help="Number of installers to check at the same time.",
+)
+@click.pass_context
+def check_cmd(
+    ctx: click.Context,
+    output: OutputFormat,
+    as_json: bool,  # noqa: FBT001
+    jobs: int,
+) -> None:
+    """Check which installed configs have drifted from the data repo.
+
+    Nothing is written to the installed configs. Exits with 1 when any config
+    has drifted, and with 2 when a config could not be checked.
+    """
+    from configurator.installer.run import run_installers
+    from configurator.installer.setup import get_installers
+    from configurator.output import EXIT_ERROR, EXIT_FAILED, RecordWriter
+
+    if as_json:
+        output = "json"
+
     match get_installers():
+        case Ok(v):
+            installers = v
+        case Err(e):
+            click_echo_error(f"Failed to get installers: {e}", err=output != "text")
+            ctx.exit(EXIT_ERROR)
+
+    writer = RecordWriter(output) if output != "text" else None
+    stream = writer is not None and writer.output == "ndjson"
+
+    def on_result(
+        installer: Installer,
+        result: Result[DriftReport, str],
+        _duration: float,
+    ) -> None:
+        if writer is not None and stream:
+            writer.add(_check_record(installer.config.name, result))
+
+    results = run_installers(
+        installers,
+        lambda i: i.check(),
+        jobs=jobs,
+        on_result=on_result,
+    )
+    records = [
+        _check_record(installer.config.name, result)
+        for installer, result in zip(installers, results, strict=True)
+    ]
+
+    if writer is None:
+        for installer, result in zip(installers, results, strict=True):
+            _echo_check_result(installer.config.name, result)
+    else:
+        _write_check_records(writer, records, streamed=stream)
+
+    statuses = {r["status"] for r in records}
+    if "error" in statuses:
+        ctx.exit(EXIT_ERROR)
+    if "drift" in statuses:
+        ctx.exit(EXIT_FAILED)
+
+
+def _write_check_records(
+    writer: RecordWriter,
+    records: list[dict[str, object]],
+    *,
+    streamed: bool,
+) -> None:
+    # The ndjson records were written as the installers finished
+    if not streamed:
+        for record in records:
+            writer.add(record)
+    writer.close()
+
+
+def _check_record(name: str, result: Result[DriftReport, str]) -> dict[str, object]:
+    match result:
+        case Ok(report):
+            status = "drift" if report.drifted else "ok"
+            return {"name": name, "status": status, **asdict(report)}
+        case Err(e):
+            return {"name": name, "status": "error", "error": e}
+
+    msg = f"Not a result: {result!r}"
+    raise TypeError(msg)
+
+
+def _echo_check_result(name: str, result: Result[DriftReport, str]) -> None:
+    match result:
+        case Ok(report) if not report.drifted:
+            click_echo_success(f"{name}: up to date")
+        case Ok(report):
+            click_echo_warning(f"{name}: {report}")
+            for label, paths in (
+                ("modified", report.modified),
+                ("missing", report.missing),
+                ("extra", report.extra),
+            ):
+                for path in paths:
+                    click.echo(f"   {label}: {path}")
+        case Err(e):
+            click_echo_error(f"{name}: {e}")
+
+
+@cfg.command("rollback")
+@click.option(
+    "--to",
+    "snapshot_id",
+    help="Roll back this snapshot and all later ones, instead of only the latest.",
+)
+@click.option("--list", "list_", is_flag=True, help="List the snapshots.")
+def rollback_cmd(snapshot_id: str | None, list_: bool) -> None:  # noqa: FBT001
+    """Restore the files changed by the latest installs."""
+    from configurator.snapshot import get_snapshot_store
+
+    store = get_snapshot_store()
+
+    if list_:
+        ids = store.list_ids()
+        if not ids:
+            click.echo("No snapshots.")
+        for i in ids:
+            match store.load(i):
+                case Ok(v):
+                    click.echo(f"{v.id} {v.label} ({len(v.entries)} files)")
+                case Err(e):
+                    click_echo_error(e)
+        return
+
+    match store.rollback(snapshot_id):
+        case Ok(v):
+            click_echo_success(f"Restored {len(v)} files:")
+            for path in v:
+                click.echo(f"   {path}")
+        case Err(e):
+            click_echo_error(f"Failed to roll back: {e}")
+
+
+@cfg.command("watch")
+@click.argument("configs", nargs=-1)
+@click.option("--poll", is_flag=True, help="Poll for changes instead of using inotify.")
+def watch_cmd(configs: tuple[str], poll: bool) -> None:  # noqa: FBT001
+    """Sync changed files between the data repo and local paths until stopped.
+
+    Watches all configs, or only the given CONFIGS.
+    """
+    from configurator.installer.setup import get_installers
+    from configurator.settings import get_settings
+    from configurator.watch import make_watcher, watch
+
+    settings = get_settings()
+
+    match get_installers(configs or None):
         case Ok(v):
             installers = v
         case Err(e):
             click_echo_error(f"Failed to get installers: {e}")
             return
 
-    for installer in installers:
-        match installer.install():
+    def on_result(name: str, result: Result[str, str]) -> None:
+        stamp = time.strftime("%H:%M:%S")
+        match result:
+            case Ok(v):
+                click_echo_success(f"[{stamp}] {v}")
+            case Err(e):
+                click_echo_error(f"[{stamp}] {name}: {e}")
+
+    try:
+        watcher = make_watcher(
+            "poll" if poll else settings.watch_backend,
+            settings.watch_poll_interval,
+        )
+    except OSError as e:
+        click_echo_error(f"Failed to watch for changes: {e}")
+        return
+
+    names = ", ".join(i.config.name for i in installers)
+    click.echo(f"Watching {names}, press Ctrl+C to stop.")
+
+    try:
+        watch(installers, watcher, on_result, debounce=settings.watch_debounce)
+    except KeyboardInterrupt:
+        click.echo("Stopped watching.")
+    except OSError as e:
+        click_echo_error(f"Failed to watch for changes: {e}")
+    finally:
+        watcher.close()
+
+
+@cfg.command("daemon")
+@click.option(
+    "--idle-timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    help="Stop after this many seconds without requests.",
+)
+@click.option("--stop", is_flag=True, help="Stop the running daemon.")
+@click.pass_context
+def daemon_cmd(ctx: click.Context, idle_timeout: float | None, stop: bool) -> None:  # noqa: FBT001
+    """Serve install, check and list from a process that keeps its state warm.
+
+    While the daemon runs, those commands are sent to it over a Unix socket in
+    the hwconfig root directory, and skip the startup of the CLI. Without it,
+    or with HWCONFIG_DAEMON=0, they run in-process. Exits with 1 when the
+    daemon could not be started or stopped.
+    """
+    from configurator.daemon import start_daemon, stop_daemon
+
+    if stop:
+        match stop_daemon():
             case Ok(v):
                 click_echo_success(v)
             case Err(e):
-                click_echo_error(f"Error: {e}")
+                click_echo_error(e)
+                ctx.exit(1)
+        return
+
+    match start_daemon(idle_timeout):
+        case Ok(v):
+            server = v
+        case Err(e):
+            click_echo_error(e)
+            ctx.exit(1)
+
+    click.echo(f"Daemon listening on {server.path}, press Ctrl+C to stop.")
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        click.echo("Daemon stopped.")
+    finally:
+        server.server_close()
 
 
 @cfg.command("uninstall")
 def uninstall_cmd() -> None:
     """Delete installed config files and the local data repo."""
+    from configurator.settings import get_settings
+
     try:
         settings = get_settings()
         rmtree(settings.data_repo_dir)
@@ -153,26 +816,172 @@ def uninstall_cmd() -> None:
 
 @cfg.command("from-local")
 @click.argument("configs", nargs=-1)
-def from_local_cmd(installers: list[Installer], configs: tuple[str]) -> None:
-    """Copy local config files to the data repo."""
-    match get_installers():
+@click.option("--all", "all_", is_flag=True, help="Copy the files of all configs.")
+@click.option(
+    "--dry-run",
+    is_flag=True,
+    help="Only show the files that would be copied to the data repo.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help="Number of configs to copy at the same time.",
+)
+@output_option
+@click.pass_context
+def from_local_cmd(  # noqa: PLR0913, PLR0917
+    ctx: click.Context,
+    configs: tuple[str],
+    all_: bool,  # noqa: FBT001
+    dry_run: bool,  # noqa: FBT001
+    jobs: int,
+    output: OutputFormat,
+) -> None:
+    """Copy the local files of CONFIGS, or of all configs, to the data repo.
+
+    Exits with 1 when the files of any config could not be copied, and with 2
+    when no configs were given or the installers could not be set up.
+    """
+    from configurator.installer.copy import CopyInstaller
+    from configurator.installer.setup import get_installer_names, resolve_installers
+    from configurator.output import EXIT_ERROR, EXIT_FAILED, RecordWriter
+
+    quiet = output != "text"
+    names = list(configs)
+    if all_:
+        names.extend(get_installer_names().unwrap_or([]))
+    if not names:
+        click_echo_warning("No configs given, pass config names or --all.", err=quiet)
+        ctx.exit(EXIT_ERROR)
+
+    match resolve_installers(names):
         case Ok(v):
-            installers = v
+            resolved = v
         case Err(e):
-            click_echo_error(f"Failed to get installers: {e}")
-            return
+            click_echo_error(f"Failed to get installers: {e}", err=quiet)
+            ctx.exit(EXIT_ERROR)
+
+    installers, failed = _split_resolved(resolved)
+    writer = RecordWriter(output) if quiet else None
+    pulled: list[str] = []
+
+    _report_setup_errors(failed, writer)
+
+    def on_ok(installer: Installer, message: str) -> None:
+        if isinstance(installer, CopyInstaller):
+            name = installer.config.name
+            pulled.extend(f"{name}/{p}" for p in installer.stats.paths)
+        else:
+            click_echo_success(message)
+
+    failed_installers = _run_and_report(
+        installers,
+        lambda i: i.write_to_source(dry_run=dry_run),
+        jobs=jobs,
+        writer=writer,
+        on_ok=on_ok,
+    )
+
+    if not quiet:
+        _echo_pulled_files(pulled, dry_run=dry_run)
+    if failed or failed_installers:
+        ctx.exit(EXIT_FAILED)
+
+
+def _report_setup_errors(failed: dict[str, str], writer: RecordWriter | None) -> None:
+    from configurator.output import InstallerRecord
+
+    for name, error in failed.items():
+        if writer is not None:
+            writer.add(InstallerRecord(name=name, status="error", message=error))
+        else:
+            click_echo_error(f"Failed to get installer: {error}")
+
+
+def _split_resolved(
+    resolved: dict[str, Result[Installer, str]],
+) -> tuple[list[Installer], dict[str, str]]:
+    installers: list[Installer] = []
+    failed: dict[str, str] = {}
+
+    for name, result in resolved.items():
+        match result:
+            case Ok(installer):
+                installers.append(installer)
+            case Err(e):
+                failed[name] = e
+
+    return installers, failed
 
-    for config in configs:
-        for installer in installers:
-            if installer.config.name == config:
-                match installer.write_to_source():
-                    case Ok(v):
-                        click_echo_success(v)
-                    case Err(e):
-                        click_echo_error(f"Error: {e}")
+
+def _echo_pulled_files(pulled: list[str], *, dry_run: bool) -> None:
+    verb = "Would copy" if dry_run else "Copied"
+    click_echo_success(f"{verb} {len(pulled)} files to the data repo:")
+    for path in sorted(pulled):
+        click.echo(f"   {path}")
+    if pulled and not dry_run:
+        click.echo('Run `cfg push "<message>"` to commit and push them.')
 
 
 @cfg.command("settings")
 def settings_cmd() -> None:
     """View the current settings."""
+    from configurator.settings import get_settings
+
     click.echo(get_settings().model_dump_json(indent=2))
+
+
+@cfg.group("cache")
+def cache_grp() -> None:
+    """Inspect and clear the cached config paths."""
+
+
+@cache_grp.command("show")
+def cache_show_cmd() -> None:
+    """Show the cached config paths."""
+    from configurator.installer.paths import get_path_cache
+
+    cache = get_path_cache()
+    items = cache.items()
+
+    if not items:
+        click.echo("No cached paths.")
+        return
+
+    now = time.time()
+    for key, path, resolved_at in items:
+        age = timedelta(seconds=int(now - resolved_at))
+        notes = [f"age {age}"]
+        if cache.is_expired(resolved_at):
+            notes.append("expired")
+        if not path.exists():
+            notes.append("missing")
+
+        click.echo(f"{key}: {path} ({', '.join(notes)})")
+
+
+@cache_grp.command("clear")
+@click.argument("keys", nargs=-1)
+def cache_clear_cmd(keys: tuple[str]) -> None:
+    """Clear the cached config paths, or only the given KEYS."""
+    from configurator.installer.paths import get_path_cache
+
+    match get_path_cache().clear(keys or None):
+        case Ok(_):
+            click_echo_success("Path cache cleared.")
+        case Err(e):
+            click_echo_error(f"Failed to clear path cache: {e}")
+
+
+def main() -> None:
+    """Run the `cfg` script, sending the command to the daemon if it is running."""
+    from configurator.daemon import run_in_daemon
+
+    code = run_in_daemon(sys.argv[1:])
+    if code is None:
+        cfg()
+    else:
+        sys.exit(code)
@@ -0,0 +1,426 @@
+"""Daemon serving CLI commands from a process that keeps its state warm.
+
+Every `cfg` invocation pays for starting the interpreter, importing pydantic,
+GitPython and the installers, loading the settings and resolving the target
+paths. Shell hooks and editor plugins call it many times a minute, so
+`cfg daemon` keeps a process around that has already paid for all of it, and
+serves `install`, `check` and `list` over a Unix socket in the hwconfig root
+directory.
+
+The `cfg` script first tries to send those commands to the daemon, and runs
+them in-process when the daemon is not running or `HWCONFIG_DAEMON` is set to
+0. The daemon runs the same click commands, in the environment and working
+directory of the client, and streams their output back as JSON lines:
+
+    {"args": ["install", "-o", "ndjson"], "env": {...}, "cwd": "/home/me", ...}
+    {"out": "..."}
+    {"err": "..."}
+    {"exit": 0}
+
+Requests are served one at a time. The settings, hash cache, path cache and
+snapshot store are kept between requests, and dropped when the `HWCONFIG_*`
+or `HOME` environment variables of a client differ from the last one. The
+caches loaded from files are also dropped when another process changed their
+files, e.g. `cfg cache clear` or `cfg rollback`, while the snapshot store reads
+its snapshots from disk on each use. The data repo may change between
+requests, so its manifest is loaded again for each request, from the manifest
+stored for HEAD.
+
+Only the standard library is imported at the top, so the client does not slow
+down the commands that end up running in-process.
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator, Mapping
+
+    from result import Result
+
+SOCKET_NAME = "daemon.sock"
+
+# Commands served by the daemon, the others always run in-process
+COMMANDS = frozenset({"install", "check", "list"})
+
+
+def get_socket_path() -> Path:
+    """Get the path of the daemon socket, without loading the settings.
+
+    Returns:
+        The socket path in the hwconfig root directory.
+    """
+    root_dir = os.environ.get("HWCONFIG_ROOT_DIR")
+    return (Path(root_dir) if root_dir else Path.home() / ".hwconfig") / SOCKET_NAME
+
+
+def _connect(path: Path) -> socket.socket | None:
+    if not hasattr(socket, "AF_UNIX") or not path.exists():
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(os.fspath(path))
+    except OSError:
+        # Left behind by a daemon that did not shut down cleanly
+        sock.close()
+        return None
+
+    return sock
+
+
+def _send(file: IO[bytes], frame: Mapping[str, object]) -> None:
+    file.write(json.dumps(frame, separators=(",", ":")).encode("utf-8") + b"\n")
+    file.flush()
+
+
+def run_in_daemon(
+    args: list[str],
+    stdout: IO[str] | None = None,
+    stderr: IO[str] | None = None,
+) -> int | None:
+    """Run a command in the daemon, if it is running and serves the command.
+
+    Args:
+        args: The command line arguments, without the program name.
+        stdout: Stream for the output of the command, defaults to stdout.
+        stderr: Stream for the messages of the command, defaults to stderr.
+
+    Returns:
+        The exit code of the command, or None if it was not run by the daemon
+        and should run in-process.
+    """
+    if not args or args[0] not in COMMANDS:
+        return None
+    if os.environ.get("HWCONFIG_DAEMON", "1").lower() in {"0", "false", "no"}:
+        return None
+
+    sock = _connect(get_socket_path())
+    if sock is None:
+        return None
+
+    stdout = stdout or sys.stdout
+    streams = {"out": stdout, "err": stderr or sys.stderr}
+    request = {
+        "args": args,
+        "env": dict(os.environ),
+        "cwd": os.fspath(Path.cwd()),
+        "color": stdout.isatty(),
+    }
+    received = False
+
+    with sock, sock.makefile("rwb") as file:
+        _send(file, request)
+        for line in file:
+            received = True
+            frame = json.loads(line)
+            if "exit" in frame:
+                return frame["exit"]
+            for key, stream in streams.items():
+                if key in frame:
+                    stream.write(frame[key])
+                    stream.flush()
+
+    if not received:
+        # The daemon went away before running the command
+        return None
+
+    streams["err"].write(
+        "The daemon closed the connection before the command finished\n",
+    )
+    return 1
+
+
+def stop_daemon() -> Result[str, str]:
+    """Ask the running daemon to shut down.
+
+    Returns:
+        A result containing a success message, or an error message.
+    """
+    from result import Err, Ok
+
+    sock = _connect(get_socket_path())
+    if sock is None:
+        return Err("The daemon is not running.")
+
+    with sock, sock.makefile("rwb") as file:
+        _send(file, {"stop": True})
+        file.readline()
+
+    return Ok("Daemon stopped.")
+
+
+class _FrameIO(io.RawIOBase):
+    # Binary stream sending each write as a frame, below a text wrapper
+    def __init__(self, file: IO[bytes], key: str) -> None:
+        self.file = file
+        self.key = key
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b: Any) -> int:  # noqa: ANN401
+        data = bytes(b)
+        if data:
+            _send(self.file, {self.key: data.decode("utf-8", errors="replace")})
+        return len(data)
+
+
+def _text_stream(file: IO[bytes], key: str) -> io.TextIOWrapper:
+    return io.TextIOWrapper(_FrameIO(file, key), encoding="utf-8", write_through=True)
+
+
+@contextmanager
+def _environ(env: Mapping[str, str]) -> Iterator[None]:
+    saved = dict(os.environ)
+    os.environ.clear()
+    os.environ.update(env)
+    try:
+        yield
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+
+
+@contextmanager
+def _cwd(path: str | None) -> Iterator[None]:
+    saved = Path.cwd()
+    if path is not None:
+        os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(saved)
+
+
+def _settings_env(env: Mapping[str, str]) -> dict[str, str]:
+    # The environment the warm state depends on
+    return {k: v for k, v in env.items() if k.startswith("HWCONFIG_") or k == "HOME"}
+
+
+def _file_caches() -> tuple[Any, ...]:
+    from configurator.hashing import get_hash_cache
+    from configurator.installer.paths import get_path_cache
+    from configurator.template import get_template_cache
+
+    # The template cache keeps the hash cache, so they are dropped together
+    return (get_hash_cache, get_path_cache, get_template_cache)
+
+
+def _cache_mtimes() -> dict[str, int | None]:
+    # Modification times of the files the loaded caches were read from
+    mtimes: dict[str, int | None] = {}
+    for cached in _file_caches():
+        if not cached.cache_info().currsize or (file := cached().file) is None:
+            continue
+        try:
+            mtimes[cached.__name__] = file.stat().st_mtime_ns
+        except OSError:
+            mtimes[cached.__name__] = None
+
+    return mtimes
+
+
+def _clear_state() -> None:
+    from configurator.manifest import get_source_manifest
+    from configurator.settings import get_settings
+    from configurator.snapshot import get_snapshot_store
+
+    for cached in (
+        get_settings,
+        get_snapshot_store,
+        get_source_manifest,
+        *_file_caches(),
+    ):
+        cached.cache_clear()
+
+
+def _warm_up() -> None:
+    from configurator.installer.setup import get_installers
+
+    # Loads the settings and manifest, and resolves and caches the target paths
+    get_installers()
+
+
+def _run_command(args: list[str], *, color: bool) -> int:
+    import click
+
+    from configurator.cli import cfg
+
+    try:
+        result = cfg.main(
+            args,
+            prog_name="cfg",
+            standalone_mode=False,
+            color=True if color else None,
+        )
+    except click.ClickException as e:
+        e.show()
+        return e.exit_code
+    except click.Abort:
+        click.echo("Aborted!", err=True)
+        return 1
+    except Exception as e:  # noqa: BLE001
+        # A failing command must not take down the daemon
+        click.echo(f"Unexpected error in the daemon: {e}", err=True)
+        return 1
+
+    return result if isinstance(result, int) else 0
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: DaemonServer
+
+    def handle(self) -> None:
+        request = json.loads(self.rfile.readline() or b"{}")
+        if request.get("stop"):
+            self.server.stopped = True
+            _send(self.wfile, {"exit": 0})
+            return
+
+        code = self.server.run(
+            request.get("args", []),
+            request.get("env", {}),
+            self.wfile,
+            cwd=request.get("cwd"),
+            color=bool(request.get("color")),
+        )
+        _send(self.wfile, {"exit": code})
+
+
+if hasattr(socket, "AF_UNIX"):
+
+    class DaemonServer(socketserver.UnixStreamServer):
+        """Server running the CLI commands sent to the daemon socket."""
+
+        def __init__(self, path: Path, idle_timeout: float | None = None) -> None:
+            """Bind the socket, only accessible by the current user.
+
+            Args:
+                path: Path of the socket.
+                idle_timeout: Seconds without requests after which `serve`
+                    returns, or None to serve until stopped.
+            """
+            path.parent.mkdir(parents=True, exist_ok=True)
+            super().__init__(os.fspath(path), _Handler)
+            path.chmod(0o600)
+            self.path = path
+            self.timeout = idle_timeout
+            self.stopped = False
+            self._env = _settings_env(os.environ)
+            self._cache_mtimes: dict[str, int | None] = {}
+
+        def handle_timeout(self) -> None:
+            """Stop serving after the idle timeout."""
+            self.stopped = True
+
+        def serve(self) -> None:
+            """Serve requests one at a time until stopped or idle."""
+            _warm_up()
+            while not self.stopped:
+                self.handle_request()
+
+        def run(
+            self,
+            args: list[str],
+            env: Mapping[str, str],
+            file: IO[bytes],
+            *,
+            cwd: str | None = None,
+            color: bool = False,
+        ) -> int:
+            """Run a command in the environment and directory of the client.
+
+            Args:
+                args: The command line arguments, without the program name.
+                env: The environment variables of the client.
+                file: The connection to stream the output of the command to.
+                cwd: The working directory of the client, relative paths in
+                    the arguments are resolved from it.
+                color: Keep the colors of the output, for a client on a tty.
+
+            Returns:
+                The exit code of the command.
+            """
+            from configurator.manifest import get_source_manifest
+            from configurator.template import get_template_cache, get_template_variables
+
+            if not args or args[0] not in COMMANDS:
+                _send(file, {"err": f"The daemon does not serve: {' '.join(args)}\n"})
+                return 2
+            if cwd is not None and not Path(cwd).is_dir():
+                _send(file, {"err": f"The working directory is gone: {cwd}\n"})
+                return 2
+
+            stdout = _text_stream(file, "out")
+            stderr = _text_stream(file, "err")
+
+            with (
+                _environ(env),
+                _cwd(cwd),
+                redirect_stdout(stdout),
+                redirect_stderr(stderr),
+            ):
+                if _settings_env(env) != self._env:
+                    _clear_state()
+                    self._env = _settings_env(env)
+                elif self._caches_changed():
+                    for cached in _file_caches():
+                        cached.cache_clear()
+
+                get_source_manifest.cache_clear()
+                if get_template_cache.cache_info().currsize:
+                    get_template_cache().variables = get_template_variables()
+
+                code = _run_command(args, color=color)
+                # Saved by the command itself, which is no reason to reload
+                self._cache_mtimes = _cache_mtimes()
+                return code
+
+        def _caches_changed(self) -> bool:
+            mtimes = _cache_mtimes()
+            return any(
+                mtimes.get(name) != mtime for name, mtime in self._cache_mtimes.items()
+            )
+
+        def server_close(self) -> None:
+            """Close and remove the socket."""
+            super().server_close()
+            self.path.unlink(missing_ok=True)
+
+
+def start_daemon(idle_timeout: float | None = None) -> Result[DaemonServer, str]:
+    """Bind the daemon socket, unless a daemon is already running.
+
+    Args:
+        idle_timeout: Seconds without requests after which the daemon stops,
+            or None to run until stopped.
+
+    Returns:
+        A result containing the server, or an error message.
+    """
+    from result import Err, Ok
+
+    if not hasattr(socket, "AF_UNIX"):
+        return Err("The daemon needs Unix sockets, which this platform lacks.")
+
+    path = get_socket_path()
+    sock = _connect(path)
+    if sock is not None:
+        sock.close()
+        return Err(f"A daemon is already running on {path}")
+
+    path.unlink(missing_ok=True)
+    try:
+        return Ok(DaemonServer(path, idle_timeout))
+    except OSError as e:
+        return Err(f"Failed to start the daemon on {path}: {e}")
@@ -0,0 +1,211 @@
+"""Functions for installing configs to many target roots at once.
+
+A target root is a directory used in place of the home directory, e.g. the
+home directory of a container or a chroot. The data repo is listed once, and
+the installs are spread over a pool of processes.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from result import Err, Ok, Result
+
+from configurator.hashing import HashCache
+from configurator.installer.copy import CopyInstaller
+from configurator.installer.setup import get_installer_names, resolve_installers
+from configurator.installer.sync import SourceFile, iter_files
+from configurator.manifest import get_source_manifest
+from configurator.settings import get_settings
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+SourceManifests = dict[str, list[SourceFile]]
+
+# Source manifests of a worker process, sent once when the process starts
+_worker_manifests: SourceManifests = {}
+
+
+@dataclass
+class RootResult:
+    """Results of installing the configs to a target root.
+
+    Attributes:
+        root: The target root.
+        results: The name and install result of each config.
+        error: Error that stopped the root from being installed to, if any,
+            e.g. an unsupported platform or the worker process dying.
+    """
+
+    root: Path
+    results: list[tuple[str, Result[str, str]]] = field(default_factory=list)
+    error: str | None = None
+
+    @property
+    def failed(self) -> list[str]:
+        """Names of the configs that failed to install."""
+        return [name for name, result in self.results if isinstance(result, Err)]
+
+    @property
+    def ok(self) -> bool:
+        """True if all configs were installed."""
+        return self.error is None and not self.failed
+
+
+def read_roots_file(file: Path) -> Result[list[Path], str]:
+    """Read target roots from a file, one path per line.
+
+    Empty lines and lines starting with "#" are ignored.
+
+    Args:
+        file: The file to read.
+
+    Returns:
+        A result containing the target roots, or an error message.
+    """
+    try:
+        lines = file.read_text(encoding="utf-8").splitlines()
+    except OSError as e:
+        return Err(f"Failed to read roots file: {e}")
+
+    return Ok(
+        [
+            Path(line.strip())
+            for line in lines
+            if line.strip() and not line.lstrip().startswith("#")
+        ],
+    )
+
+
+def build_source_manifests() -> Result[SourceManifests, str]:
+    """List the source files of each config in the data repo.
+
+    The files are read from the manifest of the data repo when there is one,
+    otherwise the config directories are walked.
+
+    Returns:
+        A result containing the source files by config name, or an error message.
+    """
+    match get_installer_names():
+        case Ok(v):
+            names = v
+        case Err(e):
+            return Err(e)
+
+    data_repo_dir = get_settings().data_repo_dir
+    source_manifest = get_source_manifest()
+    manifests: SourceManifests = {}
+
+    try:
+        for name in names:
+            source = data_repo_dir / name
+            if source_manifest and (files := source_manifest.source_files(source)):
+                manifests[name] = files
+            elif source.is_dir():
+                manifests[name] = list(iter_files(source))
+    except OSError as e:
+        return Err(f"Failed to list data repo: {e}")
+
+    return Ok(manifests)
+
+
+def install_root(root: Path, manifests: SourceManifests) -> RootResult:
+    """Install the configs with a source manifest to a target root.
+
+    A config whose installer can not be set up for the root fails on its own,
+    the others are still installed.
+
+    Args:
+        root: The target root, used as the home directory.
+        manifests: The source files by config name.
+
+    Returns:
+        The results of installing to the root.
+    """
+    match resolve_installers(manifests, home=root, source_manifest=False):
+        case Ok(v):
+            installers = v
+        case Err(e):
+            return RootResult(root=root, error=e)
+
+    # Digests of other roots are of no use to this one, keep them in memory
+    hash_cache = HashCache()
+    result = RootResult(root=root)
+
+    for name, setup_result in installers.items():
+        if isinstance(setup_result, Err):
+            result.results.append((name, setup_result))
+            continue
+
+        installer = setup_result.ok_value
+        if isinstance(installer, CopyInstaller):
+            installer.hash_cache = hash_cache
+            installer.source_files = manifests[installer.config.name]
+
+        try:
+            install_result = installer.install()
+        except Exception as e:  # noqa: BLE001
+            install_result = Err(f"Unexpected error: {e}")
+
+        result.results.append((installer.config.name, install_result))
+
+    return result
+
+
+def install_roots(roots: Iterable[Path], jobs: int = 1) -> Iterator[RootResult]:
+    """Install the configs to many target roots using a pool of processes.
+
+    Args:
+        roots: The target roots.
+        jobs: The maximum number of roots to install to at the same time.
+
+    Yields:
+        The results of each root, as soon as the root is done, so with more
+        than one job not necessarily in the order of `roots`.
+    """
+    roots = list(roots)
+
+    match build_source_manifests():
+        case Ok(v):
+            manifests = v
+        case Err(e):
+            for root in roots:
+                yield RootResult(root=root, error=e)
+            return
+
+    if jobs <= 1 or len(roots) <= 1:
+        for root in roots:
+            yield install_root(root, manifests)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=min(jobs, len(roots)),
+        initializer=_init_worker,
+        initargs=(manifests,),
+    ) as executor:
+        futures = {
+            executor.submit(_install_root_in_worker, root): root for root in roots
+        }
+        for future in as_completed(futures):
+            try:
+                root_result = future.result()
+            except Exception as e:  # noqa: BLE001
+                # E.g. BrokenProcessPool, when a worker process died
+                root_result = RootResult(
+                    root=futures[future],
+                    error=f"Unexpected error: {e!r}",
+                )
+            yield root_result
+
+
+def _init_worker(manifests: SourceManifests) -> None:
+    global _worker_manifests  # noqa: PLW0603
+    _worker_manifests = manifests
+
+
+def _install_root_in_worker(root: Path) -> RootResult:
+    return install_root(root, _worker_manifests)
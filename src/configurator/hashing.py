@@ -0,0 +1,143 @@
+"""File content hashing with a persisted digest cache."""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from functools import lru_cache
+from threading import Lock
+from typing import TYPE_CHECKING
+
+from result import Err, Ok, Result
+
+from configurator.settings import get_settings
+from configurator.util import dump_json_atomic
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+CACHE_VERSION = 2
+CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: Path) -> str:
+    """Compute the content digest of a file.
+
+    The digest is the git blob object ID of the content, so files in the data
+    repo can be compared by the IDs git already has, without hashing them.
+
+    Args:
+        path: The file to hash.
+
+    Returns:
+        The hex digest of the file content.
+    """
+    with path.open("rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        digest = hashlib.sha1(f"blob {size}\0".encode(), usedforsecurity=False)
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+class HashCache:
+    """Cache of file digests, validated against the size and mtime of the file.
+
+    Entries are keyed by absolute path, so a file is only re-hashed when its
+    size or modification time has changed since it was last seen.
+    """
+
+    def __init__(self, file: Path | None = None) -> None:
+        """Initialize the cache, loading any entries persisted to `file`.
+
+        Args:
+            file: The file the cache is persisted to, or None for an in-memory cache.
+        """
+        self.file = file
+        self._entries: dict[str, tuple[int, int, str]] = {}
+        self._dirty = False
+        self._lock = Lock()
+
+        if file is not None:
+            self._load(file)
+
+    def _load(self, file: Path) -> None:
+        try:
+            with file.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if data.get("version") != CACHE_VERSION:
+            return
+
+        self._entries = {k: tuple(v) for k, v in data["entries"].items()}
+
+    def digest(self, path: Path, stat: os.stat_result | None = None) -> str:
+        """Get the content digest of a file, hashing it only if the cache is stale.
+
+        Args:
+            path: The file to get the digest for.
+            stat: The stat result of the file, if already known.
+
+        Returns:
+            The hex digest of the file content.
+        """
+        stat = stat or path.stat()
+        key = os.fspath(path.absolute())
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+
+        digest = hash_file(path)
+        with self._lock:
+            self._entries[key] = (stat.st_size, stat.st_mtime_ns, digest)
+            self._dirty = True
+
+        return digest
+
+    def seed(self, path: Path, size: int, mtime_ns: int, digest: str) -> None:
+        """Add a digest that is already known, e.g. from the data repo manifest.
+
+        Args:
+            path: The file the digest is for.
+            size: The size of the file.
+            mtime_ns: The modification time of the file in nanoseconds.
+            digest: The digest of the file content.
+        """
+        key = os.fspath(path.absolute())
+        entry = (size, mtime_ns, digest)
+
+        with self._lock:
+            if self._entries.get(key) != entry:
+                self._entries[key] = entry
+                self._dirty = True
+
+    def save(self) -> Result[None, str]:
+        """Persist the cache to its file, if it has changed since it was loaded.
+
+        Returns:
+            A result containing None, or an error message.
+        """
+        if self.file is None or not self._dirty:
+            return Ok(None)
+
+        with self._lock:
+            data = {"version": CACHE_VERSION, "entries": self._entries}
+            match dump_json_atomic(self.file, data):
+                case Err(e):
+                    return Err(f"Failed to save hash cache: {e}")
+                case Ok(_):
+                    self._dirty = False
+
+        return Ok(None)
+
+
+@lru_cache(maxsize=1)
+def get_hash_cache() -> HashCache:
+    """Get the hash cache persisted in the settings cache directory."""
+    return HashCache(get_settings().cache_dir / "hashes.json")
@@ -1,10 +1,70 @@
 """Module containing the installer config model."""
-from pydantic import BaseModel, DirectoryPath
+from __future__ import annotations
+
+from pathlib import Path  # noqa: TC003  # resolved by pydantic at runtime
+from typing import Literal
+
+from pydantic import BaseModel, DirectoryPath, model_validator
+
+
+class MergeRule(BaseModel):
+    """Rule for merging part of a source JSON document into a target document.
+
+    Paths are JSON pointers (RFC 6901), e.g. "/profiles/defaults", where the
+    empty string refers to the whole document.
+
+    Attributes:
+        path: Path of the value in the target document.
+        source_path: Path of the value in the source document, defaults to `path`.
+        strategy: How the source value is merged into the target value.
+            "replace" replaces the target value with the source value,
+            "keyed_list" merges two lists of objects by the value of `key` and
+            "shallow" sets the top level keys of the source object on the target.
+        key: The key identifying the objects of a "keyed_list" merge.
+    """
+
+    path: str
+    source_path: str | None = None
+    strategy: Literal["replace", "keyed_list", "shallow"]
+    key: str | None = None
+
+    @model_validator(mode="after")
+    def _check_key(self) -> MergeRule:
+        if self.strategy == "keyed_list" and self.key is None:
+            msg = "A keyed_list merge rule requires a key"
+            raise ValueError(msg)
+
+        return self
 
 
 class InstallerConfig(BaseModel):
-    """Installer config model."""
+    """Installer config model.
+
+    Attributes:
+        name: Name of the config.
+        source: Directory in the data repo containing the config files.
+        target: Directory the config files are installed to, created by the
+            install when it does not exist yet.
+        incremental: Only copy files that differ from the target when installing.
+        strategy: How files are placed in the target when installing. "copy"
+            copies the files, "hardlink" and "symlink" link them to the source
+            and "reflink" clones them on file systems with copy-on-write
+            support. Links fall back to copying when they can not be made.
+        include: Glob patterns of the source files to manage, relative to the
+            source directory. Empty to manage all files.
+        exclude: Glob patterns of the source files and directories not to
+            manage, in addition to the patterns in a `.cfgignore` file in the
+            source directory. See `configurator.installer.filters`.
+        merge_file: Name of the JSON file merged by JSON merge installers.
+        merge_rules: Rules for the parts of `merge_file` that are managed.
+    """
 
     name: str
     source: DirectoryPath
-    target: DirectoryPath
+    target: Path
+    incremental: bool = False
+    strategy: Literal["copy", "hardlink", "symlink", "reflink"] = "copy"
+    include: list[str] = []
+    exclude: list[str] = []
+    merge_file: str = "settings.json"
+    merge_rules: list[MergeRule] = []
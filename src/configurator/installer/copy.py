@@ -1,59 +1,383 @@
 """Module containing the copy installer."""
 from __future__ import annotations
 
+from functools import cached_property
+from pathlib import Path
 from shutil import copy2, copytree
 from typing import TYPE_CHECKING
 
 from result import Err, Ok, Result
 
+from configurator import trace
+from configurator.installer.filters import PathFilter, load_path_filter
+from configurator.installer.sync import (
+    DriftReport,
+    SyncStats,
+    check_tree,
+    is_unchanged,
+    iter_files,
+    stat_files,
+    sync_back,
+    sync_tree,
+)
+from configurator.template import TEMPLATE_SUFFIX, TemplateError
 from configurator.util import ensure_dir
 
 if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+    from configurator.hashing import HashCache
     from configurator.installer.config import InstallerConfig
+    from configurator.installer.sync import SourceFile
+    from configurator.snapshot import Snapshot
+    from configurator.template import TemplateCache
 
 
 class CopyInstaller:
     """Installer for config files that only need to be copied to a target location."""
 
-    def __init__(self, config: InstallerConfig) -> None:
+    def __init__(
+        self,
+        config: InstallerConfig,
+        hash_cache: HashCache | None = None,
+        source_files: list[SourceFile] | None = None,
+        template_cache: TemplateCache | None = None,
+    ) -> None:
         """Initialize the installer.
 
         Args:
             config: Config for the installer.
+            hash_cache: Cache of file digests used by incremental installs.
+            source_files: Precomputed listing of the source files, used by
+                incremental installs, drift checks and copying back to the
+                source instead of walking the source directory.
+            template_cache: Cache used to render the `.tmpl` source files to
+                the target without the suffix. Without it, templates are
+                copied like any other file.
         """
         self.config: InstallerConfig = config
+        self.hash_cache = hash_cache
+        self.source_files = source_files
+        self.template_cache = template_cache
+        self.stats = SyncStats()
+
+    @cached_property
+    def path_filter(self) -> PathFilter:
+        """The rules for the managed files, compiled on first use."""
+        return load_path_filter(
+            self.config.source,
+            self.config.include,
+            self.config.exclude,
+        )
+
+    def _source_files(self) -> Iterable[SourceFile]:
+        if self.source_files is not None:
+            return self.path_filter.filter(self.source_files)
+
+        return iter_files(self.config.source, self.path_filter)
+
+    def _split_templates(
+        self,
+        source_files: Iterable[SourceFile],
+    ) -> tuple[list[SourceFile], list[SourceFile]]:
+        files: list[SourceFile] = []
+        templates: list[SourceFile] = []
+
+        for source_file in source_files:
+            rel_path, _, source_stat = source_file
+            is_template = rel_path.endswith(TEMPLATE_SUFFIX) and source_stat is not None
+            if self.template_cache is not None and is_template:
+                templates.append(source_file)
+            else:
+                files.append(source_file)
+
+        return files, templates
+
+    def _render_templates(
+        self,
+        templates: Iterable[SourceFile],
+        before_write: Callable[[Path], None] | None = None,
+    ) -> Result[None, str]:
+        if self.template_cache is None:
+            return Ok(None)
+
+        try:
+            for rel_path, source_path, source_stat in templates:
+                out_path = rel_path.removesuffix(TEMPLATE_SUFFIX)
+                target_path = self.config.target / out_path
+                ensure_dir(target_path.parent)
+
+                match self.template_cache.install(
+                    source_path,
+                    source_stat,
+                    target_path,
+                    before_write,
+                ):
+                    case Ok(True):
+                        self.stats.add_copied(out_path, target_path.stat().st_size)
+                    case Ok(False):
+                        self.stats.unchanged += 1
+                    case Err(e):
+                        return Err(f"Failed to install {self.config.name} config: {e}")
+        finally:
+            # The records only save work on the next run, failing to save is fine
+            self.template_cache.save()
+
+        return Ok(None)
+
+    def _ignore(self, directory: str, names: list[str]) -> list[str]:
+        # Called by copytree for each directory, see `shutil.ignore_patterns`
+        rel_dir = Path(directory).relative_to(self.config.source).as_posix()
+        prefix = "" if rel_dir == "." else f"{rel_dir}/"
+        ignored: list[str] = []
+
+        for name in names:
+            rel_path = prefix + name
+            if Path(directory, name).is_dir():
+                if self.path_filter.prunes_dir(rel_path):
+                    ignored.append(name)
+            elif not self.path_filter.matches_file(rel_path) or (
+                self.template_cache is not None and name.endswith(TEMPLATE_SUFFIX)
+            ):
+                ignored.append(name)
+
+        return ignored
 
-    def install(self) -> Result[str, str]:
+    def install(self, *, snapshot: Snapshot | None = None) -> Result[str, str]:
         """Install the config source files to the target directory.
 
+        Files are linked instead of copied when the config has a link strategy,
+        which also makes the install incremental.
+
+        Args:
+            snapshot: Snapshot to record the target files in before they are
+                overwritten.
+
         Returns:
             A result containing a success message or an error message.
         """
+        if self.config.incremental or self.config.strategy != "copy":
+            return self._install_incremental(snapshot)
+
+        self.stats = SyncStats()
+
+        def copy_function(src: str, dst: str) -> object:
+            source_stat = Path(src).stat()
+            # Only record the files the copy changes
+            if snapshot is not None and not is_unchanged(
+                Path(src),
+                source_stat,
+                Path(dst),
+                self.hash_cache,
+            ):
+                snapshot.add(Path(dst))
+            copied = copy2(src, dst)
+            rel_path = Path(dst).relative_to(self.config.target).as_posix()
+            self.stats.add_copied(rel_path, source_stat.st_size)
+            return copied
+
         try:
             ensure_dir(self.config.target)
-            copytree(src=self.config.source, dst=self.config.target, dirs_exist_ok=True)
+            copytree(
+                src=self.config.source,
+                dst=self.config.target,
+                copy_function=copy_function,
+                ignore=self._ignore,
+                dirs_exist_ok=True,
+            )
+            if self.template_cache is not None:
+                _, templates = self._split_templates(self._source_files())
+                rendered = self._render_templates(
+                    templates,
+                    snapshot.add if snapshot is not None else None,
+                )
         except OSError as e:
             return Err(f"Failed to install {self.config.name} config: {e}")
+        finally:
+            self._trace_stats()
+
+        if self.template_cache is not None and isinstance(rendered, Err):
+            return rendered
 
         return Ok(f"Installed {self.config.name} config files")
 
-    def write_to_source(self) -> Result[str, str]:
+    def _install_incremental(self, snapshot: Snapshot | None) -> Result[str, str]:
+        before_write = snapshot.add if snapshot is not None else None
+
+        try:
+            files, templates = self._split_templates(self._source_files())
+            self.stats = sync_tree(
+                source=self.config.source,
+                target=self.config.target,
+                hash_cache=self.hash_cache,
+                source_files=files,
+                strategy=self.config.strategy,
+                before_write=before_write,
+            )
+            rendered = self._render_templates(templates, before_write)
+        except OSError as e:
+            return Err(f"Failed to install {self.config.name} config: {e}")
+        finally:
+            self._trace_stats()
+            # The cache only saves work on the next run, failing to save it is fine
+            if self.hash_cache is not None:
+                self.hash_cache.save()
+
+        if isinstance(rendered, Err):
+            return rendered
+
+        return Ok(f"Installed {self.config.name} config files ({self.stats})")
+
+    def write_to_source(self, *, dry_run: bool = False) -> Result[str, str]:
         """Write the target config files back to the source directory.
 
+        Only the target files that are tracked in the source directory, are
+        managed by the include and exclude rules and differ from the source are
+        copied, so files linked to the source are never copied back.
+
+        Args:
+            dry_run: Only report the files that would be copied.
+
         Returns:
             A result containing a success message or an error message.
         """
-        source_names = [p.name for p in self.config.source.glob("*")]
-        target_paths = list(self.config.target.glob("*"))
-        matched_paths = [p for p in target_paths if p.name in source_names]
-
         try:
-            for p in matched_paths:
-                if p.is_dir():
-                    copytree(src=p, dst=self.config.source / p.name, dirs_exist_ok=True)
-                else:
-                    copy2(src=p, dst=self.config.source / p.name)
+            self.stats = sync_back(
+                source=self.config.source,
+                target=self.config.target,
+                hash_cache=self.hash_cache,
+                # Rendered files can not be written back to their templates
+                source_files=self._split_templates(self._source_files())[0],
+                dry_run=dry_run,
+            )
         except OSError as e:
             return Err(f"Failed to write to {self.config.name} source: {e}")
+        finally:
+            self._trace_stats()
+            if self.hash_cache is not None:
+                self.hash_cache.save()
+
+        if dry_run:
+            lines = [f"{self.config.name} files that would be copied to source:"]
+            lines.extend(f"   {p}" for p in self.stats.paths)
+            return Ok("\n".join(lines))
+
+        return Ok(f"Copied {self.config.name} target files to source ({self.stats})")
+
+    def sync_paths(
+        self,
+        rel_paths: Iterable[str],
+        *,
+        to_source: bool = False,
+    ) -> Result[str, str]:
+        """Sync only the given files, e.g. the files changed since the last sync.
+
+        Args:
+            rel_paths: Paths of the files relative to the source and target
+                directories, in posix form.
+            to_source: Copy the target files back to the source instead of
+                installing the source files.
+
+        Returns:
+            A result containing a success message or an error message.
+        """
+        managed = [p for p in rel_paths if self.path_filter(p)]
+
+        try:
+            if to_source:
+                self.stats = sync_back(
+                    source=self.config.source,
+                    target=self.config.target,
+                    hash_cache=self.hash_cache,
+                    source_files=stat_files(self.config.source, managed),
+                )
+            else:
+                files, templates = self._split_templates(
+                    stat_files(self.config.source, managed),
+                )
+                self.stats = sync_tree(
+                    source=self.config.source,
+                    target=self.config.target,
+                    hash_cache=self.hash_cache,
+                    source_files=files,
+                    strategy=self.config.strategy,
+                )
+                match self._render_templates(templates):
+                    case Err(e):
+                        return Err(e)
+        except OSError as e:
+            return Err(f"Failed to sync {self.config.name} config: {e}")
+        finally:
+            self._trace_stats()
+            if self.hash_cache is not None:
+                self.hash_cache.save()
+
+        direction = "to source" if to_source else "to target"
+        return Ok(f"Synced {self.config.name} files {direction} ({self.stats})")
+
+    def _trace_stats(self) -> None:
+        trace.set_attrs(
+            files=self.stats.copied,
+            bytes=self.stats.bytes_copied,
+            unchanged=self.stats.unchanged,
+            skipped=self.stats.skipped,
+        )
+
+    def check(self) -> Result[DriftReport, str]:
+        """Compare the installed config files with the source files.
+
+        Returns:
+            A result containing the differences, or an error message.
+        """
+        try:
+            files, templates = self._split_templates(self._source_files())
+            report = check_tree(
+                source=self.config.source,
+                target=self.config.target,
+                hash_cache=self.hash_cache,
+                source_files=files,
+                path_filter=self.path_filter,
+            )
+            self._check_templates(templates, report)
+        except (OSError, TemplateError) as e:
+            return Err(f"Failed to check {self.config.name} config: {e}")
+        finally:
+            if self.hash_cache is not None:
+                self.hash_cache.save()
+
+        return Ok(report)
+
+    def _check_templates(
+        self,
+        templates: Iterable[SourceFile],
+        report: DriftReport,
+    ) -> None:
+        if self.template_cache is None:
+            return
+
+        for rel_path, source_path, source_stat in templates:
+            out_path = rel_path.removesuffix(TEMPLATE_SUFFIX)
+            target_path = self.config.target / out_path
+
+            # The rendered file is not in the source, but it is not extra
+            if out_path in report.extra:
+                report.extra.remove(out_path)
+
+            if not target_path.is_file():
+                report.missing.append(out_path)
+            elif (
+                not self.template_cache.is_current(
+                    source_path,
+                    source_stat,
+                    target_path,
+                )
+                and self.template_cache.render(
+                    source_path,
+                    source_stat,
+                )
+                != target_path.read_bytes()
+            ):
+                report.modified.append(out_path)
 
-        return Ok(f"Copied {self.config.name} target file to source")
+        report.modified.sort()
+        report.missing.sort()
@@ -0,0 +1,203 @@
+"""Include and exclude rules for the files managed by an installer.
+
+Rules are glob patterns matched against paths relative to the source
+directory, with a subset of the `.gitignore` syntax:
+
+- `*` and `?` match within a path segment, `**` matches any number of them
+- a pattern with a `/` before its end is anchored to the source directory,
+  otherwise it matches at any depth, e.g. `*.swp` or `__pycache__`
+- a pattern ending with `/` only matches directories
+- negated patterns, starting with `!`, are not supported
+
+Exclude rules are read from the installer config and from a `.cfgignore` file
+in the source directory, one pattern per line. An excluded directory is pruned
+from the walk, so nothing under it is listed. When there are include rules,
+only the files matching one of them, or under a directory matching one of
+them, are managed, e.g. `functions/` includes all files in `functions`.
+
+All patterns of a kind are compiled into a single regular expression, so
+matching a path costs one regex match however many rules there are.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from pathlib import Path
+
+    from configurator.installer.sync import SourceFile
+
+IGNORE_FILE = ".cfgignore"
+
+
+def _translate(pattern: str) -> str:
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+    parts: list[str] = []
+    i = 0
+
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            parts.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and (end := pattern.find("]", i + 2)) != -1:
+            body = pattern[i + 1 : end].replace("\\", "\\\\")
+            parts.append(f"[^{body[1:]}]" if body[0] == "!" else f"[{body}]")
+            i = end + 1
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+
+    regex = "".join(parts)
+    return regex if anchored else f"(?:.*/)?{regex}"
+
+
+def _compile(
+    patterns: Iterable[str],
+    *,
+    subtree: bool = False,
+) -> re.Pattern[str] | None:
+    regexes = [_translate(p) for p in patterns]
+    if not regexes:
+        return None
+
+    # Matching a parent directory also matches everything under it
+    suffix = "(?:/.*)?" if subtree else ""
+    regex = "|".join(f"(?:{r})" for r in regexes)
+    return re.compile(f"(?:{regex}){suffix}", re.DOTALL)
+
+
+def read_ignore_file(file: Path) -> list[str]:
+    """Read the exclude patterns of an ignore file.
+
+    Empty lines and lines starting with "#" are ignored.
+
+    Args:
+        file: The ignore file to read.
+
+    Returns:
+        The patterns, or an empty list if the file does not exist.
+    """
+    try:
+        lines = file.read_text(encoding="utf-8").splitlines()
+    except FileNotFoundError:
+        return []
+
+    return [
+        line.strip()
+        for line in lines
+        if line.strip() and not line.lstrip().startswith("#")
+    ]
+
+
+class PathFilter:
+    """Compiled include and exclude rules."""
+
+    def __init__(
+        self,
+        include: Iterable[str] = (),
+        exclude: Iterable[str] = (),
+    ) -> None:
+        """Compile the rules.
+
+        Args:
+            include: Patterns of the files, or directories, to manage, or
+                empty for all files.
+            exclude: Patterns of the files and directories not to manage.
+        """
+        exclude = list(exclude)
+        self._include = _compile((p.rstrip("/") for p in include), subtree=True)
+        self._exclude_files = _compile(p for p in exclude if not p.endswith("/"))
+        self._exclude_dirs = _compile(p.rstrip("/") for p in exclude)
+        self._pruned: dict[str, bool] = {}
+
+    def prunes_dir(self, rel_dir: str) -> bool:
+        """Check if a directory is excluded, without checking its parents.
+
+        Args:
+            rel_dir: Path of the directory relative to the source, in posix form.
+
+        Returns:
+            True if nothing under the directory is managed.
+        """
+        return self._exclude_dirs is not None and bool(
+            self._exclude_dirs.fullmatch(rel_dir),
+        )
+
+    def matches_file(self, rel_path: str) -> bool:
+        """Check if a file is managed, without checking its parent directories.
+
+        Args:
+            rel_path: Path of the file relative to the source, in posix form.
+
+        Returns:
+            True if the file is managed.
+        """
+        if self._exclude_files is not None and self._exclude_files.fullmatch(rel_path):
+            return False
+
+        return self._include is None or bool(self._include.fullmatch(rel_path))
+
+    def _in_pruned_dir(self, rel_path: str) -> bool:
+        parent, _, _ = rel_path.rpartition("/")
+        if not parent:
+            return False
+
+        if parent not in self._pruned:
+            pruned = self._in_pruned_dir(parent) or self.prunes_dir(parent)
+            self._pruned[parent] = pruned
+
+        return self._pruned[parent]
+
+    def __call__(self, rel_path: str) -> bool:
+        """Check if a file is managed, including its parent directories.
+
+        Args:
+            rel_path: Path of the file relative to the source, in posix form.
+
+        Returns:
+            True if the file is managed.
+        """
+        return self.matches_file(rel_path) and not self._in_pruned_dir(rel_path)
+
+    def filter(self, source_files: Iterable[SourceFile]) -> list[SourceFile]:
+        """Keep the managed files of a listing, e.g. from the data repo manifest.
+
+        Args:
+            source_files: The listed files.
+
+        Returns:
+            The managed files.
+        """
+        return [f for f in source_files if self(f[0])]
+
+
+def load_path_filter(
+    source: Path,
+    include: Iterable[str] = (),
+    exclude: Iterable[str] = (),
+) -> PathFilter:
+    """Compile the rules of a source directory and its installer config.
+
+    Args:
+        source: The source directory, which may contain an ignore file.
+        include: Include patterns from the installer config.
+        exclude: Exclude patterns from the installer config.
+
+    Returns:
+        The compiled rules, always excluding the ignore file itself.
+    """
+    exclude = [f"/{IGNORE_FILE}", *exclude, *read_ignore_file(source / IGNORE_FILE)]
+    return PathFilter(include, exclude)
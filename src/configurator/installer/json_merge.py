@@ -0,0 +1,193 @@
+"""Module containing the JSON merge installer."""
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING, Any
+
+from result import Err, Ok, Result
+
+from configurator import trace
+from configurator.installer.merge import MergePlan, compile_merge_plan
+from configurator.installer.sync import DriftReport, SyncStats
+from configurator.template import TEMPLATE_SUFFIX, TemplateError
+from configurator.util import get_json_data_from_file, write_bytes_if_changed
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from configurator.installer.config import InstallerConfig
+    from configurator.snapshot import Snapshot
+    from configurator.template import TemplateCache
+
+
+class JsonMergeInstaller:
+    """Installer for JSON config files that are only partly managed.
+
+    Apps like VS Code or Flow Launcher keep system specific settings in the same
+    file as the settings we would like to share. The merge rules of the config
+    describe which parts of the source file are written to the target file,
+    leaving everything else in the target file as it is.
+    """
+
+    def __init__(
+        self,
+        config: InstallerConfig,
+        plan: MergePlan | None = None,
+        template_cache: TemplateCache | None = None,
+    ) -> None:
+        """Initialize the installer.
+
+        Args:
+            config: Config for the installer.
+            plan: Compiled merge plan, defaults to compiling the config merge rules.
+            template_cache: Cache used to render the source file from a `.tmpl`
+                template when the source file itself does not exist.
+        """
+        self.config: InstallerConfig = config
+        self.plan = plan or compile_merge_plan(config.merge_rules)
+        self.template_cache = template_cache
+        self.stats = SyncStats()
+
+    def _get_source_settings_file(self) -> Result[Path, str]:
+        source_file = self.config.source / self.config.merge_file
+        if source_file.exists():
+            return Ok(source_file)
+
+        template_file = source_file.with_name(source_file.name + TEMPLATE_SUFFIX)
+        if self.template_cache is not None and template_file.exists():
+            return Ok(template_file)
+
+        return Err(f"Could not find source file at {source_file}")
+
+    def _get_source_json_data(self, source_file: Path) -> Result[dict[Any, Any], str]:
+        if self.template_cache is None or source_file.suffix != TEMPLATE_SUFFIX:
+            return get_json_data_from_file(file=source_file)
+
+        try:
+            data = json.loads(self.template_cache.render(source_file))
+        except (OSError, TemplateError, ValueError) as e:
+            return Err(f"Failed to render {source_file.name}: {e}")
+
+        return Ok(data)
+
+    def _get_target_settings_file(self) -> Result[Path, str]:
+        return Ok(self.config.target / self.config.merge_file)
+
+    def _get_target_json_data(self, target_file: Path) -> Result[dict[Any, Any], str]:
+        if not target_file.exists():
+            return Ok({})
+
+        return get_json_data_from_file(file=target_file)
+
+    def _merge_source_data_into_target(
+        self,
+        source_data: dict[Any, Any],
+        target_data: dict[Any, Any],
+    ) -> Result[dict[Any, Any], str]:
+        try:
+            return Ok(self.plan.apply(source_data, target_data))
+        except (TypeError, ValueError) as e:
+            return Err(f"Failed to merge {self.config.name} config: {e}")
+
+    def _write_target_data_to_file(
+        self,
+        data: bytes,
+        target_file: Path,
+        snapshot: Snapshot | None = None,
+    ) -> Result[str, str]:
+        # Apps tend to reload their settings whenever the file is written,
+        # so the file is only replaced when the merged data differs from it.
+        before_write = snapshot.add if snapshot is not None else None
+        match write_bytes_if_changed(target_file, data, before_write):
+            case Ok(True):
+                self.stats.add_copied(self.config.merge_file, len(data))
+                trace.set_attrs(files=1, bytes=len(data))
+                return Ok(f"Data written to {self.config.name} config file")
+            case Ok(False):
+                self.stats.unchanged += 1
+                trace.set_attrs(files=0, bytes=0, unchanged=1)
+                return Ok(f"{self.config.name} config file already up to date")
+            case Err(e):
+                return Err(f"Failed to write to {self.config.name} config file: {e}")
+
+        return Err("Unknown error occurred")
+
+    def _get_merged_data(self) -> Result[tuple[bytes, Path], str]:
+        match self._get_source_settings_file(), self._get_target_settings_file():
+            case (Ok(source_val), Ok(target_val)):
+                source_file = source_val
+                target_file = target_val
+            case (Err(e), _) | (_, Err(e)):
+                return Err(e)
+
+        source_data_result = self._get_source_json_data(source_file)
+        target_data_result = self._get_target_json_data(target_file=target_file)
+
+        match source_data_result, target_data_result:
+            case (Err(e), _):
+                return Err(f"Could not read source file: {e}")
+            case (_, Err(e)):
+                return Err(f"Could not read destination file: {e}")
+            case (Ok(source_data), Ok(target_data)):
+                merge_result = self._merge_source_data_into_target(
+                    source_data,
+                    target_data,
+                )
+
+        match merge_result:
+            case Ok(merged_data):
+                data = (json.dumps(merged_data, indent=4) + "\n").encode("utf-8")
+                return Ok((data, target_file))
+            case Err(e):
+                return Err(e)
+
+        return Err("Unknown error occurred")
+
+    def install(self, *, snapshot: Snapshot | None = None) -> Result[str, str]:
+        """Install the config data by merging the source file into the target file.
+
+        Args:
+            snapshot: Snapshot to record the target file in before it is changed.
+
+        Returns:
+            A result containing a success message or an error message.
+        """
+        self.stats = SyncStats()
+
+        match self._get_merged_data():
+            case Ok((data, target_file)):
+                return self._write_target_data_to_file(data, target_file, snapshot)
+            case Err(e):
+                return Err(e)
+
+        return Err("Unknown error occurred")
+
+    def check(self) -> Result[DriftReport, str]:
+        """Compare the target file with the result of merging in the source file.
+
+        Returns:
+            A result containing the differences, or an error message.
+        """
+        match self._get_merged_data():
+            case Ok((data, target_file)):
+                report = DriftReport()
+                if not target_file.exists():
+                    report.missing.append(self.config.merge_file)
+                elif target_file.read_bytes() != data:
+                    report.modified.append(self.config.merge_file)
+                return Ok(report)
+            case Err(e):
+                return Err(e)
+
+        return Err("Unknown error occurred")
+
+    def write_to_source(self, *, dry_run: bool = False) -> Result[str, str]:  # noqa: ARG002
+        """Write the target config files back to the source directory.
+
+        Args:
+            dry_run: Only report the files that would be copied.
+
+        Returns:
+            A result containing a success message or an error message.
+        """
+        return Err(f"{self.config.name} config does not support writing to source.")
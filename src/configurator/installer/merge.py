@@ -0,0 +1,189 @@
+"""Functions for merging JSON config data."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import partial
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+    from configurator.installer.config import MergeRule
+
+
+def merge_keyed_list(
+    target: list[dict[Any, Any]],
+    source: list[dict[Any, Any]],
+    key: str,
+) -> list[dict[Any, Any]]:
+    """Merge two lists of objects, matching the objects by the value of `key`.
+
+    Target objects with a key found in the source are replaced in place by the
+    source object, keeping the order of the target list. Source objects with new
+    keys are appended in source order, and target objects without the key are
+    kept as they are. Both lists are only walked once.
+
+    Args:
+        target: The list to merge into.
+        source: The list with the objects to add or replace.
+        key: The key identifying an object, e.g. "name".
+
+    Returns:
+        The merged list.
+    """
+    source_index = {item[key]: item for item in source}
+    merged: list[dict[Any, Any]] = []
+    replaced: set[Any] = set()
+
+    for item in target:
+        item_key = item.get(key)
+        if item_key not in source_index:
+            merged.append(item)
+        elif item_key not in replaced:
+            # Duplicates of a replaced object in the target are dropped
+            merged.append(source_index[item_key])
+            replaced.add(item_key)
+
+    merged.extend(v for k, v in source_index.items() if k not in replaced)
+    return merged
+
+
+def _merge_keyed(target: Any, source: Any, key: str) -> Any:  # noqa: ANN401
+    return merge_keyed_list(target if isinstance(target, list) else [], source, key)
+
+
+def _merge_replace(_target: Any, source: Any) -> Any:  # noqa: ANN401
+    return source
+
+
+def _merge_shallow(target: Any, source: Any) -> Any:  # noqa: ANN401
+    if not isinstance(target, dict):
+        return dict(source)
+
+    target.update(source)
+    return target
+
+
+def parse_pointer(pointer: str) -> tuple[str, ...]:
+    """Parse a JSON pointer into its keys.
+
+    Args:
+        pointer: A JSON pointer, e.g. "/profiles/defaults".
+
+    Raises:
+        ValueError: If the pointer is not empty and does not start with "/".
+
+    Returns:
+        The keys of the pointer, e.g. ("profiles", "defaults").
+    """
+    if not pointer:
+        return ()
+    if not pointer.startswith("/"):
+        msg = f"Invalid JSON pointer: {pointer!r}"
+        raise ValueError(msg)
+
+    return tuple(
+        key.replace("~1", "/").replace("~0", "~") for key in pointer[1:].split("/")
+    )
+
+
+@dataclass(frozen=True)
+class MergeStep:
+    """A compiled merge rule.
+
+    Attributes:
+        source_keys: Keys leading to the source value.
+        target_keys: Keys leading to the target value.
+        merge: Function merging the source value into the target value.
+    """
+
+    source_keys: tuple[str, ...]
+    target_keys: tuple[str, ...]
+    merge: Callable[[Any, Any], Any]
+
+
+@dataclass(frozen=True)
+class MergePlan:
+    """Merge rules compiled into the steps needed to apply them.
+
+    Applying the plan only walks the keys leading to the managed values, so the
+    cost of a merge is proportional to the managed parts of the documents.
+    """
+
+    steps: tuple[MergeStep, ...]
+
+    def apply(self, source: dict[Any, Any], target: dict[Any, Any]) -> dict[Any, Any]:
+        """Merge the managed parts of the source document into the target document.
+
+        Rules whose source value does not exist are skipped, and missing objects
+        leading to a target value are created.
+
+        Args:
+            source: The source document.
+            target: The target document, updated in place.
+
+        Raises:
+            TypeError: If a path leads through a value that is not an object.
+
+        Returns:
+            The merged target document.
+        """
+        for step in self.steps:
+            value: Any = source
+            for key in step.source_keys:
+                if not isinstance(value, dict) or key not in value:
+                    break
+                value = value[key]
+            else:
+                target = self._apply_step(step, value, target)
+
+        return target
+
+    @staticmethod
+    def _apply_step(
+        step: MergeStep,
+        value: Any,  # noqa: ANN401
+        target: dict[Any, Any],
+    ) -> dict[Any, Any]:
+        if not step.target_keys:
+            return step.merge(target, value)
+
+        parent: Any = target
+        for key in step.target_keys[:-1]:
+            parent = parent.setdefault(key, {})
+            if not isinstance(parent, dict):
+                msg = f"Can not merge into {key!r}, it is not an object"
+                raise TypeError(msg)
+
+        last_key = step.target_keys[-1]
+        parent[last_key] = step.merge(parent.get(last_key), value)
+        return target
+
+
+def compile_merge_plan(rules: Iterable[MergeRule]) -> MergePlan:
+    """Compile merge rules into a merge plan.
+
+    Args:
+        rules: The merge rules.
+
+    Returns:
+        The merge plan.
+    """
+    steps: list[MergeStep] = []
+
+    for rule in rules:
+        match rule.strategy:
+            case "replace":
+                merge = _merge_replace
+            case "shallow":
+                merge = _merge_shallow
+            case "keyed_list":
+                merge = partial(_merge_keyed, key=rule.key)
+
+        target_keys = parse_pointer(rule.path)
+        source_keys = (
+            target_keys if rule.source_path is None else parse_pointer(rule.source_path)
+        )
+        steps.append(MergeStep(source_keys, target_keys, merge))
+
+    return MergePlan(tuple(steps))
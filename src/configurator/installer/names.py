@@ -0,0 +1,28 @@
+"""Names of the configs available on each platform.
+
+Kept apart from the installer setup, so listing the configs imports neither
+the installers nor their pydantic config models.
+"""
+
+from __future__ import annotations
+
+from result import Err, Ok, Result
+
+from configurator.util import in_linux, in_windows
+
+WINDOWS_CONFIGS = ("powershell", "terminal", "flow")
+LINUX_CONFIGS = ("fish", "hyper")
+
+
+def get_config_names() -> Result[list[str], str]:
+    """Get the names of the configs available on the current platform.
+
+    Returns:
+        A result containing the config names or an error message.
+    """
+    if in_windows():
+        return Ok(list(WINDOWS_CONFIGS))
+    if in_linux():
+        return Ok(list(LINUX_CONFIGS))
+
+    return Err("Unsupported platform.")
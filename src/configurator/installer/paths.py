@@ -1,25 +1,238 @@
 """Module for getting paths to config files and directories."""
+from __future__ import annotations
+
+import json
+import time
+from functools import lru_cache, wraps
 from pathlib import Path
 from subprocess import CalledProcessError, check_output
+from threading import Lock
+from typing import TYPE_CHECKING
 
 from result import Err, Ok, Result
 
+from configurator import trace
+from configurator.settings import get_settings
+from configurator.util import dump_json_atomic
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+    PathResolver = Callable[[], Result[Path, str]]
+    PathProbe = Callable[[Path | None], Result[Path, str]]
+
+PATH_CACHE_VERSION = 1
+
+
+class PathCache:
+    """Persisted cache of resolved config directories.
+
+    Resolving some config directories means spawning a subprocess or globbing
+    for versioned app directories. The resolved paths are cached by key, and an
+    entry is invalidated when it is older than the TTL or the cached path no
+    longer exists.
+    """
+
+    def __init__(self, file: Path | None = None, ttl: float | None = None) -> None:
+        """Initialize the cache, loading any entries persisted to `file`.
+
+        Args:
+            file: The file the cache is persisted to, or None for an in-memory cache.
+            ttl: Seconds a cached path stays valid, or None to never expire.
+        """
+        self.file = file
+        self.ttl = ttl
+        self._entries: dict[str, dict[str, str | float]] = {}
+        self._lock = Lock()
+
+        if file is not None:
+            self._load(file)
+
+    def _load(self, file: Path) -> None:
+        try:
+            with file.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if data.get("version") == PATH_CACHE_VERSION:
+            self._entries = data["entries"]
+
+    def _save(self) -> Result[Path, str]:
+        if self.file is None:
+            return Ok(Path())
+
+        data = {"version": PATH_CACHE_VERSION, "entries": self._entries}
+        return dump_json_atomic(self.file, data)
+
+    def is_expired(self, resolved_at: float) -> bool:
+        """Check if an entry resolved at the given time has outlived the TTL.
+
+        Args:
+            resolved_at: Timestamp of when the entry was resolved.
+
+        Returns:
+            True if the entry has expired.
+        """
+        return self.ttl is not None and time.time() - resolved_at >= self.ttl
+
+    def items(self) -> list[tuple[str, Path, float]]:
+        """Get all cached entries, including expired or missing ones.
+
+        Returns:
+            The key, path and resolved timestamp of each entry.
+        """
+        with self._lock:
+            return [
+                (key, Path(str(e["path"])), float(e["resolved_at"]))
+                for key, e in sorted(self._entries.items())
+            ]
+
+    def get(self, key: str) -> Path | None:
+        """Get a cached path, invalidating the entry if it is expired or missing.
+
+        Args:
+            key: The cache key.
+
+        Returns:
+            The cached path, or None if there is no valid entry for the key.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+        if entry is None:
+            return None
+
+        path = Path(str(entry["path"]))
+        if self.is_expired(float(entry["resolved_at"])) or not path.exists():
+            self.invalidate(key)
+            return None
+
+        return path
+
+    def set(self, key: str, path: Path) -> None:
+        """Cache a resolved path.
+
+        Args:
+            key: The cache key.
+            path: The resolved path.
+        """
+        with self._lock:
+            self._entries[key] = {"path": str(path), "resolved_at": time.time()}
+            self._save()
 
-def get_powershell_config_dir() -> Result[Path, str]:
+    def invalidate(self, key: str) -> None:
+        """Remove a cached path.
+
+        Args:
+            key: The cache key.
+        """
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._save()
+
+    def clear(self, keys: Iterable[str] | None = None) -> Result[Path, str]:
+        """Remove cached paths.
+
+        Args:
+            keys: The keys to remove, or None to remove all entries.
+
+        Returns:
+            A result containing the path of the cache file, or an error message.
+        """
+        with self._lock:
+            if keys is None:
+                self._entries.clear()
+            else:
+                for key in keys:
+                    self._entries.pop(key, None)
+
+            return self._save()
+
+    def resolve(
+        self,
+        key: str,
+        resolver: PathResolver,
+    ) -> Result[Path, str]:
+        """Get a cached path, or resolve and cache it.
+
+        Args:
+            key: The cache key.
+            resolver: Function resolving the path when it is not cached.
+
+        Returns:
+            A result containing the path, or an error message.
+        """
+        if (path := self.get(key)) is not None:
+            trace.set_attrs(cached=True)
+            return Ok(path)
+
+        trace.set_attrs(cached=False)
+        result = resolver()
+        match result:
+            case Ok(v) if v.exists():
+                self.set(key, v)
+
+        return result
+
+
+@lru_cache(maxsize=1)
+def get_path_cache() -> PathCache:
+    """Get the path cache persisted in the settings cache directory."""
+    settings = get_settings()
+    return PathCache(settings.cache_dir / "paths.json", ttl=settings.path_cache_ttl)
+
+
+def cached_path(key: str) -> Callable[[PathProbe], PathProbe]:
+    """Decorate a path probe so the resolved path is cached under `key`.
+
+    Only the paths for the current user are cached, probes for another home
+    directory are always resolved.
+
+    Args:
+        key: The key the resolved path is cached under.
+
+    Returns:
+        The decorator.
+    """
+
+    def decorator(probe: PathProbe) -> PathProbe:
+        @wraps(probe)
+        def wrapper(home: Path | None = None) -> Result[Path, str]:
+            with trace.span("path.resolve", key=key):
+                if home is not None:
+                    return probe(home)
+
+                return get_path_cache().resolve(key, lambda: probe(None))
+
+        return wrapper
+
+    return decorator
+
+
+@cached_path("powershell")
+def get_powershell_config_dir(home: Path | None = None) -> Result[Path, str]:
     """Get the path to the PowerShell config directory.
 
+    Args:
+        home: Home directory of the user, defaults to asking PowerShell for the
+            documents directory of the current user.
+
     Returns:
         A result containing the path to the directory, or an error message.
     """
-    try:
-        documents_dir = check_output(
-            args=["powershell.exe", "[Environment]::GetFolderPath('MyDocuments')"],
-            encoding="utf-8",
-            shell=True,
-        ).splitlines()[0]
+    if home is not None:
+        documents_dir = home / "Documents"
+    else:
+        try:
+            documents_dir = check_output(
+                args=["powershell.exe", "[Environment]::GetFolderPath('MyDocuments')"],
+                encoding="utf-8",
+                shell=True,
+            ).splitlines()[0]
 
-    except CalledProcessError as e:
-        return Err(f"Failed to retrieve PowerShell user directory: {e.output}")
+        except CalledProcessError as e:
+            return Err(f"Failed to retrieve PowerShell user directory: {e.output}")
 
     powershell_dir = Path(documents_dir) / "PowerShell"
     if not powershell_dir.exists():
@@ -28,13 +241,17 @@ def get_powershell_config_dir() -> Result[Path, str]:
     return Ok(powershell_dir)
 
 
-def get_win_terminal_config_dir() -> Result[Path, str]:
+@cached_path("terminal")
+def get_win_terminal_config_dir(home: Path | None = None) -> Result[Path, str]:
     """Get the path to the Windows Terminal config directory.
 
+    Args:
+        home: Home directory of the user, defaults to the current user.
+
     Returns:
         A result containing the path to the directory, or an error message.
     """
-    config_dir = Path.home().joinpath(
+    config_dir = (home or Path.home()).joinpath(
         "AppData",
         "Local",
         "Packages",
@@ -48,14 +265,18 @@ def get_win_terminal_config_dir() -> Result[Path, str]:
     return Ok(config_dir)
 
 
-def get_flow_config_dir() -> Result[Path, str]:
+@cached_path("flow")
+def get_flow_config_dir(home: Path | None = None) -> Result[Path, str]:
     """Get the path to the Flow Launcher config directory. (When installed with Scoop).
 
+    Args:
+        home: Home directory of the user, defaults to the current user.
+
     Returns:
         A result containing the path to the directory, or an error message.
     """
     # $HOME/scoop/apps/flow-launcher/current/app-<version>/UserData/Settings/
-    flow_dir = Path.home() / "scoop" / "apps" / "flow-launcher" / "current"
+    flow_dir = (home or Path.home()) / "scoop" / "apps" / "flow-launcher" / "current"
     config_dir: Path | None = None
 
     # Locate the app-<version> directory
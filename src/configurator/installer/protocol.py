@@ -7,6 +7,8 @@ if TYPE_CHECKING:
     from result import Result
 
     from configurator.installer.config import InstallerConfig
+    from configurator.installer.sync import DriftReport, SyncStats
+    from configurator.snapshot import Snapshot
 
 
 class Installer(Protocol):
@@ -21,18 +23,42 @@ class Installer(Protocol):
         """
         ...
 
-    def install(self) -> Result[str, str]:
+    @property
+    def stats(self) -> SyncStats:
+        """Counts of the files handled by the last install or sync.
+
+        Returns:
+            The counts of the files.
+        """
+        ...
+
+    def install(self, *, snapshot: Snapshot | None = None) -> Result[str, str]:
         """Write the source config to the target directory.
 
+        Args:
+            snapshot: Snapshot to record the target files in before they are
+                overwritten.
+
         Returns:
             A result containing a success message or an error message.
         """
         ...
 
-    def write_to_source(self) -> Result[str, str]:
+    def write_to_source(self, *, dry_run: bool = False) -> Result[str, str]:
         """Write the target config files back to the source directory.
 
+        Args:
+            dry_run: Only report the files that would be copied.
+
         Returns:
             A result containing a success message or an error message.
         """
         ...
+
+    def check(self) -> Result[DriftReport, str]:
+        """Compare the installed config with the source config, without changes.
+
+        Returns:
+            A result containing the differences, or an error message.
+        """
+        ...
@@ -0,0 +1,89 @@
+"""Functions for running installer actions, optionally in parallel."""
+from __future__ import annotations
+
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextvars import copy_context
+from typing import TYPE_CHECKING, TypeVar
+
+from result import Err, Result
+
+from configurator import trace
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Sequence
+
+    from configurator.installer.protocol import Installer
+
+T = TypeVar("T")
+
+
+def _run_action(  # noqa: UP047  # type parameters need Python 3.12
+    installer: Installer,
+    action: Callable[[Installer], Result[T, str]],
+) -> Result[T, str]:
+    try:
+        with trace.span("installer.run", installer=installer.config.name):
+            return action(installer)
+    except Exception as e:  # noqa: BLE001
+        # One failing installer must not take down the others running with it
+        return Err(f"Unexpected error in {installer.config.name} installer: {e}")
+
+
+def _run_timed(  # noqa: UP047  # type parameters need Python 3.12
+    installer: Installer,
+    action: Callable[[Installer], Result[T, str]],
+) -> tuple[Result[T, str], float]:
+    start = time.perf_counter()
+    result = _run_action(installer, action)
+    return result, time.perf_counter() - start
+
+
+def run_installers(  # noqa: UP047  # type parameters need Python 3.12
+    installers: Sequence[Installer],
+    action: Callable[[Installer], Result[T, str]],
+    jobs: int = 1,
+    on_result: Callable[[Installer, Result[T, str], float], None] | None = None,
+) -> list[Result[T, str]]:
+    """Run an action for each installer, using up to `jobs` threads.
+
+    The installers are I/O bound, so running them in threads overlaps the time
+    spent waiting on the file system and subprocesses. Failures are collected
+    instead of cancelling the remaining installers.
+
+    Args:
+        installers: The installers to run the action for.
+        action: The action to run, e.g. `lambda i: i.install()`.
+        jobs: The maximum number of installers to run at the same time.
+        on_result: Called in the calling thread with each installer, its result
+            and the seconds the action took, as soon as the action finishes.
+
+    Returns:
+        The result of the action for each installer, in the order of `installers`.
+    """
+    results: list[Result[T, str]] = []
+
+    if jobs <= 1 or len(installers) <= 1:
+        for installer in installers:
+            result, duration = _run_timed(installer, action)
+            if on_result is not None:
+                on_result(installer, result, duration)
+            results.append(result)
+        return results
+
+    with ThreadPoolExecutor(max_workers=min(jobs, len(installers))) as executor:
+        # Each thread runs in a copy of the context, so its spans are nested
+        futures = {
+            executor.submit(copy_context().run, _run_timed, installer, action): i
+            for i, installer in enumerate(installers)
+        }
+        by_index: dict[int, Result[T, str]] = {}
+
+        for future in as_completed(futures):
+            index = futures[future]
+            result, duration = future.result()
+            if on_result is not None:
+                on_result(installers[index], result, duration)
+            by_index[index] = result
+
+    return [by_index[i] for i in range(len(installers))]
@@ -1,8 +1,19 @@
-"""Installer setup functions."""
+"""Installer setup functions.
+
+Installers are registered as factories per platform, so listing the available
+configs does not resolve any target paths, and only the installers that are
+actually used have their target paths resolved.
+"""
+
+from __future__ import annotations
+
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 from result import Err, Ok, Result
 
+from configurator import trace
+from configurator.hashing import get_hash_cache
 from configurator.installer.config import InstallerConfig
 from configurator.installer.copy import CopyInstaller
 from configurator.installer.paths import (
@@ -10,125 +21,308 @@ from configurator.installer.paths import (
     get_powershell_config_dir,
     get_win_terminal_config_dir,
 )
-from configurator.installer.protocol import Installer
 from configurator.installer.terminal import TerminalInstaller
+from configurator.manifest import get_source_manifest
 from configurator.settings import get_settings
+from configurator.template import (
+    TemplateCache,
+    get_template_cache,
+    get_template_variables,
+)
 from configurator.util import in_linux, in_windows
 
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+    from configurator.installer.protocol import Installer
+
+    InstallerFactory = Callable[[Path | None], Result[Installer, str]]
+
+
+def _template_cache(home: Path | None) -> TemplateCache | None:
+    if not get_settings().templates:
+        return None
+    if home is None:
+        return get_template_cache()
+
+    # Rendered with the home of the target root, the records of its renders
+    # are of no use to installs on this host, keep them in memory
+    return TemplateCache(get_template_variables(home), hash_cache=get_hash_cache())
 
-def powershell_installer() -> Result[Installer, str]:
+
+def powershell_installer(home: Path | None = None) -> Result[Installer, str]:
     """Set up the installer for the PowerShell config.
 
+    Args:
+        home: Home directory to install to, defaults to the current user.
+
     Returns:
         A result containing the installer or an error message.
     """
     settings = get_settings()
     source = settings.data_repo_dir / "powershell"
 
-    match get_powershell_config_dir():
+    match get_powershell_config_dir(home):
         case Ok(v):
             target = v
         case Err(e):
             return Err(f"Could not get powershell dir: {e}")
 
-    installer_config = InstallerConfig(name="powershell", source=source, target=target)
-    return Ok(CopyInstaller(config=installer_config))
-
-
-def terminal_installer() -> Result[Installer, str]:
+    installer_config = InstallerConfig(
+        name="powershell",
+        source=source,
+        target=target,
+        incremental=settings.incremental,
+        strategy=settings.install_strategy,
+    )
+    return Ok(
+        CopyInstaller(
+            config=installer_config,
+            hash_cache=get_hash_cache(),
+            template_cache=_template_cache(home),
+        ),
+    )
+
+
+def terminal_installer(home: Path | None = None) -> Result[Installer, str]:
     """Set up the installer for the Windows Terminal config.
 
+    Args:
+        home: Home directory to install to, defaults to the current user.
+
     Returns:
         A result containing the installer or an error message.
     """
     settings = get_settings()
     source = settings.data_repo_dir / "terminal"
 
-    match get_win_terminal_config_dir():
+    match get_win_terminal_config_dir(home):
         case Ok(v):
             target = v
         case Err(e):
             return Err(f"Could not get terminal dir: {e}")
 
     installer_config = InstallerConfig(name="terminal", source=source, target=target)
-    return Ok(TerminalInstaller(config=installer_config))
+    return Ok(
+        TerminalInstaller(
+            config=installer_config,
+            template_cache=_template_cache(home),
+        ),
+    )
 
 
-def flow_installer() -> Result[Installer, str]:
+def flow_installer(home: Path | None = None) -> Result[Installer, str]:
     """Set up the installer for the Flow config.
 
+    Args:
+        home: Home directory to install to, defaults to the current user.
+
     Returns:
         A result containing the installer or an error message.
     """
     settings = get_settings()
     source = settings.data_repo_dir / "flow"
 
-    match get_flow_config_dir():
+    match get_flow_config_dir(home):
         case Ok(v):
             target = v
         case Err(e):
             return Err(e)
 
-    installer_config = InstallerConfig(name="flow", source=source, target=target)
-    return Ok(CopyInstaller(config=installer_config))
-
-
-def fish_installer() -> Result[Installer, str]:
+    installer_config = InstallerConfig(
+        name="flow",
+        source=source,
+        target=target,
+        incremental=settings.incremental,
+        strategy=settings.install_strategy,
+    )
+    return Ok(
+        CopyInstaller(
+            config=installer_config,
+            hash_cache=get_hash_cache(),
+            template_cache=_template_cache(home),
+        ),
+    )
+
+
+def fish_installer(home: Path | None = None) -> Result[Installer, str]:
     """Set up the installer for the Fish config.
 
+    Args:
+        home: Home directory to install to, defaults to the current user.
+
     Returns:
         A result containing the installer or an error message.
     """
     settings = get_settings()
     source = settings.data_repo_dir / "fish"
-    target = Path.home() / ".config" / "fish"
-
-    installer_config = InstallerConfig(name="fish", source=source, target=target)
-    return Ok(CopyInstaller(config=installer_config))
-
-
-def hyper_installer() -> Result[Installer, str]:
+    target = (home or Path.home()) / ".config" / "fish"
+
+    installer_config = InstallerConfig(
+        name="fish",
+        source=source,
+        target=target,
+        incremental=settings.incremental,
+        strategy=settings.install_strategy,
+    )
+    return Ok(
+        CopyInstaller(
+            config=installer_config,
+            hash_cache=get_hash_cache(),
+            template_cache=_template_cache(home),
+        ),
+    )
+
+
+def hyper_installer(home: Path | None = None) -> Result[Installer, str]:
     """Set up the installer for the Hyper config.
 
+    Args:
+        home: Home directory to install to, defaults to the current user.
+
     Returns:
         A result containing the installer or an error message.
     """
     settings = get_settings()
     source = settings.data_repo_dir / "hyper"
-    target = Path.home()
+    target = home or Path.home()
+
+    installer_config = InstallerConfig(
+        name="hyper",
+        source=source,
+        target=target,
+        incremental=settings.incremental,
+        strategy=settings.install_strategy,
+    )
+    return Ok(
+        CopyInstaller(
+            config=installer_config,
+            hash_cache=get_hash_cache(),
+            template_cache=_template_cache(home),
+        ),
+    )
+
+
+WINDOWS_INSTALLERS: dict[str, InstallerFactory] = {
+    "powershell": powershell_installer,
+    "terminal": terminal_installer,
+    "flow": flow_installer,
+}
+
+LINUX_INSTALLERS: dict[str, InstallerFactory] = {
+    "fish": fish_installer,
+    "hyper": hyper_installer,
+}
+
+
+def use_source_manifest(installers: Iterable[Installer]) -> None:
+    """Read the source files of the installers from the data repo manifest.
+
+    Installers without a listing of their source files walk the source
+    directory instead, e.g. when the data repo is not a git repo.
+
+    Args:
+        installers: The installers to set the source files of.
+    """
+    manifest = get_source_manifest()
+    if manifest is None:
+        return
+
+    for installer in installers:
+        if isinstance(installer, CopyInstaller):
+            installer.source_files = manifest.source_files(installer.config.source)
+
+
+def _call_factory(
+    name: str,
+    factory: InstallerFactory,
+    home: Path | None,
+    *,
+    source_manifest: bool = True,
+) -> Result[Installer, str]:
+    try:
+        with trace.span("installer.setup", installer=name):
+            result = factory(home)
+    except ValueError as e:
+        # Raised by the config model, e.g. when the target directory is missing
+        return Err(f"Invalid {name} config: {e}")
 
-    installer_config = InstallerConfig(name="hyper", source=source, target=target)
-    return Ok(CopyInstaller(config=installer_config))
+    if source_manifest and isinstance(result, Ok):
+        use_source_manifest([result.ok_value])
 
+    return result
 
-def windows_installers() -> Result[list[Installer], str]:
-    """Set up the installers for the Windows configs.
+
+def get_installer_factories() -> Result[dict[str, InstallerFactory], str]:
+    """Get the installer factories for the current platform, by config name.
 
     Returns:
-        A result containing the installers or an error message.
+        A result containing the installer factories or an error message.
     """
-    installers: list[Installer] = []
+    if in_windows():
+        return Ok(WINDOWS_INSTALLERS)
+    if in_linux():
+        return Ok(LINUX_INSTALLERS)
 
-    for r in (powershell_installer(), terminal_installer(), flow_installer()):
-        match r:
-            case Ok(v):
-                installers.append(v)
-            case Err(e):
-                return Err(e)
+    return Err("Unsupported platform.")
 
-    return Ok(installers)
+
+def get_installer_names() -> Result[list[str], str]:
+    """Get the names of the configs available on the current platform.
+
+    Returns:
+        A result containing the config names or an error message.
+    """
+    return get_installer_factories().map(list)
+
+
+def get_installer(name: str, home: Path | None = None) -> Result[Installer, str]:
+    """Set up the installer for a single config.
+
+    Args:
+        name: Name of the config.
+        home: Home directory to install to, defaults to the current user.
+
+    Returns:
+        A result containing the installer or an error message.
+    """
+    match get_installer_factories():
+        case Ok(factories) if name in factories:
+            return _call_factory(name, factories[name], home)
+        case Ok(_):
+            return Err(f"Unknown config: {name}")
+        case Err(e):
+            return Err(e)
+
+    return Err("Unknown error occurred")
 
 
-def linux_installers() -> Result[list[Installer], str]:
-    """Set up the installers for the Linux configs.
+def get_installers(
+    names: Iterable[str] | None = None,
+    home: Path | None = None,
+) -> Result[list[Installer], str]:
+    """Set up the installers for the current platform.
+
+    Args:
+        names: Names of the configs to set up installers for, or None for all.
+        home: Home directory to install to, defaults to the current user.
 
     Returns:
         A result containing the installers or an error message.
     """
+    match get_installer_factories():
+        case Ok(v):
+            factories = v
+        case Err(e):
+            return Err(e)
+
     installers: list[Installer] = []
 
-    for r in (fish_installer(), hyper_installer()):
-        match r:
+    for name in factories if names is None else names:
+        if name not in factories:
+            return Err(f"Unknown config: {name}")
+
+        match _call_factory(name, factories[name], home):
             case Ok(v):
                 installers.append(v)
             case Err(e):
@@ -137,15 +331,45 @@ def linux_installers() -> Result[list[Installer], str]:
     return Ok(installers)
 
 
-def get_installers() -> Result[list[Installer], str]:
-    """Set up the installers for the current platform.
+def resolve_installers(
+    names: Iterable[str],
+    home: Path | None = None,
+    *,
+    source_manifest: bool = True,
+) -> Result[dict[str, Result[Installer, str]], str]:
+    """Set up the installers for the given configs, keeping going on errors.
+
+    Unlike `get_installers`, an unknown or invalid config does not stop the
+    other installers from being set up.
+
+    Args:
+        names: Names of the configs to set up installers for.
+        home: Home directory to install to, defaults to the current user.
+        source_manifest: Read the source files from the data repo manifest.
+            Without it, the installers never touch the data repo while being
+            set up, e.g. while it is being pulled, and `use_source_manifest`
+            can be called once it is up to date.
 
     Returns:
-        A result containing the installers or an error message.
+        A result containing the installer or an error message for each config
+        by name, or an error message if the platform is not supported.
     """
-    if in_windows():
-        return windows_installers()
-    if in_linux():
-        return linux_installers()
+    match get_installer_factories():
+        case Ok(v):
+            factories = v
+        case Err(e):
+            return Err(e)
 
-    return Err("Unsupported platform.")
+    return Ok(
+        {
+            name: _call_factory(
+                name,
+                factories[name],
+                home,
+                source_manifest=source_manifest,
+            )
+            if name in factories
+            else Err(f"Unknown config: {name}")
+            for name in dict.fromkeys(names)
+        },
+    )
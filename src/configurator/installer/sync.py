@@ -0,0 +1,494 @@
+"""Incremental file tree sync used by the installers."""
+from __future__ import annotations
+
+import os
+import stat
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from shutil import copy2, copystat
+from threading import get_ident
+from typing import TYPE_CHECKING, Literal
+
+from configurator.hashing import hash_file
+from configurator.util import ensure_dir
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator
+
+    from configurator.hashing import HashCache
+    from configurator.installer.filters import PathFilter
+
+InstallStrategy = Literal["copy", "hardlink", "symlink", "reflink"]
+
+# Linux ioctl cloning a file, sharing the data blocks on btrfs, xfs etc.
+FICLONE = 0x40049409
+
+# Path relative to the tree root, full path and stat result of a file in a tree
+SourceFile = tuple[str, Path, os.stat_result | None]
+
+
+@dataclass
+class SyncStats:
+    """Counts of the files handled by a sync.
+
+    Attributes:
+        copied: Files written to the target, including linked files.
+        linked: Files placed in the target as hard links, symlinks or reflinks.
+        skipped: Source entries that were not copied, e.g. sockets or broken links.
+        unchanged: Files whose target already matched the source.
+        bytes_copied: Total size of the copied files, excluding linked files.
+        paths: Relative paths of the copied files.
+    """
+
+    copied: int = 0
+    linked: int = 0
+    skipped: int = 0
+    unchanged: int = 0
+    bytes_copied: int = 0
+    paths: list[str] = field(default_factory=list)
+
+    def add_copied(self, rel_path: str, size: int, *, linked: bool = False) -> None:
+        """Count a copied file.
+
+        Args:
+            rel_path: Path of the file, relative to the synced directory.
+            size: Size of the file.
+            linked: The file was linked instead of copied.
+        """
+        self.copied += 1
+        self.paths.append(rel_path)
+        if linked:
+            self.linked += 1
+        else:
+            self.bytes_copied += size
+
+    def __str__(self) -> str:
+        """Summary of the counts."""
+        linked = f" ({self.linked} linked)" if self.linked else ""
+        return (
+            f"{self.copied} copied{linked}, {self.skipped} skipped, "
+            f"{self.unchanged} unchanged"
+        )
+
+
+@dataclass
+class DriftReport:
+    """Differences between the source files of an installer and its target.
+
+    Attributes:
+        modified: Files whose target content differs from the source.
+        missing: Source files that do not exist in the target.
+        extra: Target files, in directories tracked by the source, that do not
+            exist in the source.
+    """
+
+    modified: list[str] = field(default_factory=list)
+    missing: list[str] = field(default_factory=list)
+    extra: list[str] = field(default_factory=list)
+
+    @property
+    def drifted(self) -> bool:
+        """True if the target differs from the source."""
+        return bool(self.modified or self.missing or self.extra)
+
+    def __str__(self) -> str:
+        """Summary of the counts."""
+        return (
+            f"{len(self.modified)} modified, {len(self.missing)} missing, "
+            f"{len(self.extra)} extra"
+        )
+
+
+def is_same_file(a: os.stat_result, b: os.stat_result) -> bool:
+    """Check if two stat results are of the same file.
+
+    Args:
+        a: The first stat result.
+        b: The second stat result.
+
+    Returns:
+        True if both are of the same file on the same device.
+    """
+    return a.st_ino != 0 and (a.st_dev, a.st_ino) == (b.st_dev, b.st_ino)
+
+
+def _reflink(source: Path, target: Path) -> None:
+    if fcntl is None or sys.platform != "linux":
+        msg = "Reflinks are not supported on this platform"
+        raise OSError(msg)
+
+    with source.open("rb") as src, target.open("wb") as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    copystat(source, target)
+
+
+def place_file(
+    source: Path,
+    source_stat: os.stat_result,
+    target: Path,
+    strategy: InstallStrategy = "copy",
+) -> bool:
+    """Place a source file at the target path using the given strategy.
+
+    Links replace the target atomically. When a link can not be made, e.g. when
+    the source and target are on different devices or the file system does not
+    support it, the file is copied instead.
+
+    Args:
+        source: The source file.
+        source_stat: The stat result of the source file.
+        target: The target path.
+        strategy: How to place the file.
+
+    Raises:
+        OSError: If the file can not be copied.
+
+    Returns:
+        True if the file was linked, False if it was copied.
+    """
+    if strategy == "copy":
+        copy2(source, target)
+        return False
+
+    cross_device = target.parent.stat().st_dev != source_stat.st_dev
+    if cross_device and strategy in ("hardlink", "reflink"):
+        copy2(source, target)
+        return False
+
+    tmp_target = target.with_name(f".{target.name}.{os.getpid()}.{get_ident()}.tmp")
+    try:
+        match strategy:
+            case "hardlink":
+                os.link(source, tmp_target)
+            case "symlink":
+                tmp_target.symlink_to(source.absolute())
+            case "reflink":
+                _reflink(source, tmp_target)
+        tmp_target.replace(target)
+    except OSError:
+        tmp_target.unlink(missing_ok=True)
+        copy2(source, target)
+        return False
+
+    return True
+
+
+def is_unchanged(
+    source: Path,
+    source_stat: os.stat_result,
+    target: Path,
+    hash_cache: HashCache | None = None,
+    *,
+    link: bool = False,
+) -> bool:
+    """Check if the target file already has the same content as the source file.
+
+    Size and modification time are compared first, the content digests are only
+    compared when the sizes match but the modification times do not.
+
+    Args:
+        source: The source file.
+        source_stat: The stat result of the source file.
+        target: The target file.
+        hash_cache: Cache used to look up the file digests.
+        link: The target should be a link to the source, so a copy of it is
+            not unchanged.
+
+    Returns:
+        True if the target file matches the source file.
+    """
+    try:
+        target_stat = target.stat()
+    except FileNotFoundError:
+        return False
+
+    if (
+        not stat.S_ISREG(target_stat.st_mode)
+        or target_stat.st_size != source_stat.st_size
+    ):
+        return False
+    if link:
+        if not source_stat.st_ino:
+            # Listed from the data repo manifest, which has no inode numbers
+            source_stat = source.stat()
+        return is_same_file(source_stat, target_stat)
+    # A hard link or symlink to the source is the source
+    if target_stat.st_mtime_ns == source_stat.st_mtime_ns or is_same_file(
+        source_stat,
+        target_stat,
+    ):
+        return True
+
+    if hash_cache is None:
+        return hash_file(source) == hash_file(target)
+
+    return hash_cache.digest(source, source_stat) == hash_cache.digest(
+        target,
+        target_stat,
+    )
+
+
+def iter_files(
+    root: Path,
+    path_filter: PathFilter | None = None,
+) -> Iterator[SourceFile]:
+    """Walk the files in a directory tree.
+
+    Args:
+        root: The directory to walk.
+        path_filter: Rules for the files to list. Excluded directories are
+            not walked at all.
+
+    Raises:
+        OSError: If a directory can not be read.
+
+    Yields:
+        The path relative to `root` in posix form, the full path and the stat
+        result of each regular file. The stat result is None for entries that
+        are not regular files, e.g. sockets or broken links.
+    """
+    stack = [(root, "")]
+
+    while stack:
+        directory, prefix = stack.pop()
+
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                path = Path(entry.path)
+                rel_path = prefix + entry.name
+
+                try:
+                    entry_stat = entry.stat()
+                except FileNotFoundError:
+                    entry_stat = None
+
+                if entry_stat is not None and stat.S_ISDIR(entry_stat.st_mode):
+                    if path_filter is None or not path_filter.prunes_dir(rel_path):
+                        stack.append((path, rel_path + "/"))
+                elif path_filter is None or path_filter.matches_file(rel_path):
+                    if entry_stat is not None and stat.S_ISREG(entry_stat.st_mode):
+                        yield rel_path, path, entry_stat
+                    else:
+                        yield rel_path, path, None
+
+
+def stat_files(root: Path, rel_paths: Iterable[str]) -> Iterator[SourceFile]:
+    """Look up the given files in a directory tree, like `iter_files`.
+
+    Args:
+        root: The directory containing the files.
+        rel_paths: Paths of the files relative to `root`, in posix form.
+
+    Yields:
+        The relative path, the full path and the stat result of each file that
+        exists. The stat result is None for entries that are not regular files.
+    """
+    for rel_path in rel_paths:
+        path = root / rel_path
+        try:
+            path_stat = path.stat()
+        except FileNotFoundError:
+            continue
+
+        if stat.S_ISDIR(path_stat.st_mode):
+            continue
+
+        yield rel_path, path, path_stat if stat.S_ISREG(path_stat.st_mode) else None
+
+
+def sync_tree(  # noqa: PLR0913
+    source: Path,
+    target: Path,
+    hash_cache: HashCache | None = None,
+    source_files: Iterable[SourceFile] | None = None,
+    *,
+    strategy: InstallStrategy = "copy",
+    before_write: Callable[[Path], None] | None = None,
+) -> SyncStats:
+    """Copy the files in the source tree that differ from the target tree.
+
+    Args:
+        source: The source directory.
+        target: The target directory.
+        hash_cache: Cache used to avoid re-hashing files that have not changed.
+        source_files: The files in the source tree, if already listed.
+        strategy: How to place the files in the target, see `place_file`.
+            With a link strategy, copies of the source files are replaced by
+            links too.
+        before_write: Called with each target file before it is written, e.g. to
+            back it up.
+
+    Raises:
+        OSError: If a directory can not be read or a file can not be copied.
+
+    Returns:
+        Counts of the copied, skipped and unchanged files.
+    """
+    stats = SyncStats()
+    target_dev = ensure_dir(target).stat().st_dev
+    # Copies are replaced by links, until a link can not be made
+    link = strategy in ("hardlink", "symlink")
+
+    if source_files is None:
+        source_files = iter_files(source)
+
+    for rel_path, source_path, source_stat in source_files:
+        target_path = target / rel_path
+
+        if source_stat is None:
+            stats.skipped += 1
+        elif is_unchanged(
+            source_path,
+            source_stat,
+            target_path,
+            hash_cache,
+            link=link and (strategy == "symlink" or source_stat.st_dev == target_dev),
+        ):
+            stats.unchanged += 1
+        else:
+            if before_write is not None:
+                before_write(target_path)
+            ensure_dir(target_path.parent)
+            linked = place_file(source_path, source_stat, target_path, strategy)
+            stats.add_copied(rel_path, source_stat.st_size, linked=linked)
+            link = link and linked
+
+    return stats
+
+
+def sync_back(
+    source: Path,
+    target: Path,
+    hash_cache: HashCache | None = None,
+    source_files: Iterable[SourceFile] | None = None,
+    *,
+    dry_run: bool = False,
+) -> SyncStats:
+    """Copy the target files that differ from the source back to the source tree.
+
+    Only files tracked in the source tree are considered, so a target like the
+    home directory is never walked. Files missing from the target are skipped,
+    and files linked to the source are unchanged by definition.
+
+    Args:
+        source: The source directory.
+        target: The target directory.
+        hash_cache: Cache used to avoid re-hashing files that have not changed.
+        source_files: The files in the source tree to consider, defaults to all.
+        dry_run: Only report the files that would be copied.
+
+    Raises:
+        OSError: If a directory can not be read or a file can not be copied.
+
+    Returns:
+        Counts of the copied, skipped and unchanged files.
+    """
+    stats = SyncStats()
+
+    if source_files is None:
+        source_files = iter_files(source)
+
+    for rel_path, source_path, source_stat in source_files:
+        target_path = target / rel_path
+
+        try:
+            target_stat = target_path.stat()
+        except FileNotFoundError:
+            stats.skipped += 1
+            continue
+
+        if source_stat is None or not stat.S_ISREG(target_stat.st_mode):
+            stats.skipped += 1
+        elif is_unchanged(target_path, target_stat, source_path, hash_cache):
+            stats.unchanged += 1
+        else:
+            if not dry_run:
+                copy2(target_path, source_path)
+            stats.add_copied(rel_path, target_stat.st_size)
+
+    return stats
+
+
+def check_tree(
+    source: Path,
+    target: Path,
+    hash_cache: HashCache | None = None,
+    source_files: Iterable[SourceFile] | None = None,
+    path_filter: PathFilter | None = None,
+) -> DriftReport:
+    """Compare a source tree with a target tree, without changing either.
+
+    Extra files are only looked for in the subdirectories of the source, the
+    top level of the target may be shared with other files, e.g. a home directory.
+
+    Args:
+        source: The source directory.
+        target: The target directory.
+        hash_cache: Cache used to avoid re-hashing files that have not changed.
+        source_files: The files in the source tree, if already listed.
+        path_filter: Rules for the managed files, files in the target that
+            are not managed are never extra.
+
+    Raises:
+        OSError: If a directory can not be read.
+
+    Returns:
+        The files that differ between the trees.
+    """
+    report = DriftReport()
+    source_paths: set[str] = set()
+    source_dirs: set[str] = set()
+
+    if source_files is None:
+        source_files = iter_files(source, path_filter)
+
+    for rel_path, source_path, source_stat in source_files:
+        source_paths.add(rel_path)
+        parent, _, _ = rel_path.rpartition("/")
+        if parent:
+            source_dirs.add(parent)
+
+        if source_stat is None:
+            continue
+
+        target_path = target / rel_path
+        if not target_path.exists():
+            report.missing.append(rel_path)
+        elif not is_unchanged(source_path, source_stat, target_path, hash_cache):
+            report.modified.append(rel_path)
+
+    report.extra = [
+        rel_path
+        for rel_path in _find_extra(target, source_dirs, source_paths)
+        if path_filter is None or path_filter(rel_path)
+    ]
+    report.modified.sort()
+    report.missing.sort()
+    return report
+
+
+def _find_extra(
+    target: Path,
+    source_dirs: set[str],
+    source_paths: set[str],
+) -> list[str]:
+    extra: list[str] = []
+
+    for source_dir in sorted(source_dirs):
+        target_dir = target / source_dir
+        if not target_dir.is_dir():
+            continue
+
+        with os.scandir(target_dir) as entries:
+            for entry in entries:
+                rel_path = f"{source_dir}/{entry.name}"
+                if not entry.is_dir() and rel_path not in source_paths:
+                    extra.append(rel_path)
+
+    return sorted(extra)
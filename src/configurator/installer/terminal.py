@@ -1,20 +1,33 @@
 """Installer for Windows Terminal config."""
 from __future__ import annotations
 
-import json
-from typing import TYPE_CHECKING, Any
+from typing import TYPE_CHECKING
 
 from result import Err, Ok, Result
 
-from configurator.util import get_json_data_from_file
+from configurator.installer.config import MergeRule
+from configurator.installer.json_merge import JsonMergeInstaller
+from configurator.installer.merge import compile_merge_plan
 
 if TYPE_CHECKING:
     from pathlib import Path
 
     from configurator.installer.config import InstallerConfig
+    from configurator.template import TemplateCache
+
+TERMINAL_MERGE_PLAN = compile_merge_plan(
+    [
+        # update default settings
+        MergeRule(path="/profiles/defaults", strategy="replace"),
+        # update schemes, only add/override schemes found in source data
+        MergeRule(path="/schemes", strategy="keyed_list", key="name"),
+        # update application settings, not nested in destination only source
+        MergeRule(path="", source_path="/application", strategy="shallow"),
+    ],
+)
 
 
-class TerminalInstaller:
+class TerminalInstaller(JsonMergeInstaller):
     """Installer for Windows Terminal config.
 
     Windows Terminal has a lot of settings that are system specific,
@@ -23,20 +36,22 @@ class TerminalInstaller:
     to the target config without removing or affecting any other settings.
     """
 
-    def __init__(self, config: InstallerConfig) -> None:
+    def __init__(
+        self,
+        config: InstallerConfig,
+        template_cache: TemplateCache | None = None,
+    ) -> None:
         """Initialize the installer.
 
         Args:
             config: Config for the installer.
+            template_cache: Cache used to render a templated source file.
         """
-        self.config: InstallerConfig = config
-
-    def _get_source_settings_file(self) -> Result[Path, str]:
-        source_file = self.config.source / "settings.json"
-        if not source_file.exists():
-            return Err(f"Could not find source file at {source_file}")
-
-        return Ok(source_file)
+        super().__init__(
+            config,
+            plan=TERMINAL_MERGE_PLAN,
+            template_cache=template_cache,
+        )
 
     def _get_target_settings_file(self) -> Result[Path, str]:
         target_file = self.config.target / "settings.json"
@@ -46,120 +61,12 @@ class TerminalInstaller:
 
         return Ok(target_file)
 
-    def _get_source_and_target_json_data(
-        self,
-        source_file: Path,
-        target_file: Path,
-    ) -> Result[tuple[dict[Any, Any], dict[Any, Any]], str]:
-        source_data_result = get_json_data_from_file(file=source_file)
-        destination_data_result = get_json_data_from_file(file=target_file)
-
-        match source_data_result, destination_data_result:
-            case (Err(e), _):
-                return Err(f"Could not read source file: {e}")
-            case (_, Err(e)):
-                return Err(f"Could not read destination file: {e}")
-            case (Ok(source_data), Ok(destination_data)):
-                return Ok((source_data, destination_data))
-
-        return Err("Unknown error occurred")
-
-    def _copy_source_data_to_target(
-        self,
-        source_data: dict[Any, Any],
-        target_data: dict[Any, Any],
-    ) -> Result[dict[str, str], str]:
-        # update default settings
-        target_data["profiles"]["defaults"] = source_data["profiles"]["defaults"]
-
-        # update schemes, only add/override schemes found in source data
-        source_schemes: list[dict[Any, Any]] = source_data["schemes"]
-        destination_schemes: list[dict[Any, Any]] = target_data["schemes"]
-        source_scheme_names = [x["name"] for x in source_schemes]
-
-        # remove any destination scheme that exists in source schemes
-        for n, scheme in enumerate(destination_schemes):
-            if scheme["name"] in source_scheme_names:
-                destination_schemes.pop(n)
-
-        # add source schemes to destination schemes
-        destination_schemes.extend(source_schemes)
-        target_data["schemes"] = destination_schemes
-
-        # update application settings, not nested in destination only source
-        source_application_data: dict[Any, Any] = source_data["application"]
-        for key, value in source_application_data.items():
-            target_data[key] = value
-
-        return Ok(target_data)
-
-    def _write_target_data_to_file(
-        self,
-        target_data: dict[Any, Any],
-        target_file: Path,
-    ) -> Result[str, str]:
-        try:
-            with target_file.open("w", encoding="utf-8") as file:
-                json.dump(target_data, file)
-                return Ok(f"Data written to {self.config.name} config file")
-
-        except FileNotFoundError as e:
-            return Err(f"Failed to write to {self.config.name} config file: {e}")
-
-        except PermissionError as e:
-            return Err(f"Failed to write to {self.config.name} config file: {e}")
-
-    def install(self) -> Result[str, str]:  # noqa: PLR0911
-        """Install the config data by copying from the source file to the target file.
-
-        Returns:
-            A result containing a success message or an error message.
-        """
-        source_file_result = self._get_source_settings_file()
-        target_file_result = self._get_target_settings_file()
-
-        match source_file_result, target_file_result:
-            case (Err(_), _):
-                return source_file_result
-            case (_, Err(_)):
-                return target_file_result
-            case (Ok(source_val), Ok(target_val)):
-                source_file = source_val
-                target_file = target_val
-                data_result = self._get_source_and_target_json_data(
-                    source_file=source_file,
-                    target_file=target_file,
-                )
-
-        match data_result:
-            case Err(_):
-                return data_result
-            case Ok((source_data, destination_data)):
-                copy_data_result = self._copy_source_data_to_target(
-                    source_data,
-                    destination_data,
-                )
-
-        match copy_data_result:
-            case Err(_):
-                return copy_data_result
-            case Ok(target_data):
-                write_file_result = self._write_target_data_to_file(
-                    target_data,
-                    target_file=target_file,
-                )
-
-        match write_file_result:
-            case Err(_):
-                return write_file_result
-            case Ok(v):
-                return Ok(v)
-
-        return Err("Unknown error occurred")
-
-    def write_to_source(self) -> Result[str, str]:
+    def write_to_source(self, *, dry_run: bool = False) -> Result[str, str]:  # noqa: ARG002
         """Write the target config files back to the source directory.
 
+        Args:
+            dry_run: Only report the files that would be copied.
+
         Returns:
             A result containing a success message or an error message.
         """
@@ -0,0 +1,400 @@
+"""Manifest of the files in the data repo, built once per revision.
+
+The data repo only changes when it is pulled, or when local files are copied
+to it. Instead of walking the config directories on every run, the files of
+the checked out revision are listed once with `git ls-tree`, which also gives
+the blob ID of each file. The blob IDs are the digests used by the hash cache,
+so the source files never have to be hashed either. Files that git does not
+track, including ignored ones, are listed by walking the repo once, as they
+are installed like any other file in a config directory.
+
+On every run, the files in the manifest are checked against their size and
+modification time, and files that changed lose their blob ID. Only the
+directories whose modification time changed since the manifest was built are
+listed again, for added files, so loading the manifest never walks the data
+repo or runs git once it is built.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import stat
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from result import Err, Ok, Result
+
+from configurator import trace
+from configurator.hashing import get_hash_cache
+from configurator.settings import get_settings
+from configurator.util import dump_json_atomic
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from git import Repo
+
+    from configurator.hashing import HashCache
+    from configurator.installer.sync import SourceFile
+
+MANIFEST_VERSION = 2
+# Manifests kept, so switching back to a recent revision does not rebuild it
+MANIFESTS_KEPT = 4
+
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    """A file in the data repo.
+
+    Attributes:
+        size: Size of the file.
+        mode: File mode of the checked out file.
+        mtime_ns: Modification time of the checked out file in nanoseconds.
+        oid: The git blob ID of the content, or None if the file has
+            uncommitted changes.
+    """
+
+    size: int
+    mode: int
+    mtime_ns: int
+    oid: str | None
+
+
+class SourceManifest:
+    """The files of the data repo, by path relative to the repo root."""
+
+    def __init__(
+        self,
+        repo_dir: Path,
+        head: str,
+        entries: dict[str, ManifestEntry],
+    ) -> None:
+        """Initialize the manifest.
+
+        Args:
+            repo_dir: The data repo directory.
+            head: The commit the manifest was built for.
+            entries: The files, by path relative to the repo root.
+        """
+        self.repo_dir = repo_dir
+        self.head = head
+        self.entries = entries
+        self._dev = repo_dir.stat().st_dev
+
+    def _stat(self, entry: ManifestEntry) -> os.stat_result:
+        mtime = entry.mtime_ns // 1_000_000_000
+        return os.stat_result(
+            (entry.mode, 0, self._dev, 1, 0, 0, entry.size, mtime, mtime, mtime),
+            {"st_mtime_ns": entry.mtime_ns},
+        )
+
+    def source_files(self, source: Path) -> list[SourceFile] | None:
+        """List the files of a config directory, like `iter_files`.
+
+        Args:
+            source: The config directory in the data repo.
+
+        Returns:
+            The relative path, full path and stat result of each file, read
+            from the manifest, or None if the directory has no files in it.
+        """
+        prefix = source.relative_to(self.repo_dir).as_posix() + "/"
+        files: list[SourceFile] = [
+            (path[len(prefix) :], source / path[len(prefix) :], self._stat(entry))
+            for path, entry in self.entries.items()
+            if path.startswith(prefix)
+        ]
+        return files or None
+
+    def seed(self, hash_cache: HashCache) -> None:
+        """Add the blob IDs of the committed files to a hash cache.
+
+        Args:
+            hash_cache: The hash cache to add the digests to.
+        """
+        for path, entry in self.entries.items():
+            if entry.oid is not None:
+                hash_cache.seed(
+                    self.repo_dir / path,
+                    entry.size,
+                    entry.mtime_ns,
+                    entry.oid,
+                )
+
+
+def _read_head(repo_dir: Path) -> str | None:
+    # Resolves HEAD from the files in .git, without starting git
+    git_dir = repo_dir / ".git"
+    try:
+        head = (git_dir / "HEAD").read_text(encoding="utf-8").strip()
+        if not head.startswith("ref: "):
+            return head  # detached
+        ref = head.removeprefix("ref: ")
+        ref_file = git_dir / ref
+        if ref_file.is_file():
+            return ref_file.read_text(encoding="utf-8").strip()
+        packed_refs = (git_dir / "packed-refs").read_text(encoding="utf-8")
+    except OSError:
+        # Not a plain checkout, e.g. a worktree, or no commits yet
+        return None
+
+    for line in packed_refs.splitlines():
+        oid, _, name = line.partition(" ")
+        if name == ref:
+            return oid
+
+    return None
+
+
+def _file_entry(path_stat: os.stat_result, oid: str | None = None) -> ManifestEntry:
+    return ManifestEntry(
+        size=path_stat.st_size,
+        mode=path_stat.st_mode,
+        mtime_ns=path_stat.st_mtime_ns,
+        oid=oid,
+    )
+
+
+def _list_tree(repo: Repo, repo_dir: Path) -> dict[str, ManifestEntry]:
+    output = repo.git.ls_tree("-r", "-l", "-z", "HEAD", strip_newline_in_stdout=False)
+    entries: dict[str, ManifestEntry] = {}
+
+    for record in output.split("\0"):
+        if not record:
+            continue
+
+        info, _, path = record.partition("\t")
+        mode, kind, oid, blob_size = info.split()
+        if kind != "blob":
+            continue  # submodules
+
+        try:
+            path_stat = (repo_dir / path).stat()
+        except FileNotFoundError:
+            continue  # not checked out, e.g. outside the sparse checkout
+
+        if not stat.S_ISREG(path_stat.st_mode):
+            continue
+
+        # The blob of a symlink is the link target, not the content, and a size
+        # mismatch means git converted the content on checkout, e.g. the line
+        # endings, so the blob ID is not the digest of the file
+        is_content = mode != "120000" and int(blob_size) == path_stat.st_size
+        entries[path] = _file_entry(path_stat, oid if is_content else None)
+
+    return entries
+
+
+def _scan_dir(
+    repo_dir: Path,
+    rel_dir: str,
+    entries: dict[str, ManifestEntry],
+    dirs: dict[str, int],
+    *,
+    recursive: bool,
+) -> None:
+    # Adds the files git does not track, and the modification time of the
+    # directories walked. Only new subdirectories are walked when not recursive.
+    stack = [rel_dir]
+
+    while stack:
+        current = stack.pop()
+        prefix = f"{current}/" if current else ""
+        directory = repo_dir / current
+        try:
+            dirs[current] = directory.stat().st_mtime_ns
+            scanned = list(os.scandir(directory))
+        except OSError:
+            continue  # removed, or not readable
+
+        for entry in scanned:
+            rel_path = prefix + entry.name
+            if rel_path == ".git":
+                continue
+            try:
+                entry_stat = entry.stat()
+            except OSError:
+                continue  # broken link
+
+            if stat.S_ISDIR(entry_stat.st_mode):
+                if recursive or rel_path not in dirs:
+                    stack.append(rel_path)
+            elif stat.S_ISREG(entry_stat.st_mode) and rel_path not in entries:
+                entries[rel_path] = _file_entry(entry_stat)
+
+
+def _build(
+    repo_dir: Path,
+) -> Result[tuple[str, dict[str, ManifestEntry], dict[str, int]], str]:
+    # GitPython is only needed to build a manifest, not to load it
+    from git import (  # noqa: PLC0415
+        GitCommandError,
+        InvalidGitRepositoryError,
+        NoSuchPathError,
+        Repo,
+    )
+
+    try:
+        repo = Repo(repo_dir)
+        head = repo.head.commit.hexsha
+        entries = _list_tree(repo, repo_dir)
+    except (GitCommandError, InvalidGitRepositoryError, NoSuchPathError) as e:
+        return Err(f"Failed to list data repo: {e}")
+    except ValueError as e:
+        # No commits yet
+        return Err(f"Failed to list data repo: {e}")
+
+    dirs: dict[str, int] = {}
+    _scan_dir(repo_dir, "", entries, dirs, recursive=True)
+    return Ok((head, entries, dirs))
+
+
+def _load(
+    file: Path,
+    head: str,
+) -> tuple[dict[str, ManifestEntry], dict[str, int]] | None:
+    try:
+        with file.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if data.get("version") != MANIFEST_VERSION or data.get("head") != head:
+        return None
+
+    entries = {path: ManifestEntry(*entry) for path, entry in data["entries"].items()}
+    return entries, data["dirs"]
+
+
+def _prune(cache_dir: Path) -> None:
+    # Only the most recently written manifests are kept
+    manifests: list[tuple[int, Path]] = []
+    for file in cache_dir.glob("*.json"):
+        try:
+            manifests.append((file.stat().st_mtime_ns, file))
+        except FileNotFoundError:
+            continue  # pruned by another process
+
+    manifests.sort(reverse=True)
+    for _, old in manifests[MANIFESTS_KEPT:]:
+        old.unlink(missing_ok=True)
+
+
+def _save(
+    cache_dir: Path,
+    head: str,
+    entries: dict[str, ManifestEntry],
+    dirs: dict[str, int],
+) -> None:
+    data = {
+        "version": MANIFEST_VERSION,
+        "head": head,
+        "entries": {
+            path: [e.size, e.mode, e.mtime_ns, e.oid] for path, e in entries.items()
+        },
+        "dirs": dirs,
+    }
+    # Failing to save only means the manifest is built again on the next run
+    if dump_json_atomic(cache_dir / f"{head}.json", data).is_ok():
+        _prune(cache_dir)
+
+
+def _refresh(
+    repo_dir: Path,
+    entries: dict[str, ManifestEntry],
+    dirs: dict[str, int],
+) -> tuple[dict[str, ManifestEntry], int]:
+    # Checks the files against the working tree, and lists the directories
+    # that changed since the manifest was built. Returns the number of them.
+    current: dict[str, ManifestEntry] = {}
+    for path, entry in entries.items():
+        try:
+            path_stat = (repo_dir / path).stat()
+        except OSError:
+            continue  # removed
+
+        if not stat.S_ISREG(path_stat.st_mode):
+            continue
+        if (path_stat.st_size, path_stat.st_mtime_ns) == (entry.size, entry.mtime_ns):
+            current[path] = entry
+        else:
+            current[path] = _file_entry(path_stat)
+
+    changed = [
+        rel_dir
+        for rel_dir, mtime_ns in dirs.items()
+        if _mtime_ns(repo_dir / rel_dir) not in (mtime_ns, None)
+    ]
+    scanned = dict(dirs)
+    for rel_dir in changed:
+        _scan_dir(repo_dir, rel_dir, current, scanned, recursive=False)
+
+    return current, len(changed)
+
+
+def _mtime_ns(path: Path) -> int | None:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def load_manifest(repo_dir: Path, cache_dir: Path) -> Result[SourceManifest, str]:
+    """Load the manifest of the data repo, building it if HEAD has moved.
+
+    Args:
+        repo_dir: The data repo directory.
+        cache_dir: The directory the manifest is stored in.
+
+    Returns:
+        A result containing the manifest, or an error message.
+    """
+    with trace.span("manifest.load") as span:
+        head = _read_head(repo_dir)
+        stored = _load(cache_dir / f"{head}.json", head) if head else None
+        built = stored is None
+
+        if stored is None and not (repo_dir / ".git").exists():
+            # Checked here, as building would import GitPython to find out
+            return Err(f"Not a git repo: {repo_dir}")
+        if stored is None:
+            match _build(repo_dir):
+                case Ok((head, entries, dirs)):
+                    _save(cache_dir, head, entries, dirs)
+                case Err(e):
+                    return Err(e)
+        else:
+            entries, dirs = stored
+
+        entries, scanned = _refresh(repo_dir, entries, dirs)
+        if span is not None:
+            span.attrs.update(built=built, files=len(entries), scanned_dirs=scanned)
+
+        return Ok(SourceManifest(repo_dir, head, entries))
+
+
+@lru_cache(maxsize=1)
+def get_source_manifest() -> SourceManifest | None:
+    """Get the manifest of the data repo in the settings.
+
+    The blob IDs in the manifest are added to the hash cache, so the source
+    files are never hashed.
+
+    Returns:
+        The manifest, or None if it can not be built, e.g. when the data repo
+        is not a git repo, in which case the source directories are walked.
+    """
+    settings = get_settings()
+    if not settings.source_manifest:
+        return None
+
+    match load_manifest(settings.data_repo_dir, settings.cache_dir / "manifests"):
+        case Ok(manifest):
+            manifest.seed(get_hash_cache())
+            return manifest
+        case Err(_):
+            return None
+
+    return None
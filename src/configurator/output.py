@@ -0,0 +1,137 @@
+"""Machine readable output of the CLI commands.
+
+With `--output json`, a command prints a single JSON document once it is done.
+With `--output ndjson`, it prints one JSON record per line as each installer
+finishes, so a controller running the command on many hosts can consume the
+results while they come in. Only records are printed to stdout, any other
+messages are printed to stderr.
+
+The exit code tells whether the command succeeded, independent of the output
+format, see `EXIT_OK`, `EXIT_FAILED` and `EXIT_ERROR`.
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING, Literal
+
+import click
+from result import Err, Ok
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+    from result import Result
+
+    from configurator.installer.protocol import Installer
+
+OutputFormat = Literal["text", "json", "ndjson"]
+
+# Everything succeeded
+EXIT_OK = 0
+# The command ran, but some installers or roots failed
+EXIT_FAILED = 1
+# The command could not run, e.g. the installers could not be set up
+EXIT_ERROR = 2
+
+
+@dataclass
+class InstallerRecord:
+    """The outcome of running an installer.
+
+    Attributes:
+        name: Name of the config.
+        status: "ok", or "error" if the installer failed.
+        duration: Seconds the installer took.
+        files: Number of files written.
+        bytes: Number of bytes written, excluding linked files.
+        unchanged: Number of files that were already up to date.
+        paths: Paths of the written files, relative to the config directory.
+        message: The success or error message of the installer.
+    """
+
+    name: str
+    status: Literal["ok", "error"]
+    duration: float = 0.0
+    files: int = 0
+    bytes: int = 0
+    unchanged: int = 0
+    paths: list[str] = field(default_factory=list)
+    message: str = ""
+
+    @classmethod
+    def from_result(
+        cls,
+        installer: Installer,
+        result: Result[str, str],
+        duration: float,
+    ) -> InstallerRecord:
+        """Create a record from the result of an installer.
+
+        Args:
+            installer: The installer, whose stats are those of the run.
+            result: The result of the run.
+            duration: Seconds the run took.
+
+        Returns:
+            The record.
+        """
+        name = installer.config.name
+        match result:
+            case Ok(v):
+                stats = installer.stats
+                return cls(
+                    name=name,
+                    status="ok",
+                    duration=round(duration, 3),
+                    files=stats.copied,
+                    bytes=stats.bytes_copied,
+                    unchanged=stats.unchanged,
+                    paths=list(stats.paths),
+                    message=v,
+                )
+            case Err(e):
+                return cls(
+                    name=name,
+                    status="error",
+                    duration=round(duration, 3),
+                    message=e,
+                )
+
+        msg = f"Not a result: {result!r}"
+        raise TypeError(msg)
+
+
+class RecordWriter:
+    """Writes records to stdout in a machine readable format."""
+
+    def __init__(self, output: OutputFormat, key: str = "installers") -> None:
+        """Initialize the writer.
+
+        Args:
+            output: "json" or "ndjson".
+            key: Key of the list of records in the JSON document.
+        """
+        self.output = output
+        self.key = key
+        self.records: list[Mapping[str, object]] = []
+
+    def add(self, record: InstallerRecord | Mapping[str, object]) -> None:
+        """Write a record, or keep it for the JSON document.
+
+        Args:
+            record: The record.
+        """
+        if isinstance(record, InstallerRecord):
+            record = asdict(record)
+
+        if self.output == "ndjson":
+            click.echo(json.dumps(record, separators=(",", ":")))
+        else:
+            self.records.append(record)
+
+    def close(self) -> None:
+        """Write the JSON document, if the records were kept for it."""
+        if self.output == "json":
+            click.echo(json.dumps({self.key: self.records}, indent=2))
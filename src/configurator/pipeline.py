@@ -0,0 +1,262 @@
+"""The `cfg sync` pipeline, pulling the data repo and installing in one run.
+
+The steps that do not depend on each other overlap:
+
+    fetch ─────────┐
+                   ├─ from-local ─ commit ─ merge ─┬─ install
+    resolve paths ─┘                               └─ push
+
+Resolving the target paths of the installers, which may spawn subprocesses,
+runs while the data repo is fetched, and the local changes are pushed while
+the configs are installed. Fetching leaves the working tree as it is, so the
+local files are copied to the data repo and committed before the fetched
+changes are merged, and conflicting changes fail the merge instead of being
+overwritten.
+
+The blocking git and file system calls run in threads, each in a copy of the
+context so the trace spans are nested under the command.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import socket
+from typing import TYPE_CHECKING
+
+from result import Err, Ok, Result
+
+from configurator.installer.run import run_installers
+from configurator.installer.setup import (
+    get_installer_names,
+    resolve_installers,
+    use_source_manifest,
+)
+from configurator.manifest import get_source_manifest
+from configurator.repo import (
+    commit_paths,
+    fetch_data_repo,
+    get_repo_status,
+    merge_data_repo,
+    push_data_repo,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Sequence
+
+    from git import Repo
+
+    from configurator.installer.protocol import Installer
+    from configurator.settings import Settings
+    from configurator.snapshot import Snapshot
+
+    OnResult = Callable[[str, Result[str, str]], None]
+
+
+def default_message() -> str:
+    """Get the commit message for local changes pushed by `cfg sync`.
+
+    Returns:
+        The commit message, naming this host.
+    """
+    return f"Update configs from {socket.gethostname()}"
+
+
+def _split_resolved(
+    resolved: dict[str, Result[Installer, str]],
+    names: Sequence[str],
+    on_result: OnResult,
+) -> list[Installer]:
+    installers: list[Installer] = []
+
+    for name in dict.fromkeys(names):
+        match resolved[name]:
+            case Ok(installer):
+                installers.append(installer)
+            case Err(e):
+                on_result(name, Err(e))
+
+    return installers
+
+
+def _commit_local(
+    repo: Repo,
+    resolved: dict[str, Result[Installer, str]],
+    names: Sequence[str],
+    message: str,
+    on_result: OnResult,
+) -> Result[list[str], str]:
+    installers = _split_resolved(resolved, names, on_result)
+    if len(installers) < len(set(names)):
+        return Err("Local changes not copied, some configs could not be set up")
+
+    results = run_installers(installers, lambda i: i.write_to_source())
+    for installer, result in zip(installers, results, strict=True):
+        on_result(installer.config.name, result)
+        if isinstance(result, Err):
+            return Err(f"Failed to copy {installer.config.name} files to data repo")
+
+    match get_repo_status(repo):
+        case Ok(status):
+            prefixes = tuple(f"{i.config.name}/" for i in installers)
+            paths = [p for p in status.paths if p.startswith(prefixes)]
+        case Err(e):
+            return Err(e)
+
+    if not paths:
+        return Ok([])
+
+    # Committed before the merge, so conflicts with the fetched changes fail it
+    return commit_paths(repo, paths, message).map(lambda _: paths)
+
+
+async def _fetch_and_resolve(
+    settings: Settings,
+    names: Sequence[str],
+    sparse_dirs: Sequence[str],
+) -> Result[tuple[Repo, dict[str, Result[Installer, str]]], str]:
+    fetch = asyncio.create_task(
+        asyncio.to_thread(fetch_data_repo, settings, sparse_dirs),
+    )
+    if not settings.data_repo_dir.exists():
+        # The installer configs need the source directories the clone creates
+        await asyncio.wait([fetch])
+
+    # The data repo is not read while it is being fetched
+    resolved = await asyncio.to_thread(
+        resolve_installers,
+        names,
+        source_manifest=False,
+    )
+
+    match await fetch, resolved:
+        case Ok(repo), Ok(installers):
+            return Ok((repo, installers))
+        case Err(e), _:
+            return Err(e)
+        case _, Err(e):
+            return Err(e)
+
+    return Err("Unknown error occurred")
+
+
+async def _install(
+    resolved: dict[str, Result[Installer, str]],
+    names: Sequence[str],
+    snapshot: Snapshot | None,
+    jobs: int,
+    on_result: OnResult,
+) -> bool:
+    # The manifest is built again for the merged HEAD
+    get_source_manifest.cache_clear()
+
+    # Configs added by the merge have their source directories now
+    retry = [name for name in names if resolved[name].is_err()]
+    if retry:
+        match await asyncio.to_thread(resolve_installers, retry):
+            case Ok(v):
+                resolved.update(v)
+
+    installers = _split_resolved(resolved, names, on_result)
+    await asyncio.to_thread(use_source_manifest, installers)
+
+    results = await asyncio.to_thread(
+        run_installers,
+        installers,
+        lambda i: i.install(snapshot=snapshot),
+        jobs,
+    )
+    for installer, result in zip(installers, results, strict=True):
+        on_result(installer.config.name, result)
+
+    return len(installers) == len(set(names)) and all(r.is_ok() for r in results)
+
+
+async def _merge(repo: Repo, on_result: OnResult) -> bool:
+    match await asyncio.to_thread(merge_data_repo, repo):
+        case Ok(_):
+            on_result("pull", Ok("Data repo synced."))
+            return True
+        case Err(e):
+            on_result("pull", Err(e))
+
+    return False
+
+
+async def _push(repo: Repo, on_result: OnResult) -> bool:
+    match await asyncio.to_thread(push_data_repo, repo):
+        case Ok(_):
+            on_result("push", Ok("Local changes pushed to data repo."))
+            return True
+        case Err(e):
+            on_result("push", Err(e))
+
+    return False
+
+
+async def sync(  # noqa: PLR0913
+    settings: Settings,
+    names: Sequence[str] | None = None,
+    *,
+    from_local: Sequence[str] = (),
+    message: str | None = None,
+    jobs: int = 1,
+    snapshot: Snapshot | None = None,
+    on_result: OnResult,
+) -> bool:
+    """Pull the data repo, push local changes and install the configs.
+
+    Args:
+        settings: The settings with the data repo to sync.
+        names: Names of the configs to install, or None for all.
+        from_local: Names of the configs whose local files are copied to the
+            data repo, committed and pushed before the configs are installed.
+        message: Commit message for the local changes, see `default_message`.
+        jobs: Number of installers to run at the same time.
+        snapshot: Snapshot to record the target files in before they are
+            overwritten.
+        on_result: Called with the config name, or the "pull" or "push" step,
+            and its result as soon as it finishes.
+
+    Returns:
+        True if every step succeeded.
+    """
+    match get_installer_names():
+        case Ok(v):
+            all_names = v
+        case Err(e):
+            on_result("pull", Err(e))
+            return False
+
+    names = list(names or all_names)
+
+    match await _fetch_and_resolve(settings, [*names, *from_local], all_names):
+        case Ok((repo, resolved)):
+            pass
+        case Err(e):
+            on_result("pull", Err(e))
+            return False
+
+    committed: list[str] = []
+    if from_local:
+        match await asyncio.to_thread(
+            _commit_local,
+            repo,
+            resolved,
+            from_local,
+            message or default_message(),
+            on_result,
+        ):
+            case Ok(v):
+                committed = v
+            case Err(e):
+                on_result("push", Err(e))
+                return False
+
+    if not await _merge(repo, on_result):
+        return False
+
+    steps = [_install(resolved, names, snapshot, jobs, on_result)]
+    if committed:
+        steps.append(_push(repo, on_result))
+
+    return all(await asyncio.gather(*steps))
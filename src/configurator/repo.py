@@ -0,0 +1,356 @@
+"""Functions for cloning and updating the data repo."""
+from __future__ import annotations
+
+from contextlib import suppress
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+from urllib.parse import unquote, urlparse
+
+from git import GitCommandError, Repo
+from result import Err, Ok, Result
+
+from configurator import trace
+from configurator.settings import get_settings
+from configurator.util import in_macos, in_windows
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from configurator.settings import Settings
+
+
+def _reference_path(reference: str) -> str:
+    # `git clone --reference` takes a local path, also accept file:// URLs
+    if reference.startswith("file://"):
+        return unquote(urlparse(reference).path)
+
+    return reference
+
+
+def get_clone_options(settings: Settings) -> list[str]:
+    """Get the `git clone` options for the clone strategy in the settings.
+
+    Args:
+        settings: The settings to get the clone strategy from.
+
+    Returns:
+        The options to pass to `git clone`.
+    """
+    options: list[str] = []
+
+    if settings.clone_depth is not None:
+        options.append(f"--depth={settings.clone_depth}")
+    if settings.clone_filter is not None:
+        options.append(f"--filter={settings.clone_filter}")
+    if settings.sparse_checkout:
+        options.append("--sparse")
+    if settings.reference_repo is not None:
+        reference = _reference_path(settings.reference_repo)
+        options.extend([f"--reference-if-able={reference}", "--dissociate"])
+
+    return options
+
+
+def _set_sparse_checkout(
+    repo: Repo,
+    settings: Settings,
+    sparse_dirs: Sequence[str],
+) -> None:
+    if settings.sparse_checkout:
+        repo.git.sparse_checkout("set", "--cone", *sparse_dirs)
+    elif repo.config_reader().has_option("core", "sparseCheckout"):
+        repo.git.sparse_checkout("disable")
+
+
+def clone_data_repo(
+    settings: Settings,
+    sparse_dirs: Sequence[str] = (),
+) -> Result[Repo, str]:
+    """Clone the data repo, using the clone strategy in the settings.
+
+    Args:
+        settings: The settings with the data repo URL, directory and clone strategy.
+        sparse_dirs: Directories to check out when sparse checkout is enabled.
+
+    Returns:
+        A result containing the cloned repo, or an error message.
+    """
+    try:
+        with trace.span("git.clone"):
+            repo = Repo.clone_from(
+                settings.data_repo_url,
+                settings.data_repo_dir,
+                multi_options=get_clone_options(settings),
+            )
+        if settings.sparse_checkout:
+            _set_sparse_checkout(repo, settings, sparse_dirs)
+    except GitCommandError as e:
+        return Err(f"Failed to clone data repo: {e}")
+
+    return Ok(repo)
+
+
+def fetch_data_repo(
+    settings: Settings,
+    sparse_dirs: Sequence[str] = (),
+) -> Result[Repo, str]:
+    """Fetch changes to the data repo without merging them, cloning it if needed.
+
+    The working tree is left as it is, except for the sparse checkout, which is
+    updated to the given directories.
+
+    Args:
+        settings: The settings with the data repo URL, directory and clone strategy.
+        sparse_dirs: Directories to check out when sparse checkout is enabled.
+
+    Returns:
+        A result containing the repo, or an error message.
+    """
+    if not settings.data_repo_dir.exists():
+        return clone_data_repo(settings, sparse_dirs)
+
+    try:
+        repo = Repo(settings.data_repo_dir)
+        _set_sparse_checkout(repo, settings, sparse_dirs)
+        with trace.span("git.fetch"):
+            repo.remotes.origin.fetch()
+    except GitCommandError as e:
+        return Err(f"Failed to fetch data repo: {e}")
+
+    return Ok(repo)
+
+
+def merge_data_repo(repo: Repo) -> Result[Repo, str]:
+    """Merge the fetched changes into the checked out branch.
+
+    A merge that fails, e.g. on conflicts, is aborted.
+
+    Args:
+        repo: The repo to merge the changes of its upstream branch into.
+
+    Returns:
+        A result containing the repo, or an error message.
+    """
+    try:
+        with trace.span("git.merge"):
+            repo.git.merge("--no-edit", "@{upstream}")
+    except GitCommandError as e:
+        # Leave the local commit checked out without conflict markers
+        with suppress(GitCommandError):
+            repo.git.merge("--abort")
+        return Err(f"Failed to merge data repo changes: {e}")
+
+    return Ok(repo)
+
+
+def pull_data_repo(
+    settings: Settings,
+    sparse_dirs: Sequence[str] = (),
+) -> Result[Repo, str]:
+    """Pull changes to the data repo, cloning it if it does not exist yet.
+
+    Shallow clones only fetch the commits added since the last pull, and the
+    sparse checkout is updated to the given directories.
+
+    Args:
+        settings: The settings with the data repo URL, directory and clone strategy.
+        sparse_dirs: Directories to check out when sparse checkout is enabled.
+
+    Returns:
+        A result containing the repo, or an error message.
+    """
+    if not settings.data_repo_dir.exists():
+        return clone_data_repo(settings, sparse_dirs)
+
+    return fetch_data_repo(settings, sparse_dirs).and_then(merge_data_repo)
+
+
+@dataclass(frozen=True)
+class StatusEntry:
+    """A changed path in the data repo.
+
+    Attributes:
+        path: Path relative to the repo root.
+        index: Status of the path in the index, "." when unchanged, "?" when
+            untracked.
+        worktree: Status of the path in the working tree, "." when unchanged,
+            "?" when untracked.
+        orig_path: Path the file was renamed or copied from, if any.
+    """
+
+    path: str
+    index: str
+    worktree: str
+    orig_path: str | None = None
+
+    @property
+    def short(self) -> str:
+        """The two letter status code used by `git status --short`."""
+        if self.index == "?":
+            return "??"
+
+        return (self.index + self.worktree).replace(".", " ")
+
+
+@dataclass
+class RepoStatus:
+    """Status of the data repo.
+
+    Attributes:
+        branch: The checked out branch, or None if the HEAD is detached.
+        ahead: Commits on the branch that are not on its upstream.
+        behind: Commits on the upstream that are not on the branch.
+        entries: The changed paths.
+    """
+
+    branch: str | None = None
+    ahead: int = 0
+    behind: int = 0
+    entries: list[StatusEntry] = field(default_factory=list)
+
+    @property
+    def paths(self) -> list[str]:
+        """All changed paths, including the original paths of renames."""
+        paths: list[str] = []
+        for entry in self.entries:
+            paths.append(entry.path)
+            if entry.orig_path is not None:
+                paths.append(entry.orig_path)
+
+        return paths
+
+
+def parse_porcelain_v2(output: str) -> RepoStatus:
+    """Parse the output of `git status --porcelain=v2 --branch -z`.
+
+    Args:
+        output: The NUL separated status output.
+
+    Returns:
+        The parsed status.
+    """
+    status = RepoStatus()
+    records = iter(output.split("\0"))
+
+    for record in records:
+        kind, _, rest = record.partition(" ")
+        match kind:
+            case "#":
+                header, _, value = rest.partition(" ")
+                if header == "branch.head" and value != "(detached)":
+                    status.branch = value
+                elif header == "branch.ab":
+                    ahead, behind = value.split(" ")
+                    status.ahead, status.behind = int(ahead), -int(behind)
+            case "1":
+                fields = rest.split(" ", 7)
+                xy, path = fields[0], fields[7]
+                status.entries.append(StatusEntry(path, xy[0], xy[1]))
+            case "2":
+                fields = rest.split(" ", 8)
+                xy, path = fields[0], fields[8]
+                orig_path = next(records)
+                status.entries.append(StatusEntry(path, xy[0], xy[1], orig_path))
+            case "u":
+                fields = rest.split(" ", 9)
+                xy, path = fields[0], fields[9]
+                status.entries.append(StatusEntry(path, xy[0], xy[1]))
+            case "?":
+                status.entries.append(StatusEntry(rest, "?", "?"))
+
+    return status
+
+
+def get_repo_status(repo: Repo) -> Result[RepoStatus, str]:
+    """Get the status of a repo with a single `git status` pass.
+
+    The untracked cache is enabled for the call, so unchanged directories are
+    not walked again. With the `git_fsmonitor` setting, so is the builtin file
+    system monitor on platforms where git supports it. It is opt-in, as git
+    starts a daemon for it that keeps running after the call.
+
+    Args:
+        repo: The repo to get the status of.
+
+    Returns:
+        A result containing the status, or an error message.
+    """
+    config = ["-c", "core.untrackedCache=true"]
+    if get_settings().git_fsmonitor and (in_windows() or in_macos()):
+        config.extend(["-c", "core.fsmonitor=true"])
+
+    try:
+        with trace.span("git.status"):
+            output = repo.git.execute(
+                [
+                    "git",
+                    *config,
+                    "status",
+                    "--porcelain=v2",
+                    "--branch",
+                    "--untracked-files=all",
+                    "-z",
+                ],
+                strip_newline_in_stdout=False,
+            )
+    except GitCommandError as e:
+        return Err(f"Failed to get data repo status: {e}")
+
+    return Ok(parse_porcelain_v2(str(output)))
+
+
+def commit_paths(repo: Repo, paths: Sequence[str], message: str) -> Result[Repo, str]:
+    """Commit the given paths, including deletions.
+
+    Args:
+        repo: The repo to commit to.
+        paths: The changed paths to commit.
+        message: The commit message.
+
+    Returns:
+        A result containing the repo, or an error message.
+    """
+    try:
+        with trace.span("git.commit", files=len(paths)):
+            repo.git.add("--all", "--", *paths)
+            repo.index.commit(message)
+    except GitCommandError as e:
+        return Err(f"Failed to commit to data repo: {e}")
+
+    return Ok(repo)
+
+
+def push_data_repo(repo: Repo) -> Result[Repo, str]:
+    """Push the checked out branch of the data repo.
+
+    Args:
+        repo: The repo to push.
+
+    Returns:
+        A result containing the repo, or an error message.
+    """
+    try:
+        with trace.span("git.push"):
+            repo.remotes.origin.push()
+    except GitCommandError as e:
+        return Err(f"Failed to push data repo: {e}")
+
+    return Ok(repo)
+
+
+def commit_and_push(
+    repo: Repo,
+    paths: Sequence[str],
+    message: str,
+) -> Result[Repo, str]:
+    """Commit the given paths, including deletions, and push the commit.
+
+    Args:
+        repo: The repo to commit to.
+        paths: The changed paths to commit.
+        message: The commit message.
+
+    Returns:
+        A result containing the repo, or an error message.
+    """
+    return commit_paths(repo, paths, message).and_then(push_data_repo)
@@ -1,24 +1,42 @@
 """configurator settings."""
 from functools import lru_cache
 from pathlib import Path
+from typing import Literal
 
-from pydantic import computed_field
+from pydantic import Field, computed_field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from configurator import trace
+
 
 class _Settings(BaseSettings):
     model_config = SettingsConfigDict(env_prefix="HWCONFIG_")
     data_repo_url: str = "https://github.com/henrikwilhelmsen/config-files.git"
+    root_dir: Path = Field(default_factory=lambda: Path.home() / ".hwconfig")
+    incremental: bool = True
+    source_manifest: bool = True
+    templates: bool = False
+    install_strategy: Literal["copy", "hardlink", "symlink", "reflink"] = "copy"
+    path_cache_ttl: float | None = 7 * 24 * 60 * 60
+    clone_depth: int | None = None
+    clone_filter: str | None = None
+    sparse_checkout: bool = False
+    reference_repo: str | None = None
+    git_fsmonitor: bool = False
+    snapshot_retention: int = Field(default=20, ge=0)
+    watch_backend: Literal["auto", "inotify", "poll"] = "auto"
+    watch_poll_interval: float = Field(default=2.0, gt=0)
+    watch_debounce: float = Field(default=0.5, ge=0)
 
     @computed_field
     @property
-    def root_dir(self) -> Path:
-        return Path().home() / ".hwconfig"
+    def data_repo_dir(self) -> Path:
+        return self.root_dir / "data_repo"
 
     @computed_field
     @property
-    def data_repo_dir(self) -> Path:
-        return self.root_dir / "data_repo"
+    def cache_dir(self) -> Path:
+        return self.root_dir / "cache"
 
 
 Settings = _Settings
@@ -27,4 +45,5 @@ Settings = _Settings
 @lru_cache(maxsize=1)
 def get_settings() -> Settings:
     """Get the current settings."""
-    return _Settings()
+    with trace.span("settings.load"):
+        return _Settings()
@@ -0,0 +1,426 @@
+"""Content-addressed snapshots of installed config files.
+
+Before an install overwrites a target file, the current content of the file is
+stored as a blob named after its digest, and the path is recorded in the
+manifest of the snapshot. Identical content is only stored once, no matter how
+many snapshots, installs or hosts sharing the store refer to it, so a snapshot
+of an install that changed little costs almost nothing.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import stat
+import time
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from threading import Lock
+from typing import IO
+from uuid import uuid4
+
+from result import Err, Ok, Result
+
+from configurator.hashing import hash_file
+from configurator.settings import get_settings
+from configurator.util import dump_json_atomic, write_bytes_atomic
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Time of the last snapshot begun, to keep the identifiers increasing when the
+# clock is too coarse to tell snapshots begun in quick succession apart
+_last_ns = 0
+_last_ns_lock = Lock()
+
+
+def _next_ns() -> int:
+    global _last_ns  # noqa: PLW0603
+
+    with _last_ns_lock:
+        _last_ns = max(time.time_ns(), _last_ns + 1)
+        return _last_ns
+
+
+@dataclass
+class SnapshotEntry:
+    """A target file recorded in a snapshot.
+
+    Attributes:
+        path: Absolute path of the target file.
+        digest: Digest of the content of the file, or None if the file did not
+            exist, in which case restoring the snapshot removes it.
+        mode: Permission bits of the file.
+    """
+
+    path: str
+    digest: str | None
+    mode: int = 0o644
+
+
+@dataclass
+class Snapshot:
+    """The state of the target files changed by an install, before the install.
+
+    Attributes:
+        id: Identifier of the snapshot, sorting in the order they were taken.
+        created_at: Time the snapshot was taken, in seconds since the epoch.
+        label: What the snapshot was taken for, e.g. "install".
+        entries: The recorded files, by path.
+    """
+
+    id: str
+    created_at: float
+    label: str = ""
+    entries: dict[str, SnapshotEntry] = field(default_factory=dict)
+    _store: SnapshotStore | None = field(default=None, repr=False, compare=False)
+    _lock: Lock = field(default_factory=Lock, repr=False, compare=False)
+    _store_lock: IO[bytes] | None = field(default=None, repr=False, compare=False)
+
+    def add(self, path: Path) -> None:
+        """Record the current content of a file that is about to be changed.
+
+        Only the first call for a path records it, so the snapshot keeps the
+        content from before the install.
+
+        Args:
+            path: The target file.
+
+        Raises:
+            OSError: If the file can not be read or its content not stored.
+        """
+        key = os.fspath(path.absolute())
+
+        with self._lock:
+            if key in self.entries:
+                return
+
+        try:
+            file_stat = path.stat()
+        except FileNotFoundError:
+            entry = SnapshotEntry(path=key, digest=None)
+        else:
+            if not stat.S_ISREG(file_stat.st_mode):
+                return
+            if self._store is None:
+                msg = "Snapshot is not attached to a store"
+                raise OSError(msg)
+            digest = self._store.add_blob(path)
+            entry = SnapshotEntry(key, digest, stat.S_IMODE(file_stat.st_mode))
+
+        with self._lock:
+            self.entries.setdefault(key, entry)
+
+    def save(self) -> Result[Snapshot, str]:
+        """Persist the manifest of the snapshot, if any files were recorded.
+
+        Returns:
+            A result containing the snapshot, or an error message.
+        """
+        try:
+            if not self.entries:
+                return Ok(self)
+            if self._store is None:
+                return Err("Snapshot is not attached to a store")
+
+            return self._store.save(self)
+        finally:
+            # The blobs are referenced by the manifest now, gc may remove others
+            if self._store_lock is not None:
+                self._store_lock.close()
+                self._store_lock = None
+
+
+class SnapshotStore:
+    """Store of snapshots, with blobs shared by all snapshots in the store.
+
+    Blobs are stored under `blobs/`, in directories named after the first two
+    characters of the digest, and manifests under `manifests/`.
+
+    A snapshot holds a shared lock on the store from `begin` until it is
+    saved, as its blobs are not referenced by any manifest until then. `gc`
+    only removes blobs while it holds the lock exclusively, so it never
+    removes the blobs of a snapshot in progress, in this or another process.
+    """
+
+    def __init__(self, root: Path, retention: int = 20) -> None:
+        """Initialize the store.
+
+        Args:
+            root: The directory of the store.
+            retention: The number of snapshots kept by `gc`.
+        """
+        self.root = root
+        self.retention = retention
+
+    @property
+    def blob_dir(self) -> Path:
+        """The directory containing the blobs."""
+        return self.root / "blobs"
+
+    @property
+    def manifest_dir(self) -> Path:
+        """The directory containing the snapshot manifests."""
+        return self.root / "manifests"
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.blob_dir / digest[:2] / digest[2:]
+
+    def _open_lock(self, *, exclusive: bool) -> IO[bytes] | None:
+        # Returns the locked file, or None without file locks on the platform.
+        # The exclusive lock does not wait, raising BlockingIOError instead.
+        if fcntl is None:
+            return None
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        file = (self.root / "lock").open("ab")
+        try:
+            flags = fcntl.LOCK_EX | fcntl.LOCK_NB if exclusive else fcntl.LOCK_SH
+            fcntl.flock(file.fileno(), flags)
+        except OSError:
+            file.close()
+            raise
+
+        return file
+
+    def begin(self, label: str = "") -> Snapshot:
+        """Start a new, empty snapshot.
+
+        Args:
+            label: What the snapshot is taken for.
+
+        Returns:
+            The snapshot, saved to the store with `Snapshot.save`.
+        """
+        now_ns = _next_ns()
+        seconds, fraction = divmod(now_ns, 1_000_000_000)
+        timestamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(seconds))
+        try:
+            store_lock = self._open_lock(exclusive=False)
+        except OSError:
+            # Blobs are still written, only a concurrent gc could remove them
+            store_lock = None
+
+        return Snapshot(
+            # The fraction of the second sorts snapshots begun in the same
+            # second, the random part tells apart those of other processes
+            id=f"{timestamp}.{fraction:09d}-{uuid4().hex[:6]}",
+            created_at=now_ns / 1_000_000_000,
+            label=label,
+            _store=self,
+            _store_lock=store_lock,
+        )
+
+    def add_blob(self, path: Path) -> str:
+        """Store the content of a file, unless a blob with that content exists.
+
+        Args:
+            path: The file to store.
+
+        Raises:
+            OSError: If the file can not be read or the blob not written.
+
+        Returns:
+            The digest of the content.
+        """
+        digest = hash_file(path)
+        blob = self._blob_path(digest)
+
+        if not blob.exists():
+            match write_bytes_atomic(blob, path.read_bytes()):
+                case Err(e):
+                    raise OSError(e)
+
+        return digest
+
+    def save(self, snapshot: Snapshot) -> Result[Snapshot, str]:
+        """Persist the manifest of a snapshot.
+
+        Args:
+            snapshot: The snapshot to save.
+
+        Returns:
+            A result containing the snapshot, or an error message.
+        """
+        data = {
+            "id": snapshot.id,
+            "created_at": snapshot.created_at,
+            "label": snapshot.label,
+            "entries": [asdict(e) for e in snapshot.entries.values()],
+        }
+        match dump_json_atomic(self.manifest_dir / f"{snapshot.id}.json", data):
+            case Ok(_):
+                return Ok(snapshot)
+            case Err(e):
+                return Err(f"Failed to save snapshot: {e}")
+
+        return Err("Unknown error occurred")
+
+    def load(self, snapshot_id: str) -> Result[Snapshot, str]:
+        """Load a snapshot from the store.
+
+        Args:
+            snapshot_id: The identifier of the snapshot.
+
+        Returns:
+            A result containing the snapshot, or an error message.
+        """
+        file = self.manifest_dir / f"{snapshot_id}.json"
+
+        try:
+            with file.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return Err(f"Snapshot not found: {snapshot_id}")
+        except (OSError, ValueError) as e:
+            return Err(f"Failed to read snapshot {snapshot_id}: {e}")
+
+        entries = [SnapshotEntry(**e) for e in data["entries"]]
+        return Ok(
+            Snapshot(
+                id=data["id"],
+                created_at=data["created_at"],
+                label=data["label"],
+                entries={e.path: e for e in entries},
+                _store=self,
+            ),
+        )
+
+    def list_ids(self) -> list[str]:
+        """List the identifiers of the snapshots in the store, oldest first.
+
+        Returns:
+            The snapshot identifiers.
+        """
+        if not self.manifest_dir.exists():
+            return []
+
+        return sorted(p.stem for p in self.manifest_dir.glob("*.json"))
+
+    def restore(self, snapshot: Snapshot) -> Result[list[str], str]:
+        """Restore the files recorded in a snapshot.
+
+        Args:
+            snapshot: The snapshot to restore.
+
+        Returns:
+            A result containing the restored paths, or an error message.
+        """
+        restored: list[str] = []
+
+        for entry in snapshot.entries.values():
+            path = Path(entry.path)
+            try:
+                if entry.digest is None:
+                    path.unlink(missing_ok=True)
+                else:
+                    data = self._blob_path(entry.digest).read_bytes()
+                    match write_bytes_atomic(path, data):
+                        case Err(e):
+                            return Err(e)
+                    path.chmod(entry.mode)
+            except OSError as e:
+                return Err(f"Failed to restore {path}: {e}")
+
+            restored.append(entry.path)
+
+        return Ok(restored)
+
+    def rollback(self, snapshot_id: str | None = None) -> Result[list[str], str]:
+        """Restore the target files to their state before a snapshot was taken.
+
+        The given snapshot, and all snapshots taken after it, are restored
+        newest first and then removed from the store. Without an identifier,
+        only the latest snapshot is rolled back.
+
+        Args:
+            snapshot_id: The identifier of the oldest snapshot to roll back.
+
+        Returns:
+            A result containing the restored paths, or an error message.
+        """
+        ids = self.list_ids()
+        if not ids:
+            return Err("No snapshots to roll back")
+
+        snapshot_id = snapshot_id or ids[-1]
+        if snapshot_id not in ids:
+            return Err(f"Snapshot not found: {snapshot_id}")
+
+        restored: set[str] = set()
+
+        for i in reversed(ids[ids.index(snapshot_id) :]):
+            match self.load(i).and_then(self.restore):
+                case Ok(v):
+                    restored.update(v)
+                case Err(e):
+                    return Err(e)
+
+            (self.manifest_dir / f"{i}.json").unlink()
+
+        self.gc()
+        return Ok(sorted(restored))
+
+    def gc(self) -> Result[int, str]:
+        """Remove the oldest snapshots beyond the retention, and unused blobs.
+
+        Unused blobs are left for a later gc while any snapshot is in progress.
+
+        Returns:
+            A result containing the number of removed blobs, or an error message.
+        """
+        ids = self.list_ids()
+        expired = ids[: max(len(ids) - self.retention, 0)]
+
+        try:
+            for i in expired:
+                (self.manifest_dir / f"{i}.json").unlink()
+
+            store_lock = self._open_lock(exclusive=True)
+        except BlockingIOError:
+            return Ok(0)
+        except OSError as e:
+            return Err(f"Failed to clean up snapshots: {e}")
+
+        try:
+            return self._remove_unused_blobs(ids[len(expired) :])
+        finally:
+            if store_lock is not None:
+                store_lock.close()
+
+    def _remove_unused_blobs(self, ids: list[str]) -> Result[int, str]:
+        used: set[str | None] = set()
+        for i in ids:
+            match self.load(i):
+                case Ok(snapshot):
+                    used.update(e.digest for e in snapshot.entries.values())
+                case Err(e):
+                    # Never remove blobs a snapshot might still refer to
+                    return Err(e)
+
+        removed = 0
+        try:
+            for blob in self.blob_dir.glob("*/*"):
+                # Skip blobs that are still being written
+                if not blob.name.startswith(".") and (
+                    blob.parent.name + blob.name not in used
+                ):
+                    blob.unlink()
+                    removed += 1
+        except OSError as e:
+            return Err(f"Failed to clean up snapshots: {e}")
+
+        return Ok(removed)
+
+
+@lru_cache(maxsize=1)
+def get_snapshot_store() -> SnapshotStore:
+    """Get the snapshot store in the settings root directory."""
+    settings = get_settings()
+    return SnapshotStore(
+        settings.root_dir / "snapshots",
+        retention=settings.snapshot_retention,
+    )
@@ -0,0 +1,489 @@
+"""Templated config files, rendered with variables of the host.
+
+With the `templates` setting enabled, source files ending in `.tmpl` are
+rendered when they are installed, and the output is written to the target
+without the suffix. Templates have a small
+syntax of their own, which does not clash with the `$variables` of shell and
+fish configs:
+
+    set -x EDITOR {{ env.EDITOR }}
+    {% if host.wsl %}
+    set -x BROWSER wslview
+    {% elif host.name == "work-laptop" %}
+    set -x BROWSER firefox
+    {% else %}
+    set -x BROWSER xdg-open
+    {% endif %}
+
+The newline after a `{% %}` tag is removed, so tags can be on lines of their
+own. Variables are named `host.*`, `env.*` and `settings.*`, see
+`get_template_variables`. Conditions test if a variable is set and truthy, or
+compare it with a quoted string using `==` or `!=`, optionally negated with
+`not`. Substituting a variable that is not set is an error.
+
+Rendering is cached at three levels. Templates are compiled once per content
+digest, output is kept per template and variables digest, and a record of the
+last render to each target lets an install on an unchanged host skip reading,
+rendering and writing the template entirely. The variables digest only covers
+the variables the template uses, so unrelated changes to the environment do
+not invalidate it.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import socket
+import sys
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from threading import Lock
+from typing import TYPE_CHECKING
+
+from result import Err, Ok, Result
+
+from configurator.hashing import HashCache, get_hash_cache
+from configurator.settings import get_settings
+from configurator.util import (
+    dump_json_atomic,
+    in_linux,
+    in_macos,
+    in_windows,
+    in_wsl,
+    write_bytes_if_changed,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Mapping
+
+CACHE_VERSION = 1
+TEMPLATE_SUFFIX = ".tmpl"
+
+_TOKEN_RE = re.compile(r"\{\{\s*(.*?)\s*\}\}|\{%\s*(.*?)\s*%\}\n?", re.DOTALL)
+_NAME_RE = re.compile(r"[A-Za-z_][\w.]*")
+_CONDITION_RE = re.compile(
+    r"(?P<not>not\s+)?(?P<name>[A-Za-z_][\w.]*)"
+    r"(?:\s*(?P<op>==|!=)\s*(?P<quote>[\"'])(?P<value>.*?)(?P=quote))?",
+)
+
+
+class TemplateError(ValueError):
+    """Raised when a template can not be compiled or rendered."""
+
+
+def _format(value: object) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+
+    return str(value)
+
+
+@dataclass(frozen=True)
+class _Condition:
+    name: str
+    negate: bool = False
+    op: str | None = None
+    value: str = ""
+
+    def test(self, variables: Mapping[str, object]) -> bool:
+        value = variables.get(self.name)
+        match self.op:
+            case "==":
+                result = value is not None and _format(value) == self.value
+            case "!=":
+                result = value is None or _format(value) != self.value
+            case _:
+                result = bool(value)
+
+        return result != self.negate
+
+
+@dataclass
+class _Block:
+    # Branches of an if block, the else branch has no condition
+    branches: list[tuple[_Condition | None, list[_Node]]] = field(default_factory=list)
+
+
+_Node = str | tuple[str] | _Block
+
+
+def _parse_condition(expression: str) -> _Condition:
+    match = _CONDITION_RE.fullmatch(expression)
+    if match is None:
+        msg = f"Invalid condition: {expression}"
+        raise TemplateError(msg)
+
+    return _Condition(
+        name=match["name"],
+        negate=match["not"] is not None,
+        op=match["op"],
+        value=match["value"] or "",
+    )
+
+
+class Template:
+    """A compiled template."""
+
+    def __init__(self, text: str) -> None:
+        """Compile a template.
+
+        Args:
+            text: The template text.
+
+        Raises:
+            TemplateError: If the template syntax is invalid.
+        """
+        self.names: set[str] = set()
+        self._nodes = self._compile(text)
+
+    def _compile(self, text: str) -> list[_Node]:
+        root: list[_Node] = []
+        # The nodes being added to, and the open if blocks
+        nodes = root
+        blocks: list[tuple[_Block, list[_Node]]] = []
+        pos = 0
+
+        for match in _TOKEN_RE.finditer(text):
+            if match.start() > pos:
+                nodes.append(text[pos : match.start()])
+            pos = match.end()
+
+            if match[1] is not None:
+                if not _NAME_RE.fullmatch(match[1]):
+                    msg = f"Invalid variable name: {match[1]}"
+                    raise TemplateError(msg)
+                self.names.add(match[1])
+                nodes.append((match[1],))
+                continue
+
+            nodes = self._tag(match[2], nodes, blocks)
+
+        if blocks:
+            msg = "Missing {% endif %}"
+            raise TemplateError(msg)
+
+        if pos < len(text):
+            nodes.append(text[pos:])
+
+        return root
+
+    def _tag(
+        self,
+        text: str,
+        nodes: list[_Node],
+        blocks: list[tuple[_Block, list[_Node]]],
+    ) -> list[_Node]:
+        # Returns the nodes to add the nodes after the tag to
+        tag, _, expression = text.partition(" ")
+        in_branch = bool(blocks) and blocks[-1][0].branches[-1][0] is not None
+        match tag:
+            case "if":
+                block = _Block()
+                nodes.append(block)
+                blocks.append((block, nodes))
+                return self._branch(block, expression)
+            case "elif" if in_branch:
+                return self._branch(blocks[-1][0], expression)
+            case "else" if in_branch:
+                nodes = []
+                blocks[-1][0].branches.append((None, nodes))
+                return nodes
+            case "endif" if blocks:
+                _, nodes = blocks.pop()
+                return nodes
+
+        msg = f"Unexpected tag: {text}"
+        raise TemplateError(msg)
+
+    def _branch(self, block: _Block, expression: str) -> list[_Node]:
+        condition = _parse_condition(expression.strip())
+        self.names.add(condition.name)
+        nodes: list[_Node] = []
+        block.branches.append((condition, nodes))
+        return nodes
+
+    def render(self, variables: Mapping[str, object]) -> str:
+        """Render the template.
+
+        Args:
+            variables: The variables by name.
+
+        Raises:
+            TemplateError: If a substituted variable is not set.
+
+        Returns:
+            The rendered text.
+        """
+        out: list[str] = []
+        self._render(self._nodes, variables, out)
+        return "".join(out)
+
+    def _render(
+        self,
+        nodes: list[_Node],
+        variables: Mapping[str, object],
+        out: list[str],
+    ) -> None:
+        for node in nodes:
+            match node:
+                case str():
+                    out.append(node)
+                case (name,):
+                    if name not in variables:
+                        msg = f"Variable is not set: {name}"
+                        raise TemplateError(msg)
+                    out.append(_format(variables[name]))
+                case _Block(branches):
+                    for condition, branch in branches:
+                        if condition is None or condition.test(variables):
+                            self._render(branch, variables, out)
+                            break
+
+
+def variables_digest(variables: Mapping[str, object], names: Iterable[str]) -> str:
+    """Compute a digest of the values of the given variables.
+
+    Args:
+        variables: The variables by name.
+        names: The names of the variables to include, e.g. the names a
+            template uses.
+
+    Returns:
+        The hex digest.
+    """
+    values = {name: variables.get(name) for name in sorted(names)}
+    data = json.dumps(values, default=str, separators=(",", ":")).encode()
+    return hashlib.sha1(data, usedforsecurity=False).hexdigest()
+
+
+def get_template_variables(home: Path | None = None) -> dict[str, object]:
+    """Get the variables templates are rendered with.
+
+    Args:
+        home: Home directory the templates are installed to, defaults to the
+            current user.
+
+    Returns:
+        The host facts as `host.*`, the environment variables as `env.*` and
+        the settings as `settings.*`.
+    """
+    variables: dict[str, object] = {
+        "host.name": socket.gethostname(),
+        "host.platform": sys.platform,
+        "host.home": str(home or Path.home()),
+        "host.wsl": in_wsl(),
+        "host.windows": in_windows(),
+        "host.linux": in_linux(),
+        "host.macos": in_macos(),
+    }
+    variables.update((f"env.{k}", v) for k, v in os.environ.items())
+    variables.update(
+        (f"settings.{k}", v) for k, v in get_settings().model_dump().items()
+    )
+    return variables
+
+
+class TemplateCache:
+    """Cache of compiled templates, rendered output and renders to targets.
+
+    The records of the renders to each target are persisted, keyed by the
+    absolute target path, and validated against the size and modification
+    time of the target file.
+    """
+
+    def __init__(
+        self,
+        variables: Mapping[str, object],
+        hash_cache: HashCache | None = None,
+        file: Path | None = None,
+    ) -> None:
+        """Initialize the cache, loading any records persisted to `file`.
+
+        Args:
+            variables: The variables to render the templates with.
+            hash_cache: Cache of the template digests.
+            file: The file the records are persisted to, or None for an
+                in-memory cache.
+        """
+        self.variables = variables
+        self.hash_cache = hash_cache or HashCache()
+        self.file = file
+        self._templates: dict[str, Template] = {}
+        self._output: dict[tuple[str, str], bytes] = {}
+        self._records: dict[str, list[object]] = {}
+        self._dirty = False
+        self._lock = Lock()
+
+        if file is not None:
+            self._load(file)
+
+    def _load(self, file: Path) -> None:
+        try:
+            with file.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if data.get("version") == CACHE_VERSION:
+            self._records = data["records"]
+
+    def _render(
+        self,
+        source: Path,
+        source_stat: os.stat_result | None,
+    ) -> tuple[bytes, str, list[str]]:
+        digest = self.hash_cache.digest(source, source_stat)
+
+        with self._lock:
+            template = self._templates.get(digest)
+        if template is None:
+            template = Template(source.read_text(encoding="utf-8"))
+            with self._lock:
+                self._templates[digest] = template
+
+        names = sorted(template.names)
+        key = (digest, variables_digest(self.variables, names))
+        with self._lock:
+            data = self._output.get(key)
+        if data is None:
+            data = template.render(self.variables).encode("utf-8")
+            with self._lock:
+                self._output[key] = data
+
+        return data, digest, names
+
+    def render(
+        self,
+        source: Path,
+        source_stat: os.stat_result | None = None,
+    ) -> bytes:
+        """Render a template file.
+
+        Args:
+            source: The template file.
+            source_stat: The stat result of the template file, if already known.
+
+        Raises:
+            OSError: If the template can not be read.
+            TemplateError: If the template can not be compiled or rendered.
+
+        Returns:
+            The rendered content.
+        """
+        data, _, _ = self._render(source, source_stat)
+        return data
+
+    def is_current(
+        self,
+        source: Path,
+        source_stat: os.stat_result | None,
+        target: Path,
+    ) -> bool:
+        """Check if the target is the output of the last render of the template.
+
+        Only the cache records and the stat results are compared, the files
+        are not read.
+
+        Args:
+            source: The template file.
+            source_stat: The stat result of the template file, if already known.
+            target: The target file.
+
+        Returns:
+            True if the template and its variables are unchanged since it was
+            last rendered to the target, and the target has not changed since.
+        """
+        with self._lock:
+            record = self._records.get(os.fspath(target.absolute()))
+        if record is None:
+            return False
+
+        digest, names, vars_digest, size, mtime_ns = record
+        try:
+            target_stat = target.stat()
+        except FileNotFoundError:
+            return False
+
+        return (
+            (target_stat.st_size, target_stat.st_mtime_ns) == (size, mtime_ns)
+            and self.hash_cache.digest(source, source_stat) == digest
+            and variables_digest(self.variables, names) == vars_digest
+        )
+
+    def install(
+        self,
+        source: Path,
+        source_stat: os.stat_result | None,
+        target: Path,
+        before_write: Callable[[Path], None] | None = None,
+    ) -> Result[bool, str]:
+        """Render a template to a target file, unless it is current.
+
+        Args:
+            source: The template file.
+            source_stat: The stat result of the template file, if already known.
+            target: The target file.
+            before_write: Called with the target before it is written.
+
+        Returns:
+            A result containing True if the target was written, or an error
+            message.
+        """
+        if self.is_current(source, source_stat, target):
+            return Ok(False)  # noqa: FBT003
+
+        try:
+            data, digest, names = self._render(source, source_stat)
+        except (OSError, TemplateError) as e:
+            return Err(f"Failed to render {source.name}: {e}")
+
+        match write_bytes_if_changed(target, data, before_write):
+            case Ok(changed):
+                target_stat = target.stat()
+                record = [
+                    digest,
+                    names,
+                    variables_digest(self.variables, names),
+                    target_stat.st_size,
+                    target_stat.st_mtime_ns,
+                ]
+                with self._lock:
+                    self._records[os.fspath(target.absolute())] = record
+                    self._dirty = True
+                return Ok(changed)
+            case Err(e):
+                return Err(e)
+
+        return Err("Unknown error occurred")
+
+    def save(self) -> Result[None, str]:
+        """Persist the records to the cache file, if they have changed.
+
+        Returns:
+            A result containing None, or an error message.
+        """
+        if self.file is None or not self._dirty:
+            return Ok(None)
+
+        with self._lock:
+            data = {"version": CACHE_VERSION, "records": self._records}
+            match dump_json_atomic(self.file, data):
+                case Err(e):
+                    return Err(f"Failed to save template cache: {e}")
+                case Ok(_):
+                    self._dirty = False
+
+        return Ok(None)
+
+
+@lru_cache(maxsize=1)
+def get_template_cache() -> TemplateCache:
+    """Get the template cache persisted in the settings cache directory."""
+    return TemplateCache(
+        get_template_variables(),
+        hash_cache=get_hash_cache(),
+        file=get_settings().cache_dir / "templates.json",
+    )
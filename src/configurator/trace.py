@@ -0,0 +1,241 @@
+"""Timing instrumentation for the CLI.
+
+Code is instrumented with nested spans, which record their wall time and any
+attributes set on them, e.g. the number of files and bytes an installer copied:
+
+    with trace.span("install", name="fish"):
+        ...
+        trace.set_attrs(files=3, bytes=1024)
+
+Spans are only recorded while a tracer is active, otherwise `span` is a cheap
+no-op. The recorded spans are written as JSON lines, one object per span, or in
+the Chrome trace event format, which can be opened in `chrome://tracing` or
+Perfetto.
+
+This module only uses the standard library, so it can be imported when the CLI
+starts without slowing it down.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from itertools import count
+from typing import TYPE_CHECKING, Any, Literal
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from contextlib import AbstractContextManager
+    from pathlib import Path
+
+TraceFormat = Literal["jsonl", "chrome"]
+
+_span_ids = count(1)
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+_tracer: Tracer | None = None
+
+
+@dataclass
+class Span:
+    """A timed operation.
+
+    Attributes:
+        name: Name of the operation.
+        id: Identifier of the span, unique within the process.
+        parent_id: Identifier of the enclosing span, if any.
+        start_ns: Start of the span, in nanoseconds since the tracer started.
+        duration_ns: Wall time of the span in nanoseconds.
+        thread_id: Identifier of the thread the span ran in.
+        attrs: Attributes of the span, e.g. the files and bytes copied.
+    """
+
+    name: str
+    id: int
+    parent_id: int | None
+    start_ns: int
+    duration_ns: int = 0
+    thread_id: int = 0
+    attrs: dict[str, Any] = field(default_factory=dict)
+
+
+class Tracer:
+    """Collects the finished spans of a process."""
+
+    def __init__(self) -> None:
+        """Initialize the tracer, starting its clock."""
+        self.origin_ns = time.perf_counter_ns()
+        self.started_at = time.time()
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[Span]:  # noqa: ANN401
+        """Record a span around the body of the `with` statement.
+
+        Args:
+            name: Name of the operation.
+            **attrs: Attributes of the span.
+
+        Yields:
+            The span, finished when the `with` statement exits.
+        """
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            id=next(_span_ids),
+            parent_id=parent.id if parent is not None else None,
+            start_ns=time.perf_counter_ns() - self.origin_ns,
+            thread_id=threading.get_ident(),
+            attrs=attrs,
+        )
+        token = _current_span.set(span)
+
+        try:
+            yield span
+        except BaseException as e:
+            span.attrs["error"] = type(e).__name__
+            raise
+        finally:
+            _current_span.reset(token)
+            span.duration_ns = time.perf_counter_ns() - self.origin_ns - span.start_ns
+            with self._lock:
+                self.spans.append(span)
+
+    def to_json_lines(self) -> str:
+        """Format the spans as JSON lines, oldest first.
+
+        Every line includes the host name and process ID, so traces collected
+        from many hosts can be told apart.
+
+        Returns:
+            One JSON object per span, separated by newlines.
+        """
+        host = socket.gethostname()
+        pid = os.getpid()
+        lines = [
+            json.dumps(
+                {
+                    "name": s.name,
+                    "id": s.id,
+                    "parent_id": s.parent_id,
+                    "start": self.started_at + s.start_ns / 1e9,
+                    "duration_ms": s.duration_ns / 1e6,
+                    "host": host,
+                    "pid": pid,
+                    "thread": s.thread_id,
+                    **s.attrs,
+                },
+                default=str,
+            )
+            for s in sorted(self.spans, key=lambda s: s.start_ns)
+        ]
+        return "".join(f"{line}\n" for line in lines)
+
+    def to_chrome_trace(self) -> str:
+        """Format the spans in the Chrome trace event format.
+
+        Returns:
+            The trace as a JSON document.
+        """
+        pid = os.getpid()
+        events = [
+            {
+                "name": s.name,
+                "ph": "X",
+                "ts": s.start_ns / 1e3,
+                "dur": s.duration_ns / 1e3,
+                "pid": pid,
+                "tid": s.thread_id,
+                "args": s.attrs,
+            }
+            for s in self.spans
+        ]
+        data = {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"host": socket.gethostname()},
+        }
+        return json.dumps(data, default=str)
+
+    def write(self, file: Path | None, fmt: TraceFormat | None = None) -> None:
+        """Write the recorded spans to a file.
+
+        JSON lines are appended to the file, so the spans of many commands can
+        be collected in one file. A Chrome trace replaces the file.
+
+        Args:
+            file: The file to write, or None to write to stderr.
+            fmt: The format to write, defaults to Chrome trace for `.json`
+                files and JSON lines otherwise.
+
+        Raises:
+            OSError: If the file can not be written.
+        """
+        if fmt is None:
+            fmt = "chrome" if file is not None and file.suffix == ".json" else "jsonl"
+
+        data = self.to_chrome_trace() if fmt == "chrome" else self.to_json_lines()
+
+        if file is None:
+            sys.stderr.write(data)
+        elif fmt == "chrome":
+            file.write_text(data, encoding="utf-8")
+        else:
+            with file.open("a", encoding="utf-8") as f:
+                f.write(data)
+
+
+def start() -> Tracer:
+    """Start recording spans in this process.
+
+    Returns:
+        The active tracer.
+    """
+    global _tracer  # noqa: PLW0603
+    _tracer = Tracer()
+    return _tracer
+
+
+def stop() -> Tracer | None:
+    """Stop recording spans.
+
+    Returns:
+        The tracer that was active, if any.
+    """
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def span(name: str, **attrs: Any) -> AbstractContextManager[Span | None]:  # noqa: ANN401
+    """Record a span, if a tracer is active.
+
+    Args:
+        name: Name of the operation.
+        **attrs: Attributes of the span.
+
+    Returns:
+        A context manager recording the span, yielding None when not tracing.
+    """
+    if _tracer is None:
+        return nullcontext()
+
+    return _tracer.span(name, **attrs)
+
+
+def set_attrs(**attrs: Any) -> None:  # noqa: ANN401
+    """Set attributes on the current span, if any.
+
+    Args:
+        **attrs: The attributes to set.
+    """
+    current = _current_span.get()
+    if current is not None and _tracer is not None:
+        current.attrs.update(attrs)
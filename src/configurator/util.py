@@ -1,7 +1,11 @@
 """Utility functions."""
 import json
+import os
 import platform
+from collections.abc import Callable
 from pathlib import Path
+from shutil import copymode
+from threading import get_ident
 
 from result import Err, Ok, Result
 
@@ -21,6 +25,11 @@ def in_linux() -> bool:
     return platform.system() == "Linux"
 
 
+def in_macos() -> bool:
+    """Check if the current platform is macOS."""
+    return platform.system() == "Darwin"
+
+
 def ensure_dir(directory: Path) -> Path:
     """Ensure the given directory exists.
 
@@ -31,7 +40,7 @@ def ensure_dir(directory: Path) -> Path:
         Path to the directory.
     """
     if not directory.exists():
-        directory.mkdir(parents=True)
+        directory.mkdir(parents=True, exist_ok=True)
 
     return directory
 
@@ -68,3 +77,80 @@ def get_json_data_from_file(file: Path) -> Result[dict[str, str], str]:
             return Ok(json.load(f))
     except PermissionError as e:
         return Err(str(e))
+
+
+def write_bytes_atomic(file: Path, data: bytes) -> Result[Path, str]:
+    """Write data to a file, replacing it atomically.
+
+    The data is written to a temporary file next to the target, which then
+    replaces the target, so readers never see a partially written file and a
+    crash never leaves the target truncated.
+
+    Args:
+        file: The file to write.
+        data: The data to write.
+
+    Returns:
+        A result containing the path to the file, or an error message.
+    """
+    tmp_file = file.with_name(f".{file.name}.{os.getpid()}.{get_ident()}.tmp")
+
+    try:
+        ensure_dir(file.parent)
+        with tmp_file.open("wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if file.exists():
+            copymode(file, tmp_file)
+        tmp_file.replace(file)
+    except OSError as e:
+        tmp_file.unlink(missing_ok=True)
+        return Err(f"Failed to write {file}: {e}")
+
+    return Ok(file)
+
+
+def write_bytes_if_changed(
+    file: Path,
+    data: bytes,
+    before_write: Callable[[Path], None] | None = None,
+) -> Result[bool, str]:
+    """Atomically write data to a file, unless the file already has that content.
+
+    Args:
+        file: The file to write.
+        data: The data to write.
+        before_write: Called with the file before it is written, e.g. to back it up.
+
+    Returns:
+        A result containing True if the file was written, or an error message.
+    """
+    try:
+        if file.read_bytes() == data:
+            return Ok(False)  # noqa: FBT003
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        return Err(f"Failed to read {file}: {e}")
+
+    if before_write is not None:
+        try:
+            before_write(file)
+        except OSError as e:
+            return Err(f"Failed to back up {file}: {e}")
+
+    return write_bytes_atomic(file, data).map(lambda _: True)
+
+
+def dump_json_atomic(file: Path, data: object) -> Result[Path, str]:
+    """Write JSON data to a file, replacing it atomically.
+
+    Args:
+        file: The file to write.
+        data: The JSON serializable data to write.
+
+    Returns:
+        A result containing the path to the file, or an error message.
+    """
+    return write_bytes_atomic(file, json.dumps(data, separators=(",", ":")).encode())
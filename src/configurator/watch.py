@@ -0,0 +1,466 @@
+"""Watch the config sources and targets, and sync the files that change.
+
+Changes in a source directory are installed to the target, and changes to the
+target files that are tracked in the source are copied back to the source.
+Only the files that changed are synced, and only by the installer they belong
+to. Bursts of changes, e.g. an editor saving through a temporary file or a
+`git pull`, are batched until the file system has been quiet for a while.
+
+On Linux the directories are watched with inotify, so an idle watch does not
+wake up at all. Elsewhere, or when inotify is not available, the directories
+are polled.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Protocol
+
+from configurator.installer.copy import CopyInstaller
+from configurator.installer.sync import iter_files
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator, Sequence
+    from threading import Event
+
+    from result import Result
+
+    from configurator.installer.protocol import Installer
+
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CLOSE_WRITE = 0x00000008
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# Writes are only reported once the file is closed, not for every write call
+INOTIFY_MASK = (
+    IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_CREATE | IN_DELETE | IN_ONLYDIR
+)
+INOTIFY_EVENT = struct.Struct("iIII")
+
+# A batch is applied after this many debounce periods, even if changes continue
+MAX_BATCH_PERIODS = 10
+
+
+class Watcher(Protocol):
+    """Watches directories for changed files."""
+
+    def add(self, directory: Path, *, recursive: bool) -> None:
+        """Watch a directory, if it is not already watched.
+
+        Args:
+            directory: The directory to watch.
+            recursive: Also watch the subdirectories, including new ones.
+        """
+        ...
+
+    def read(self, timeout: float | None) -> set[Path]:
+        """Wait for changes.
+
+        Args:
+            timeout: Seconds to wait for changes, or None to wait until there are.
+
+        Returns:
+            The changed paths. A directory means all files in it may have changed.
+        """
+        ...
+
+    def close(self) -> None:
+        """Stop watching."""
+        ...
+
+
+class InotifyWatcher:
+    """Watcher using the Linux inotify API."""
+
+    def __init__(self) -> None:
+        """Initialize the inotify instance.
+
+        Raises:
+            OSError: If inotify is not available.
+        """
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+
+        self._roots: set[Path] = set()
+        self._watches: dict[int, tuple[Path, bool]] = {}
+        self._watched: set[Path] = set()
+
+    def add(self, directory: Path, *, recursive: bool) -> None:
+        """Watch a directory, if it is not already watched.
+
+        Args:
+            directory: The directory to watch.
+            recursive: Also watch the subdirectories, including new ones.
+
+        Raises:
+            OSError: If the directory can not be watched, e.g. when the inotify
+                watch limit is reached.
+        """
+        self._roots.add(directory)
+        directories = [directory]
+        if recursive:
+            directories.extend(
+                Path(d) / n for d, ns, _ in os.walk(directory) for n in ns
+            )
+
+        for d in directories:
+            if d in self._watched:
+                continue
+
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(d), INOTIFY_MASK)
+            if wd < 0:
+                code = ctypes.get_errno()
+                if code in {errno.ENOENT, errno.ENOTDIR}:
+                    continue  # removed since it was listed
+                raise OSError(code, os.strerror(code), os.fspath(d))
+
+            self._watches[wd] = (d, recursive)
+            self._watched.add(d)
+
+    def read(self, timeout: float | None) -> set[Path]:
+        """Wait for changes.
+
+        Args:
+            timeout: Seconds to wait for changes, or None to wait until there are.
+
+        Returns:
+            The changed paths. A directory means all files in it may have changed.
+        """
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        return set(self._parse(data))
+
+    def _parse(self, data: bytes) -> Iterator[Path]:
+        offset = 0
+
+        while offset < len(data):
+            wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            start = offset + INOTIFY_EVENT.size
+            name = os.fsdecode(data[start : start + length].rstrip(b"\0"))
+            offset = start + length
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped, anything may have changed
+                yield from self._roots
+                continue
+
+            if wd not in self._watches:
+                continue
+
+            directory, recursive = self._watches[wd]
+            if mask & IN_IGNORED:
+                del self._watches[wd]
+                self._watched.discard(directory)
+                continue
+
+            path = directory / name
+            if not mask & IN_ISDIR:
+                yield path
+            elif mask & (IN_CREATE | IN_MOVED_TO):
+                if recursive:
+                    self.add(path, recursive=True)
+                yield path
+
+    def close(self) -> None:
+        """Stop watching."""
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """Watcher comparing the size and modification time of files at an interval."""
+
+    def __init__(self, interval: float = 2.0) -> None:
+        """Initialize the watcher.
+
+        Args:
+            interval: Seconds between scans of the watched directories.
+        """
+        self.interval = interval
+        self._directories: dict[Path, bool] = {}
+        self._state: dict[Path, tuple[int, int]] = {}
+
+    def add(self, directory: Path, *, recursive: bool) -> None:
+        """Watch a directory, if it is not already watched.
+
+        Args:
+            directory: The directory to watch.
+            recursive: Also watch the subdirectories, including new ones.
+        """
+        if directory not in self._directories:
+            self._directories[directory] = recursive
+            self._state.update(self._scan_directory(directory, recursive=recursive))
+
+    def _scan_directory(
+        self,
+        directory: Path,
+        *,
+        recursive: bool,
+    ) -> Iterator[tuple[Path, tuple[int, int]]]:
+        try:
+            if recursive:
+                for _, path, path_stat in iter_files(directory):
+                    if path_stat is not None:
+                        yield path, (path_stat.st_size, path_stat.st_mtime_ns)
+                return
+
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        entry_stat = entry.stat()
+                        yield (
+                            Path(entry.path),
+                            (entry_stat.st_size, entry_stat.st_mtime_ns),
+                        )
+        except OSError:
+            return
+
+    def read(self, timeout: float | None) -> set[Path]:
+        """Wait for changes, scanning the watched directories at the interval.
+
+        Args:
+            timeout: Seconds to wait for changes, or None to wait until there are.
+
+        Returns:
+            The changed paths.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            delay = self.interval
+            if deadline is not None:
+                delay = min(delay, max(deadline - time.monotonic(), 0))
+            time.sleep(delay)
+
+            state: dict[Path, tuple[int, int]] = {}
+            for directory, recursive in self._directories.items():
+                state.update(self._scan_directory(directory, recursive=recursive))
+
+            changed = {
+                p
+                for p in state.keys() | self._state.keys()
+                if state.get(p) != self._state.get(p)
+            }
+            self._state = state
+
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self) -> None:
+        """Stop watching."""
+        self._directories.clear()
+
+
+def make_watcher(backend: str = "auto", poll_interval: float = 2.0) -> Watcher:
+    """Create a watcher for the given backend.
+
+    Args:
+        backend: "inotify", "poll", or "auto" to use inotify when available.
+        poll_interval: Seconds between scans of the polling watcher.
+
+    Raises:
+        OSError: If inotify was requested but is not available.
+
+    Returns:
+        The watcher.
+    """
+    if backend == "inotify" or (backend == "auto" and sys.platform == "linux"):
+        try:
+            return InotifyWatcher()
+        except (OSError, AttributeError):
+            if backend == "inotify":
+                raise
+
+    return PollingWatcher(poll_interval)
+
+
+@dataclass
+class Changes:
+    """Files changed since the last sync, relative to the installer directories.
+
+    Attributes:
+        source: Changed files in the source directory.
+        target: Changed files in the target directory that are tracked in the source.
+    """
+
+    source: set[str] = field(default_factory=set)
+    target: set[str] = field(default_factory=set)
+
+    def __bool__(self) -> bool:
+        """True if any files changed."""
+        return bool(self.source or self.target)
+
+
+def _source_files(source: Path, rel_dir: str) -> Iterator[str]:
+    prefix = f"{rel_dir}/" if rel_dir else ""
+    try:
+        for rel_path, _, _ in iter_files(source / rel_dir):
+            yield prefix + rel_path
+    except OSError:
+        return
+
+
+def _relative(path: Path, root: Path) -> str | None:
+    try:
+        rel_path = path.relative_to(root).as_posix()
+    except ValueError:
+        return None
+
+    return "" if rel_path == "." else rel_path
+
+
+def group_changes(
+    installers: Iterable[Installer],
+    paths: Iterable[Path],
+) -> dict[str, Changes]:
+    """Group changed paths by the installer and side they belong to.
+
+    Args:
+        installers: The watched installers.
+        paths: The changed paths.
+
+    Returns:
+        The changes by installer name, for installers with changes.
+    """
+    grouped: dict[str, Changes] = {}
+    paths = list(paths)
+
+    for installer in installers:
+        source, target = installer.config.source, installer.config.target
+        changes = Changes()
+
+        for path in paths:
+            if (rel_path := _relative(path, source)) is not None:
+                if path.is_dir() or rel_path == "":
+                    changes.source.update(_source_files(source, rel_path))
+                else:
+                    changes.source.add(rel_path)
+            elif (rel_path := _relative(path, target)) is not None:
+                # The target may be shared, only files tracked in the source count
+                if (source / rel_path).is_dir() or rel_path == "":
+                    changes.target.update(_source_files(source, rel_path))
+                elif (source / rel_path).is_file():
+                    changes.target.add(rel_path)
+
+        if changes:
+            grouped[installer.config.name] = changes
+
+    return grouped
+
+
+def apply_changes(installer: Installer, changes: Changes) -> list[Result[str, str]]:
+    """Sync the changed files of an installer.
+
+    Source changes win over target changes to the same file. Installers that
+    can not sync single files are installed in full when their source changes.
+
+    Args:
+        installer: The installer the changes belong to.
+        changes: The changed files.
+
+    Returns:
+        The results of syncing the changes.
+    """
+    results: list[Result[str, str]] = []
+    copy_installer = installer if isinstance(installer, CopyInstaller) else None
+
+    if changes.source:
+        if copy_installer is not None:
+            results.append(copy_installer.sync_paths(sorted(changes.source)))
+        else:
+            results.append(installer.install())
+
+    target_only = changes.target - changes.source
+    if target_only and copy_installer is not None:
+        results.append(copy_installer.sync_paths(sorted(target_only), to_source=True))
+
+    return results
+
+
+def add_watches(watcher: Watcher, installers: Iterable[Installer]) -> None:
+    """Watch the source and target directories of the installers.
+
+    Source directories are watched recursively. In the target, only the
+    directories that also exist in the source are watched, so a target like the
+    home directory is never watched as a whole.
+
+    Args:
+        watcher: The watcher to add the directories to.
+        installers: The installers to watch.
+    """
+    for installer in installers:
+        source, target = installer.config.source, installer.config.target
+        watcher.add(source, recursive=True)
+
+        source_dirs = {""}
+        for rel_path in _source_files(source, ""):
+            parts = rel_path.split("/")[:-1]
+            source_dirs.update("/".join(parts[: i + 1]) for i in range(len(parts)))
+
+        for rel_dir in sorted(source_dirs):
+            if (target / rel_dir).is_dir():
+                watcher.add(target / rel_dir, recursive=False)
+
+
+def watch(
+    installers: Sequence[Installer],
+    watcher: Watcher,
+    on_result: Callable[[str, Result[str, str]], None],
+    debounce: float = 0.5,
+    stop: Event | None = None,
+) -> None:
+    """Sync the installers whenever their files change, until stopped.
+
+    Args:
+        installers: The installers to watch.
+        watcher: The watcher used to wait for changes.
+        on_result: Called with the installer name and result of each sync.
+        debounce: Seconds without changes before a batch of changes is synced.
+        stop: Event to stop watching, checked after every `debounce` seconds.
+            Without it, the watch only stops when interrupted.
+    """
+    by_name = {i.config.name: i for i in installers}
+    add_watches(watcher, installers)
+    idle_timeout = None if stop is None else debounce
+
+    while stop is None or not stop.is_set():
+        paths = watcher.read(idle_timeout)
+        if not paths:
+            continue
+
+        deadline = time.monotonic() + debounce * MAX_BATCH_PERIODS
+        while time.monotonic() < deadline and (more := watcher.read(debounce)):
+            paths |= more
+
+        for name, changes in group_changes(installers, paths).items():
+            for result in apply_changes(by_name[name], changes):
+                on_result(name, result)
+
+        # Installs may have created target directories to watch
+        add_watches(watcher, installers)
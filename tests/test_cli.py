@@ -0,0 +1,212 @@
+"""CLI tests."""
+import json
+from collections.abc import Iterator
+from pathlib import Path
+from threading import Event
+from unittest.mock import MagicMock
+
+import pytest
+from click.testing import CliRunner
+from result import Err, Ok
+
+from configurator.cli import cfg
+from configurator.hashing import HashCache
+from configurator.installer.config import InstallerConfig
+from configurator.installer.copy import CopyInstaller
+from configurator.settings import get_settings
+
+
+@pytest.fixture(name="installer")
+def fixture_installer(
+    monkeypatch: pytest.MonkeyPatch,
+    test_source_dir: Path,
+    test_target_dir: Path,
+) -> CopyInstaller:
+    """A CopyInstaller returned as the only installer for the platform.
+
+    Args:
+        monkeypatch: Fixture for patching the installer setup.
+        test_source_dir: Fixture containing the path to the test source data directory.
+        test_target_dir: Fixture containing the path to the test target data directory.
+
+    Returns:
+        The CopyInstaller used by the CLI commands.
+    """
+    config = InstallerConfig(
+        name="test",
+        source=test_source_dir,
+        target=test_target_dir,
+    )
+    installer = CopyInstaller(config, hash_cache=HashCache())
+    monkeypatch.setattr(
+        "configurator.installer.setup.get_installers",
+        lambda names=None: Ok([installer]),  # noqa: ARG005
+    )
+    return installer
+
+
+def test_check_drift(installer: CopyInstaller) -> None:
+    """Test that check reports drift as JSON and exits with 1."""
+    result = CliRunner().invoke(cfg, ["check", "--json"])
+
+    assert result.exit_code == 1
+    report = json.loads(result.output)["installers"][0]
+    assert report["name"] == installer.config.name
+    assert report["status"] == "drift"
+    assert report["missing"] == ["foo/bar"]
+
+
+def test_check_ndjson(installer: CopyInstaller) -> None:
+    """Test that check prints one JSON record per installer, and nothing else."""
+    result = CliRunner().invoke(cfg, ["check", "--output", "ndjson"])
+
+    assert result.exit_code == 1
+    lines = result.stdout.splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0])["name"] == installer.config.name
+    assert json.loads(lines[0])["status"] == "drift"
+
+
+def test_check_after_install(installer: CopyInstaller) -> None:
+    """Test that check exits with 0 after installing."""
+    installer.install()
+
+    result = CliRunner().invoke(cfg, ["check"])
+
+    assert result.exit_code == 0
+    assert "test: up to date" in result.output
+
+
+def test_check_profile(installer: CopyInstaller, tmp_path: Path) -> None:
+    """Test that --profile writes nested spans as JSON lines."""
+    trace_file = tmp_path / "trace.jsonl"
+    installer.install()
+
+    result = CliRunner().invoke(cfg, ["--profile", str(trace_file), "check"])
+
+    assert result.exit_code == 0
+    spans = [json.loads(line) for line in trace_file.read_text().splitlines()]
+    root, run = spans
+    assert root["name"] == "cfg check"
+    assert run["name"] == "installer.run"
+    assert run["installer"] == "test"
+    assert run["parent_id"] == root["id"]
+
+
+def test_from_local_summary(
+    monkeypatch: pytest.MonkeyPatch,
+    installer: CopyInstaller,
+) -> None:
+    """Test that from-local lists the copied files of all configs once."""
+    installer.install()
+    (installer.config.target / "foo" / "bar").write_text("changed")
+    monkeypatch.setattr(
+        "configurator.installer.setup.resolve_installers",
+        lambda names: Ok({n: Ok(installer) for n in names}),
+    )
+
+    result = CliRunner().invoke(cfg, ["from-local", "--dry-run", "test"])
+
+    assert result.exit_code == 0
+    assert "Would copy 1 files to the data repo:" in result.output
+    assert "   test/foo/bar" in result.output
+
+
+@pytest.fixture(name="no_snapshots")
+def fixture_no_snapshots(monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    """Disable the snapshots taken by installs.
+
+    Args:
+        monkeypatch: Fixture for patching the settings.
+
+    Yields:
+        Nothing, the settings are reset after the test.
+    """
+    monkeypatch.setenv("HWCONFIG_SNAPSHOT_RETENTION", "0")
+    get_settings.cache_clear()
+    yield
+    get_settings.cache_clear()
+
+
+@pytest.mark.usefixtures("no_snapshots")
+def test_install_ndjson(installer: CopyInstaller) -> None:
+    """Test that install prints one JSON record per installer."""
+    installer.config.incremental = True
+
+    result = CliRunner().invoke(cfg, ["install", "--output", "ndjson"])
+
+    assert result.exit_code == 0
+    record = json.loads(result.output)
+    assert record["name"] == installer.config.name
+    assert record["status"] == "ok"
+    assert record["files"] == 1
+    assert record["bytes"] == (installer.config.source / "foo" / "bar").stat().st_size
+    assert record["paths"] == ["foo/bar"]
+    assert record["duration"] >= 0
+
+
+@pytest.mark.usefixtures("no_snapshots")
+def test_install_failure_exit_code(
+    monkeypatch: pytest.MonkeyPatch,
+    installer: CopyInstaller,
+) -> None:
+    """Test that install exits with 1 and reports the error when an installer fails."""
+    monkeypatch.setattr(installer, "install", lambda snapshot: Err("broken"))  # noqa: ARG005
+
+    result = CliRunner().invoke(cfg, ["install", "-o", "json"])
+
+    assert result.exit_code == 1
+    (record,) = json.loads(result.output)["installers"]
+    assert record["status"] == "error"
+    assert record["message"] == "broken"
+
+
+@pytest.mark.usefixtures("no_snapshots")
+def test_install_jobs_output_order(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that parallel installs print their results in installer order."""
+    fast_done = Event()
+    installers = [MagicMock(), MagicMock()]
+    installers[0].install.side_effect = lambda snapshot: (  # noqa: ARG005
+        Ok("Installed slow") if fast_done.wait(5) else Err("timeout")
+    )
+    installers[1].install.side_effect = lambda snapshot: (  # noqa: ARG005
+        fast_done.set() or Ok("Installed fast")
+    )
+    monkeypatch.setattr(
+        "configurator.installer.setup.get_installers",
+        lambda names=None: Ok(installers),  # noqa: ARG005
+    )
+
+    result = CliRunner().invoke(cfg, ["install", "--jobs", "2"])
+
+    assert result.exit_code == 0
+    assert result.stdout.index("Installed slow") < result.stdout.index("Installed fast")
+
+
+def test_install_setup_error_exit_code(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that install exits with 2 when the installers can not be set up."""
+    monkeypatch.setattr(
+        "configurator.installer.setup.get_installers",
+        lambda: Err("Unsupported platform."),
+    )
+
+    result = CliRunner().invoke(cfg, ["install", "-o", "ndjson"])
+
+    assert result.exit_code == 2  # noqa: PLR2004
+    assert not result.stdout
+    assert "Unsupported platform." in result.stderr
+
+
+def test_list_json(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that list prints the config names as JSON."""
+    monkeypatch.setattr(
+        "configurator.installer.names.get_config_names",
+        lambda: Ok(["fish", "hyper"]),
+    )
+
+    result = CliRunner().invoke(cfg, ["list", "--output", "json"])
+
+    assert result.exit_code == 0
+    assert json.loads(result.output) == {
+        "configs": [{"name": "fish"}, {"name": "hyper"}],
+    }
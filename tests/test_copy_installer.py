@@ -5,8 +5,10 @@ from unittest.mock import MagicMock
 import pytest
 from result import Err, Ok
 
+from configurator.hashing import HashCache
 from configurator.installer.config import InstallerConfig
 from configurator.installer.copy import CopyInstaller
+from configurator.installer.sync import InstallStrategy, iter_files
 
 
 @pytest.fixture(name="mock_config")
@@ -54,3 +56,266 @@ def test_install_fail(
     monkeypatch.setattr("configurator.installer.copy.copytree", mock_copytree)
     result = installer.install()
     assert isinstance(result, Err)
+
+
+@pytest.fixture(name="incremental_installer")
+def fixture_incremental_installer(
+    test_source_dir: Path,
+    test_target_dir: Path,
+    tmp_path_factory: pytest.TempPathFactory,
+) -> CopyInstaller:
+    """A CopyInstaller with incremental installs enabled.
+
+    Args:
+        test_source_dir: Fixture containing the path to the test source data directory.
+        test_target_dir: Fixture containing the path to the test target data directory.
+        tmp_path_factory: Factory for the directory holding the hash cache.
+
+    Returns:
+        A CopyInstaller with incremental installs enabled.
+    """
+    config = InstallerConfig(
+        name="test",
+        source=test_source_dir,
+        target=test_target_dir,
+        incremental=True,
+    )
+    cache_file = tmp_path_factory.mktemp("cache") / "hashes.json"
+    return CopyInstaller(config, hash_cache=HashCache(cache_file))
+
+
+def test_install_incremental(incremental_installer: CopyInstaller) -> None:
+    """Test that only files differing from the target are copied."""
+    result = incremental_installer.install()
+    assert isinstance(result, Ok)
+    assert incremental_installer.stats.copied == 1
+    assert incremental_installer.stats.unchanged == 1
+    assert (incremental_installer.config.target / "foo" / "bar").exists()
+
+    result = incremental_installer.install()
+    assert isinstance(result, Ok)
+    assert incremental_installer.stats.copied == 0
+    assert incremental_installer.stats.unchanged == 2  # noqa: PLR2004
+
+
+def test_install_incremental_changed_content(tmp_path: Path) -> None:
+    """Test that a target file with the same size but other content is replaced."""
+    source = tmp_path / "source"
+    target = tmp_path / "target"
+    source.mkdir()
+    target.mkdir()
+    (source / "config.fish").write_text("set -x EDITOR vim")
+    (target / "config.fish").write_text("set -x EDITOR vi ")
+
+    config = InstallerConfig(
+        name="test",
+        source=source,
+        target=target,
+        incremental=True,
+    )
+    installer = CopyInstaller(config, hash_cache=HashCache())
+    result = installer.install()
+
+    assert isinstance(result, Ok)
+    assert installer.stats.copied == 1
+    assert (target / "config.fish").read_text() == "set -x EDITOR vim"
+
+
+def test_install_incremental_saves_cache(incremental_installer: CopyInstaller) -> None:
+    """Test that the hash cache is persisted after an incremental install."""
+    incremental_installer.install()
+    assert incremental_installer.hash_cache is not None
+    assert incremental_installer.hash_cache.file is not None
+    assert incremental_installer.hash_cache.file.exists()
+
+
+@pytest.fixture(name="home_installer")
+def fixture_home_installer(tmp_path: Path) -> CopyInstaller:
+    """A CopyInstaller with a home directory like target.
+
+    Args:
+        tmp_path: Fixture containing a tmp directory for the source and target.
+
+    Returns:
+        A CopyInstaller whose target contains files not tracked in the source.
+    """
+    source = tmp_path / "source"
+    target = tmp_path / "home"
+    (source / "conf.d").mkdir(parents=True)
+    (target / "conf.d").mkdir(parents=True)
+    (target / "Downloads").mkdir()
+
+    (source / ".hyper.js").write_text("fontSize: 12")
+    (source / "conf.d" / "abbr.fish").write_text("abbr g git")
+    (target / ".hyper.js").write_text("fontSize: 14")
+    (target / "conf.d" / "abbr.fish").write_text("abbr g git")
+    (target / "conf.d" / "local.fish").write_text("set -x LOCAL 1")
+    (target / "Downloads" / "big.iso").write_text("iso")
+
+    config = InstallerConfig(name="test", source=source, target=target)
+    return CopyInstaller(config, hash_cache=HashCache())
+
+
+def test_write_to_source_only_changed_tracked_files(
+    home_installer: CopyInstaller,
+) -> None:
+    """Test that only tracked files that differ are copied back to the source."""
+    result = home_installer.write_to_source()
+
+    assert isinstance(result, Ok)
+    assert home_installer.stats.paths == [".hyper.js"]
+    assert home_installer.stats.unchanged == 1
+    source = home_installer.config.source
+    assert (source / ".hyper.js").read_text() == "fontSize: 14"
+    assert sorted(p.name for p in source.rglob("*")) == [
+        ".hyper.js",
+        "abbr.fish",
+        "conf.d",
+    ]
+
+
+def test_write_to_source_dry_run(home_installer: CopyInstaller) -> None:
+    """Test that a dry run reports the files without copying them."""
+    result = home_installer.write_to_source(dry_run=True)
+
+    assert isinstance(result, Ok)
+    assert ".hyper.js" in result.ok_value
+    assert (home_installer.config.source / ".hyper.js").read_text() == "fontSize: 12"
+
+
+def test_check_reports_drift(home_installer: CopyInstaller) -> None:
+    """Test that modified, missing and extra files are reported."""
+    (home_installer.config.source / "conf.d" / "new.fish").write_text("abbr l ls")
+
+    result = home_installer.check()
+
+    assert isinstance(result, Ok)
+    assert result.ok_value.modified == [".hyper.js"]
+    assert result.ok_value.missing == ["conf.d/new.fish"]
+    # Untracked top level files and directories in the target are not extra
+    assert result.ok_value.extra == ["conf.d/local.fish"]
+
+
+@pytest.fixture(name="link_config")
+def fixture_link_config(tmp_path: Path) -> InstallerConfig:
+    """An InstallerConfig with a single source file and an empty target.
+
+    Args:
+        tmp_path: Fixture containing a tmp directory for the source and target.
+
+    Returns:
+        An InstallerConfig for the source and target.
+    """
+    source = tmp_path / "source"
+    target = tmp_path / "target"
+    (source / "functions").mkdir(parents=True)
+    target.mkdir()
+    (source / "functions" / "ll.fish").write_text("function ll; ls -l; end")
+
+    return InstallerConfig(name="test", source=source, target=target)
+
+
+def test_install_hardlink(link_config: InstallerConfig) -> None:
+    """Test that hard linked files share the source inode and are not copied back."""
+    link_config.strategy = "hardlink"
+    installer = CopyInstaller(link_config, hash_cache=HashCache())
+
+    result = installer.install()
+    assert isinstance(result, Ok)
+    assert installer.stats.linked == 1
+
+    source_file = link_config.source / "functions" / "ll.fish"
+    target_file = link_config.target / "functions" / "ll.fish"
+    assert source_file.stat().st_ino == target_file.stat().st_ino
+
+    result = installer.write_to_source()
+    assert isinstance(result, Ok)
+    assert installer.stats.copied == 0
+    assert installer.stats.unchanged == 1
+
+
+def test_install_symlink(link_config: InstallerConfig) -> None:
+    """Test that symlinked files point to the source files."""
+    link_config.strategy = "symlink"
+    installer = CopyInstaller(link_config, hash_cache=HashCache())
+
+    result = installer.install()
+    assert isinstance(result, Ok)
+
+    target_file = link_config.target / "functions" / "ll.fish"
+    assert target_file.is_symlink()
+    assert target_file.resolve() == (link_config.source / "functions" / "ll.fish")
+
+    result = installer.install()
+    assert isinstance(result, Ok)
+    assert installer.stats.unchanged == 1
+
+
+@pytest.mark.parametrize("strategy", ["hardlink", "symlink"])
+def test_install_links_copies(
+    link_config: InstallerConfig,
+    strategy: InstallStrategy,
+) -> None:
+    """Test that files copied before switching to a link strategy are linked."""
+    CopyInstaller(link_config, hash_cache=HashCache()).install()
+    link_config.strategy = strategy
+    installer = CopyInstaller(link_config, hash_cache=HashCache())
+
+    result = installer.install()
+    assert isinstance(result, Ok)
+    assert installer.stats.linked == 1
+
+    source_file = link_config.source / "functions" / "ll.fish"
+    target_file = link_config.target / "functions" / "ll.fish"
+    assert source_file.samefile(target_file)
+
+
+def test_install_link_fallback(
+    monkeypatch: pytest.MonkeyPatch,
+    link_config: InstallerConfig,
+) -> None:
+    """Test that files are copied when they can not be linked."""
+    monkeypatch.setattr(
+        "configurator.installer.sync.os.link",
+        MagicMock(side_effect=OSError("Operation not permitted")),
+    )
+    link_config.strategy = "hardlink"
+    installer = CopyInstaller(link_config, hash_cache=HashCache())
+
+    result = installer.install()
+    assert isinstance(result, Ok)
+    assert installer.stats.copied == 1
+    assert installer.stats.linked == 0
+
+    target_file = link_config.target / "functions" / "ll.fish"
+    assert target_file.read_text() == "function ll; ls -l; end"
+    assert list(target_file.parent.iterdir()) == [target_file]
+
+
+def test_exclude_rules(home_installer: CopyInstaller, tmp_path: Path) -> None:
+    """Test that excluded files are not installed, copied back or extra."""
+    source, target = home_installer.config.source, home_installer.config.target
+    (source / "conf.d" / "abbr.fish.swp").write_text("swap")
+    (source / ".cfgignore").write_text("*.swp\nlocal.fish\n")
+
+    home_installer.install()
+    result = home_installer.check()
+
+    assert sorted(home_installer.stats.paths) == [".hyper.js", "conf.d/abbr.fish"]
+    assert not (target / "conf.d" / "abbr.fish.swp").exists()
+    assert not (target / ".cfgignore").exists()
+    assert isinstance(result, Ok)
+    assert not result.ok_value.drifted
+
+    # The listing from the data repo manifest is filtered too
+    copy_target = tmp_path / "copy"
+    copy_target.mkdir()
+    config = InstallerConfig(
+        name="test",
+        source=source,
+        target=copy_target,
+        incremental=True,
+    )
+    installer = CopyInstaller(config, source_files=list(iter_files(source)))
+    installer.install()
+    assert sorted(installer.stats.paths) == [".hyper.js", "conf.d/abbr.fish"]
@@ -0,0 +1,201 @@
+"""Daemon tests."""
+import io
+import json
+import os
+import subprocess
+import sys
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from threading import Thread
+
+import pytest
+from result import Ok
+
+import configurator
+from configurator.daemon import (
+    DaemonServer,
+    get_socket_path,
+    run_in_daemon,
+    start_daemon,
+    stop_daemon,
+)
+from configurator.fleet import RootResult
+from configurator.hashing import HashCache, get_hash_cache
+from configurator.installer.config import InstallerConfig
+from configurator.installer.copy import CopyInstaller
+from configurator.settings import get_settings
+
+
+@pytest.fixture(name="installer")
+def fixture_installer(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    test_source_dir: Path,
+    test_target_dir: Path,
+) -> Iterator[CopyInstaller]:
+    """A CopyInstaller returned as the only installer, with a tmp root directory.
+
+    Args:
+        tmp_path: Fixture containing a tmp directory for the hwconfig root.
+        monkeypatch: Fixture for patching the settings and installer setup.
+        test_source_dir: Fixture containing the path to the test source data directory.
+        test_target_dir: Fixture containing the path to the test target data directory.
+
+    Yields:
+        The CopyInstaller used by the commands.
+    """
+    monkeypatch.setenv("HWCONFIG_ROOT_DIR", (tmp_path / "hwconfig").as_posix())
+    monkeypatch.setenv("HWCONFIG_SNAPSHOT_RETENTION", "0")
+    get_settings.cache_clear()
+
+    config = InstallerConfig(
+        name="test",
+        source=test_source_dir,
+        target=test_target_dir,
+    )
+    installer = CopyInstaller(config, hash_cache=HashCache())
+    monkeypatch.setattr(
+        "configurator.installer.setup.get_installers",
+        lambda names=None: Ok([installer]),  # noqa: ARG005
+    )
+
+    yield installer
+    get_settings.cache_clear()
+
+
+@pytest.fixture(name="daemon")
+def fixture_daemon(installer: CopyInstaller) -> Iterator[DaemonServer]:  # noqa: ARG001
+    """A daemon serving requests in a thread.
+
+    Args:
+        installer: Fixture containing the installer the daemon runs.
+
+    Yields:
+        The daemon server.
+    """
+    server = start_daemon().unwrap()
+    thread = Thread(target=server.serve)
+    thread.start()
+
+    yield server
+    if thread.is_alive():
+        stop_daemon()
+    thread.join()
+    server.server_close()
+
+
+def _run(args: list[str]) -> tuple[int | None, str, str]:
+    """Run a command in the daemon, collecting its output."""
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    code = run_in_daemon(args, stdout, stderr)
+    return code, stdout.getvalue(), stderr.getvalue()
+
+
+@pytest.mark.usefixtures("daemon")
+def test_daemon_runs_commands() -> None:
+    """Test that the daemon streams the output and exit code of commands."""
+    code, out, _ = _run(["check", "--json"])
+    assert code == 1
+    assert json.loads(out)["installers"][0]["status"] == "drift"
+
+    code, out, _ = _run(["install", "--output", "ndjson"])
+    assert code == 0
+    assert "foo/bar" in json.loads(out)["paths"]
+
+    code, out, _ = _run(["check"])
+    assert code == 0
+    assert "test: up to date" in out
+
+
+@pytest.mark.usefixtures("daemon")
+def test_daemon_runs_in_client_directory(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that relative paths are resolved from the directory of the client."""
+    client_dir = tmp_path / "client"
+    (client_dir / "roots" / "a").mkdir(parents=True)
+    installed: list[Path] = []
+
+    def install_roots(roots: Iterable[Path], jobs: int) -> Iterator[RootResult]:  # noqa: ARG001
+        for root in roots:
+            installed.append(root.resolve())
+            yield RootResult(root=root)
+
+    monkeypatch.setattr("configurator.fleet.install_roots", install_roots)
+
+    # A client process, as the daemon thread shares the directory of the tests
+    code = (
+        "import sys\n"
+        "from configurator.daemon import run_in_daemon\n"
+        "code = run_in_daemon(['install', '--root', 'roots/a'])\n"
+        "sys.exit(3 if code is None else code)\n"
+    )
+    env = os.environ.copy()
+    env["PYTHONPATH"] = Path(configurator.__file__).parents[1].as_posix()
+    client = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", code],
+        capture_output=True,
+        check=False,
+        cwd=client_dir,
+        encoding="utf-8",
+        env=env,
+    )
+
+    assert client.returncode == 0, client.stderr
+    assert installed == [client_dir / "roots" / "a"]
+    assert Path.cwd() != client_dir
+
+
+@pytest.mark.usefixtures("daemon")
+def test_daemon_reloads_changed_caches(test_source_dir: Path) -> None:
+    """Test that caches are loaded again when another process changed their file."""
+    get_hash_cache.cache_clear()
+    hash_cache = get_hash_cache()
+    _run(["check"])
+    _run(["check"])
+    assert get_hash_cache() is hash_cache
+
+    # Another process saves the cache
+    other = HashCache(hash_cache.file)
+    other.digest(test_source_dir / "foo" / "bar")
+    assert other.save().is_ok()
+
+    _run(["check"])
+    assert get_hash_cache() is not hash_cache
+    assert get_hash_cache()._entries == other._entries  # noqa: SLF001
+    get_hash_cache.cache_clear()
+
+
+@pytest.mark.usefixtures("daemon")
+def test_daemon_only_serves_some_commands() -> None:
+    """Test that other commands are left to run in-process."""
+    assert _run(["status"]) == (None, "", "")
+
+
+@pytest.mark.usefixtures("installer")
+def test_no_daemon_runs_in_process(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that commands run in-process without a daemon, or when disabled."""
+    assert _run(["check"])[0] is None
+
+    # A socket left behind by a daemon that is gone
+    get_socket_path().parent.mkdir(parents=True)
+    get_socket_path().touch()
+    assert _run(["check"])[0] is None
+
+    monkeypatch.setenv("HWCONFIG_DAEMON", "0")
+    server = start_daemon().unwrap()
+    assert _run(["check"])[0] is None
+    server.server_close()
+
+
+def test_stop_daemon(daemon: DaemonServer) -> None:
+    """Test that a daemon can be stopped, removing its socket."""
+    assert start_daemon().is_err()
+
+    assert stop_daemon().is_ok()
+    daemon.server_close()
+
+    assert not get_socket_path().exists()
+    assert stop_daemon().is_err()
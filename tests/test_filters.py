@@ -0,0 +1,72 @@
+"""Include and exclude rule tests."""
+from pathlib import Path
+
+import pytest
+
+from configurator.installer.filters import PathFilter, load_path_filter
+from configurator.installer.sync import iter_files
+
+
+@pytest.mark.parametrize(
+    ("pattern", "path", "excluded"),
+    [
+        ("*.swp", ".config.fish.swp", True),
+        ("*.swp", "functions/.ll.fish.swp", True),
+        ("*.swp", "functions/ll.fish", False),
+        ("/cache", "cache/big.bin", True),
+        ("/cache", "plugins/cache/big.bin", False),
+        ("cache/", "plugins/cache/big.bin", True),
+        ("cache/", "cache", False),
+        ("plugins/**/*.log", "plugins/a/b/c.log", True),
+        ("plugins/**/*.log", "plugins/c.log", True),
+        ("plugins/**/*.log", "other/c.log", False),
+        ("file[0-9].conf", "file1.conf", True),
+        ("file[!0-9].conf", "file1.conf", False),
+    ],
+)
+def test_exclude_patterns(pattern: str, path: str, excluded: bool) -> None:  # noqa: FBT001
+    """Test the glob syntax of the exclude patterns."""
+    assert PathFilter(exclude=[pattern])(path) is not excluded
+
+
+def test_include_patterns() -> None:
+    """Test that only included files are managed, unless excluded."""
+    path_filter = PathFilter(include=["*.fish"], exclude=["/functions/local.fish"])
+
+    assert path_filter("config.fish")
+    assert path_filter("functions/ll.fish")
+    assert not path_filter("functions/local.fish")
+    assert not path_filter("fish_variables")
+
+
+@pytest.mark.parametrize("pattern", ["functions", "functions/", "/functions/"])
+def test_include_directories(pattern: str) -> None:
+    """Test that including a directory includes all files under it."""
+    path_filter = PathFilter(include=[pattern])
+
+    assert path_filter("functions/ll.fish")
+    assert path_filter("functions/local/ll.fish")
+    assert not path_filter("config.fish")
+    assert not path_filter("functions.fish")
+
+
+def test_walk_prunes_excluded_dirs(tmp_path: Path) -> None:
+    """Test that excluded directories are not walked and the ignore file is."""
+    (tmp_path / "functions").mkdir()
+    (tmp_path / "node_modules" / "pkg").mkdir(parents=True)
+    (tmp_path / "config.fish").write_text("set -x EDITOR vim")
+    (tmp_path / "config.fish.swp").write_text("swap")
+    (tmp_path / "functions" / "ll.fish").write_text("ls -l")
+    (tmp_path / "node_modules" / "pkg" / "index.js").write_text("js")
+    (tmp_path / ".cfgignore").write_text("# editor files\n*.swp\n\nnode_modules/\n")
+    (tmp_path / "node_modules").chmod(0)
+
+    try:
+        path_filter = load_path_filter(tmp_path)
+        listed = sorted(
+            rel_path for rel_path, _, _ in iter_files(tmp_path, path_filter)
+        )
+    finally:
+        (tmp_path / "node_modules").chmod(0o755)
+
+    assert listed == ["config.fish", "functions/ll.fish"]
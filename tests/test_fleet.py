@@ -0,0 +1,196 @@
+"""Fleet install tests."""
+import os
+import sys
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+from result import Err, Ok
+
+from configurator import fleet
+from configurator.installer import setup
+from configurator.manifest import get_source_manifest
+from configurator.settings import get_settings
+
+
+@pytest.fixture(name="data_repo_dir")
+def fixture_data_repo_dir(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> Iterator[Path]:
+    """A data repo with fish and hyper configs, used as the Linux data repo.
+
+    Args:
+        tmp_path: Fixture containing a tmp directory for the hwconfig root.
+        monkeypatch: Fixture for patching the settings and platform.
+
+    Yields:
+        The data repo directory.
+    """
+    monkeypatch.setenv("HWCONFIG_ROOT_DIR", (tmp_path / "hwconfig").as_posix())
+    monkeypatch.setattr(setup, "in_windows", lambda: False)
+    monkeypatch.setattr(setup, "in_linux", lambda: True)
+    get_settings.cache_clear()
+    get_source_manifest.cache_clear()
+
+    data_repo_dir = get_settings().data_repo_dir
+    (data_repo_dir / "fish" / "functions").mkdir(parents=True)
+    (data_repo_dir / "hyper").mkdir()
+    (data_repo_dir / "fish" / "config.fish").write_text("set -x EDITOR vim")
+    (data_repo_dir / "fish" / "functions" / "ll.fish").write_text("ls -l")
+    (data_repo_dir / "hyper" / ".hyper.js").write_text("fontSize: 12")
+
+    yield data_repo_dir
+    get_settings.cache_clear()
+    get_source_manifest.cache_clear()
+
+
+def _make_roots(tmp_path: Path, count: int) -> list[Path]:
+    """Create empty target roots."""
+    roots = [tmp_path / "roots" / f"root{i}" for i in range(count)]
+    for root in roots:
+        root.mkdir(parents=True)
+    return roots
+
+
+def test_read_roots_file(tmp_path: Path) -> None:
+    """Test that comments and empty lines are ignored."""
+    roots_file = tmp_path / "roots.txt"
+    roots_file.write_text("# containers\n/srv/a\n\n  /srv/b  \n")
+
+    assert fleet.read_roots_file(roots_file) == Ok([Path("/srv/a"), Path("/srv/b")])
+
+
+@pytest.mark.usefixtures("data_repo_dir")
+def test_setup_leaves_root_untouched(tmp_path: Path) -> None:
+    """Test that setting up the installers for a root does not create directories."""
+    root = _make_roots(tmp_path, 1)[0]
+
+    assert setup.fish_installer(home=root).is_ok()
+
+    assert not (root / ".config").exists()
+
+
+@pytest.mark.usefixtures("data_repo_dir")
+def test_install_roots(tmp_path: Path) -> None:
+    """Test installing to several roots in order."""
+    roots = _make_roots(tmp_path, 3)
+
+    results = list(fleet.install_roots(roots))
+
+    assert [r.root for r in results] == roots
+    assert all(r.ok for r in results)
+    for root in roots:
+        assert (root / ".config" / "fish" / "functions" / "ll.fish").exists()
+        assert (root / ".hyper.js").read_text() == "fontSize: 12"
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="Patches need fork to carry over")
+@pytest.mark.usefixtures("data_repo_dir")
+def test_install_roots_process_pool(tmp_path: Path) -> None:
+    """Test installing to several roots with a pool of processes."""
+    roots = _make_roots(tmp_path, 4)
+
+    results = list(fleet.install_roots(roots, jobs=2))
+
+    assert sorted(r.root for r in results) == roots
+    assert all(r.ok for r in results)
+    assert all((root / ".config" / "fish" / "config.fish").exists() for root in roots)
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="Patches need fork to carry over")
+@pytest.mark.usefixtures("data_repo_dir")
+def test_install_roots_yields_finished_roots(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that a slow root does not hold back the results of the others."""
+    roots = _make_roots(tmp_path, 2)
+    done = tmp_path / "done"
+    install_root = fleet.install_root
+
+    def wait_for_second_root(
+        root: Path,
+        manifests: fleet.SourceManifests,
+    ) -> fleet.RootResult:
+        if root == roots[0]:
+            for _ in range(500):
+                if done.exists():
+                    break
+                time.sleep(0.01)
+        result = install_root(root, manifests)
+        if root == roots[1]:
+            done.touch()
+        return result
+
+    monkeypatch.setattr(fleet, "install_root", wait_for_second_root)
+
+    results = list(fleet.install_roots(roots, jobs=2))
+
+    assert [r.root for r in results] == roots[::-1]
+
+
+@pytest.mark.usefixtures("data_repo_dir")
+def test_install_roots_templates(
+    tmp_path: Path,
+    data_repo_dir: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that templates are rendered with the home of each target root."""
+    monkeypatch.setenv("HWCONFIG_TEMPLATES", "1")
+    get_settings.cache_clear()
+    (data_repo_dir / "fish" / "paths.fish.tmpl").write_text(
+        "set -x HOME {{ host.home }}",
+    )
+    roots = _make_roots(tmp_path, 2)
+
+    results = list(fleet.install_roots(roots))
+
+    assert all(r.ok for r in results)
+    for root in roots:
+        rendered = root / ".config" / "fish" / "paths.fish"
+        assert rendered.read_text() == f"set -x HOME {root}"
+
+
+@pytest.mark.usefixtures("data_repo_dir")
+def test_install_root_setup_error(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that a config failing to set up does not stop the others."""
+    root = _make_roots(tmp_path, 1)[0]
+    monkeypatch.setitem(
+        setup.LINUX_INSTALLERS,
+        "hyper",
+        lambda _: Err("Could not get hyper dir"),
+    )
+
+    result = next(fleet.install_roots([root]))
+
+    assert result.error is None
+    assert result.failed == ["hyper"]
+    assert (root / ".config" / "fish" / "config.fish").exists()
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="Patches need fork to carry over")
+@pytest.mark.usefixtures("data_repo_dir")
+def test_install_roots_broken_pool(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that a worker process dying fails its roots instead of the fleet."""
+    roots = _make_roots(tmp_path, 2)
+
+    def exit_worker(
+        root: Path,  # noqa: ARG001
+        manifests: fleet.SourceManifests,  # noqa: ARG001
+    ) -> fleet.RootResult:
+        os._exit(1)
+
+    monkeypatch.setattr(fleet, "install_root", exit_worker)
+
+    results = list(fleet.install_roots(roots, jobs=2))
+
+    assert sorted(r.root for r in results) == roots
+    assert all(r.error is not None for r in results)
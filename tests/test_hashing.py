@@ -0,0 +1,49 @@
+"""Hash cache tests."""
+from pathlib import Path
+
+from configurator.hashing import HashCache, hash_file
+
+
+def test_digest_matches_hash_file(tmp_path: Path) -> None:
+    """Test that the cached digest matches hashing the file directly."""
+    file = tmp_path / "config.fish"
+    file.write_text("set -x EDITOR vim")
+
+    cache = HashCache()
+    assert cache.digest(file) == hash_file(file)
+
+
+def test_digest_reused_from_saved_cache(tmp_path: Path) -> None:
+    """Test that a saved digest is reused while the file is unchanged."""
+    file = tmp_path / "config.fish"
+    file.write_text("set -x EDITOR vim")
+    cache_file = tmp_path / "cache" / "hashes.json"
+
+    cache = HashCache(cache_file)
+    digest = cache.digest(file)
+    cache.save()
+
+    loaded = HashCache(cache_file)
+    assert loaded.digest(file) == digest
+    assert not loaded._dirty  # noqa: SLF001
+
+
+def test_digest_updated_when_file_changes(tmp_path: Path) -> None:
+    """Test that a changed file is re-hashed."""
+    file = tmp_path / "config.fish"
+    file.write_text("set -x EDITOR vim")
+
+    cache = HashCache()
+    digest = cache.digest(file)
+    file.write_text("set -x EDITOR nano")
+
+    assert cache.digest(file) != digest
+
+
+def test_hash_file_is_git_blob_id(tmp_path: Path) -> None:
+    """Test that the digest is the ID git gives the content."""
+    file = tmp_path / "config.fish"
+    file.write_text("hello\n")
+
+    # git hash-object of "hello\n"
+    assert hash_file(file) == "ce013625030ba8dba906f756967f9e9ca394464a"
@@ -0,0 +1,69 @@
+"""JSON merge installer tests."""
+import json
+from pathlib import Path
+
+import pytest
+from result import Err, Ok
+
+from configurator.installer.config import InstallerConfig, MergeRule
+from configurator.installer.json_merge import JsonMergeInstaller
+
+
+@pytest.fixture(name="mock_config")
+def fixture_mock_config(tmp_path: Path) -> InstallerConfig:
+    """Mock InstallerConfig for a VS Code like settings file.
+
+    Args:
+        tmp_path: Fixture containing a tmp directory for the source and target.
+
+    Returns:
+        A mock InstallerConfig.
+    """
+    source = tmp_path / "source"
+    target = tmp_path / "target"
+    source.mkdir()
+    target.mkdir()
+    (source / "settings.json").write_text(
+        json.dumps({"editor.fontSize": 14, "workbench.colorTheme": "Dracula"}),
+    )
+
+    return InstallerConfig(
+        name="test",
+        source=source,
+        target=target,
+        merge_rules=[MergeRule(path="", strategy="shallow")],
+    )
+
+
+def test_install_creates_target(mock_config: InstallerConfig) -> None:
+    """Test installing when the target file does not exist yet."""
+    installer = JsonMergeInstaller(mock_config)
+
+    assert isinstance(installer.install(), Ok)
+    target_data = json.loads((mock_config.target / "settings.json").read_text())
+    assert target_data == {"editor.fontSize": 14, "workbench.colorTheme": "Dracula"}
+
+
+def test_install_keeps_unmanaged_keys(mock_config: InstallerConfig) -> None:
+    """Test that keys not in the source are left as they are."""
+    target_file = mock_config.target / "settings.json"
+    target_file.write_text(json.dumps({"editor.fontSize": 12, "window.zoomLevel": 1}))
+    installer = JsonMergeInstaller(mock_config)
+
+    assert isinstance(installer.install(), Ok)
+    assert json.loads(target_file.read_text()) == {
+        "editor.fontSize": 14,
+        "window.zoomLevel": 1,
+        "workbench.colorTheme": "Dracula",
+    }
+
+
+def test_install_merge_fail(mock_config: InstallerConfig) -> None:
+    """Test that merging into a value that is not an object is an error."""
+    (mock_config.target / "settings.json").write_text(json.dumps({"editor": 1}))
+    mock_config.merge_rules = [
+        MergeRule(path="/editor/font/size", source_path="", strategy="replace"),
+    ]
+    installer = JsonMergeInstaller(mock_config)
+
+    assert isinstance(installer.install(), Err)
@@ -0,0 +1,181 @@
+"""Data repo manifest tests."""
+import os
+from pathlib import Path
+
+import pytest
+from git import Actor, Repo
+from result import Err, Ok
+
+from configurator import trace
+from configurator.hashing import HashCache, hash_file
+from configurator.installer.sync import check_tree, iter_files, sync_tree
+from configurator.manifest import MANIFESTS_KEPT, load_manifest
+
+AUTHOR = Actor("test", "test@example.com")
+
+
+@pytest.fixture(name="data_repo")
+def fixture_data_repo(tmp_path: Path) -> Repo:
+    """A data repo with a committed fish config.
+
+    Args:
+        tmp_path: Fixture containing a tmp directory for the repo.
+
+    Returns:
+        The data repo.
+    """
+    repo = Repo.init(tmp_path / "data_repo")
+    files = {
+        "fish/config.fish": "set -x EDITOR vim\n",
+        "fish/functions/ll.fish": "ls -l\n",
+        "hyper/.hyper.js": "fontSize: 12\n",
+    }
+    for name, content in files.items():
+        path = Path(repo.working_dir) / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+    repo.index.add(list(files))
+    repo.index.commit("Add configs", author=AUTHOR, committer=AUTHOR)
+    return repo
+
+
+def test_manifest_has_blob_ids(tmp_path: Path, data_repo: Repo) -> None:
+    """Test that committed files are listed with their digests."""
+    repo_dir = Path(data_repo.working_dir)
+
+    result = load_manifest(repo_dir, tmp_path / "manifests")
+
+    assert isinstance(result, Ok)
+    manifest = result.ok_value
+    assert manifest.head == data_repo.head.commit.hexsha
+    assert set(manifest.entries) == {
+        "fish/config.fish",
+        "fish/functions/ll.fish",
+        "hyper/.hyper.js",
+    }
+    for path, entry in manifest.entries.items():
+        assert entry.oid == hash_file(repo_dir / path)
+    assert (tmp_path / "manifests" / f"{manifest.head}.json").is_file()
+
+
+def test_manifest_source_files_match_walk(tmp_path: Path, data_repo: Repo) -> None:
+    """Test that the manifest lists the same files as walking the directory."""
+    source = Path(data_repo.working_dir) / "fish"
+    (Path(data_repo.git_dir) / "info" / "exclude").write_text("*.local\n")
+    (source / "functions" / "secret.local").write_text("set -x TOKEN 1\n")
+    manifest = load_manifest(source.parent, tmp_path / "manifests").unwrap()
+
+    source_files = manifest.source_files(source)
+
+    assert source_files is not None
+    listed = {(r, p, s.st_size, s.st_mtime_ns) for r, p, s in source_files}
+    walked = {(r, p, s.st_size, s.st_mtime_ns) for r, p, s in iter_files(source)}
+    assert listed == walked
+    assert manifest.source_files(source.parent / "powershell") is None
+
+
+def test_manifest_overlays_changes(tmp_path: Path, data_repo: Repo) -> None:
+    """Test that uncommitted changes are read from the working tree."""
+    repo_dir = Path(data_repo.working_dir)
+    load_manifest(repo_dir, tmp_path / "manifests").unwrap()
+    (repo_dir / "fish" / "config.fish").write_text("set -x EDITOR nano\n")
+    (repo_dir / "fish" / "functions" / "ll.fish").unlink()
+    (repo_dir / "fish" / "new.fish").write_text("echo new\n")
+
+    manifest = load_manifest(repo_dir, tmp_path / "manifests").unwrap()
+
+    assert set(manifest.entries) == {
+        "fish/config.fish",
+        "fish/new.fish",
+        "hyper/.hyper.js",
+    }
+    assert manifest.entries["fish/config.fish"].oid is None
+    assert manifest.entries["fish/config.fish"].size == len("set -x EDITOR nano\n")
+    assert manifest.entries["hyper/.hyper.js"].oid is not None
+
+
+def test_manifest_warm_load_lists_changed_dirs(tmp_path: Path, data_repo: Repo) -> None:
+    """Test that loading a stored manifest only lists the directories that changed."""
+    repo_dir = Path(data_repo.working_dir)
+    load_manifest(repo_dir, tmp_path / "manifests").unwrap()
+
+    tracer = trace.start()
+    try:
+        load_manifest(repo_dir, tmp_path / "manifests").unwrap()
+        (repo_dir / "fish" / "functions" / "git").mkdir()
+        (repo_dir / "fish" / "functions" / "git" / "gs.fish").write_text("git status")
+        manifest = load_manifest(repo_dir, tmp_path / "manifests").unwrap()
+    finally:
+        trace.stop()
+
+    loads = [s.attrs for s in tracer.spans if s.name == "manifest.load"]
+    assert loads == [
+        {"built": False, "files": 3, "scanned_dirs": 0},
+        {"built": False, "files": 4, "scanned_dirs": 1},
+    ]
+    assert manifest.entries["fish/functions/git/gs.fish"].oid is None
+
+
+def test_manifest_packed_refs(tmp_path: Path, data_repo: Repo) -> None:
+    """Test that a stored manifest is found when the branch ref is packed."""
+    repo_dir = Path(data_repo.working_dir)
+    load_manifest(repo_dir, tmp_path / "manifests").unwrap()
+    data_repo.git.pack_refs("--all")
+
+    tracer = trace.start()
+    try:
+        manifest = load_manifest(repo_dir, tmp_path / "manifests").unwrap()
+    finally:
+        trace.stop()
+
+    assert manifest.head == data_repo.head.commit.hexsha
+    assert tracer.spans[0].attrs["built"] is False
+
+
+def test_manifest_not_a_git_repo(tmp_path: Path) -> None:
+    """Test that a data repo that is not a git repo has no manifest."""
+    repo_dir = tmp_path / "data_repo"
+    (repo_dir / "fish").mkdir(parents=True)
+
+    assert isinstance(load_manifest(repo_dir, tmp_path / "manifests"), Err)
+    assert not (tmp_path / "manifests").exists()
+
+
+def test_manifest_keeps_recent_revisions(tmp_path: Path, data_repo: Repo) -> None:
+    """Test that the manifests of the most recent revisions are kept."""
+    repo_dir = Path(data_repo.working_dir)
+    manifest_dir = tmp_path / "manifests"
+    heads: list[str] = []
+
+    for i in range(MANIFESTS_KEPT + 1):
+        if i:
+            (repo_dir / "fish" / "config.fish").write_text(f"{i}\n")
+            data_repo.index.add(["fish/config.fish"])
+            data_repo.index.commit(f"{i}", author=AUTHOR, committer=AUTHOR)
+        heads.append(load_manifest(repo_dir, manifest_dir).unwrap().head)
+        # Ordered even on file systems with a coarse mtime
+        os.utime(manifest_dir / f"{heads[-1]}.json", ns=(i, i))
+
+    assert {p.stem for p in manifest_dir.glob("*.json")} == set(heads[1:])
+
+
+def test_manifest_install_without_hashing_source(
+    tmp_path: Path,
+    data_repo: Repo,
+) -> None:
+    """Test installing and checking a config from the manifest."""
+    source = Path(data_repo.working_dir) / "fish"
+    target = tmp_path / "target"
+    manifest = load_manifest(source.parent, tmp_path / "manifests").unwrap()
+    hash_cache = HashCache()
+    manifest.seed(hash_cache)
+    source_files = manifest.source_files(source)
+    assert source_files is not None
+
+    stats = sync_tree(source, target, hash_cache, source_files)
+    report = check_tree(source, target, hash_cache, source_files)
+
+    assert stats.copied == len(source_files)
+    assert not report.drifted
+    assert (target / "functions" / "ll.fish").read_text() == "ls -l\n"
@@ -0,0 +1,120 @@
+"""JSON merge tests."""
+from __future__ import annotations
+
+from typing import Any
+
+from configurator.installer.config import MergeRule
+from configurator.installer.merge import compile_merge_plan, merge_keyed_list
+
+
+def _schemes(names: list[str], source: str) -> list[dict[str, Any]]:
+    """Create color schemes with the given names."""
+    return [{"name": name, "source": source} for name in names]
+
+
+def test_merge_keyed_list_replaces_in_place() -> None:
+    """Test that matching objects are replaced without reordering the target."""
+    target = _schemes(["a", "b", "c", "d"], "target")
+    source = _schemes(["c", "e", "a"], "source")
+
+    merged = merge_keyed_list(target, source, key="name")
+
+    assert [(s["name"], s["source"]) for s in merged] == [
+        ("a", "source"),
+        ("b", "target"),
+        ("c", "source"),
+        ("d", "target"),
+        ("e", "source"),
+    ]
+
+
+def test_merge_keyed_list_adjacent_matches() -> None:
+    """Test that adjacent matching objects are all replaced."""
+    target = _schemes(["a", "b", "c"], "target")
+    source = _schemes(["a", "b", "c"], "source")
+
+    merged = merge_keyed_list(target, source, key="name")
+
+    assert merged == source
+
+
+def test_merge_keyed_list_keeps_objects_without_key() -> None:
+    """Test that target objects without the key are kept."""
+    target: list[dict[str, Any]] = [{"guid": "1"}, {"name": "a"}]
+
+    merged = merge_keyed_list(target, _schemes(["a"], "source"), key="name")
+
+    assert merged == [{"guid": "1"}, {"name": "a", "source": "source"}]
+
+
+class _Key:
+    """A scheme name counting the comparisons made with it."""
+
+    def __init__(self, name: str, comparisons: list[int]) -> None:
+        self.name = name
+        self.comparisons = comparisons
+
+    def __hash__(self) -> int:
+        return hash(self.name)
+
+    def __eq__(self, other: object) -> bool:
+        self.comparisons[0] += 1
+        return isinstance(other, _Key) and other.name == self.name
+
+
+def test_merge_keyed_list_scales_linearly() -> None:
+    """Test that each scheme is compared a constant number of times.
+
+    A merge searching the source list for each target scheme would compare
+    millions of names here.
+    """
+    count = 4_000
+    comparisons = [0]
+    target = [{"name": _Key(f"scheme {i}", comparisons)} for i in range(count)]
+    source = [
+        {"name": _Key(f"scheme {i}", comparisons)} for i in range(0, 2 * count, 2)
+    ]
+
+    merged = merge_keyed_list(target, source, key="name")
+
+    assert len(merged) == count + count // 2
+    assert comparisons[0] <= 4 * count
+
+
+def test_merge_plan_applies_rules() -> None:
+    """Test applying a plan with each of the merge strategies."""
+    plan = compile_merge_plan(
+        [
+            MergeRule(path="/profiles/defaults", strategy="replace"),
+            MergeRule(path="/schemes", strategy="keyed_list", key="name"),
+            MergeRule(path="", source_path="/application", strategy="shallow"),
+            MergeRule(path="/missing", strategy="replace"),
+        ],
+    )
+    source = {
+        "profiles": {"defaults": {"font": "Meslo"}},
+        "schemes": _schemes(["b"], "source"),
+        "application": {"copyOnSelect": True},
+    }
+    target = {
+        "profiles": {"defaults": {"font": "Consolas"}, "list": [1, 2]},
+        "schemes": _schemes(["a", "b"], "target"),
+        "copyOnSelect": False,
+        "theme": "dark",
+    }
+
+    merged = plan.apply(source, target)
+
+    assert merged == {
+        "profiles": {"defaults": {"font": "Meslo"}, "list": [1, 2]},
+        "schemes": [*_schemes(["a"], "target"), *_schemes(["b"], "source")],
+        "copyOnSelect": True,
+        "theme": "dark",
+    }
+
+
+def test_merge_plan_creates_missing_objects() -> None:
+    """Test that objects leading to a target value are created when missing."""
+    plan = compile_merge_plan([MergeRule(path="/a/b~1c", strategy="shallow")])
+
+    assert plan.apply({"a": {"b/c": {"x": 1}}}, {}) == {"a": {"b/c": {"x": 1}}}
@@ -0,0 +1,50 @@
+"""Config path tests."""
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from result import Err, Ok
+
+from configurator.installer.paths import PathCache
+
+
+def test_path_cache_resolves_once(tmp_path: Path) -> None:
+    """Test that a resolved path is reused, also after reloading the cache."""
+    cache_file = tmp_path / "paths.json"
+    resolver = MagicMock(return_value=Ok(tmp_path))
+
+    assert PathCache(cache_file).resolve("test", resolver) == Ok(tmp_path)
+    assert PathCache(cache_file).resolve("test", resolver) == Ok(tmp_path)
+    assert resolver.call_count == 1
+
+
+def test_path_cache_invalidates_missing_path(tmp_path: Path) -> None:
+    """Test that a cached path that no longer exists is resolved again."""
+    target = tmp_path / "target"
+    target.mkdir()
+    cache = PathCache()
+    cache.set("test", target)
+    target.rmdir()
+
+    assert cache.get("test") is None
+    assert cache.resolve("test", lambda: Err("not found")) == Err("not found")
+
+
+def test_path_cache_expires_after_ttl(tmp_path: Path) -> None:
+    """Test that a cached path older than the TTL is resolved again."""
+    cache = PathCache(ttl=0)
+    cache.set("test", tmp_path)
+
+    assert cache.get("test") is None
+
+
+def test_path_cache_clear(tmp_path: Path) -> None:
+    """Test clearing single keys and the whole cache."""
+    cache = PathCache(tmp_path / "paths.json")
+    cache.set("foo", tmp_path)
+    cache.set("bar", tmp_path)
+
+    cache.clear(["foo"])
+    assert [key for key, _, _ in cache.items()] == ["bar"]
+
+    cache.clear()
+    assert PathCache(tmp_path / "paths.json").items() == []
@@ -0,0 +1,132 @@
+"""`cfg sync` pipeline tests."""
+import asyncio
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+from git import Actor, Repo
+from result import Result
+
+from configurator.hashing import get_hash_cache
+from configurator.installer import setup
+from configurator.manifest import get_source_manifest
+from configurator.pipeline import sync
+from configurator.repo import clone_data_repo
+from configurator.settings import get_settings
+from configurator.template import get_template_cache
+
+AUTHOR = Actor("test", "test@example.com")
+
+
+def _commit_files(repo: Repo, files: dict[str, str], message: str) -> None:
+    """Write files to a repo, commit them and push the commit."""
+    for name, content in files.items():
+        path = Path(repo.working_dir) / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+    repo.index.add(list(files))
+    repo.index.commit(message, author=AUTHOR, committer=AUTHOR)
+    repo.remotes.origin.push()
+
+
+@pytest.fixture(name="upstream")
+def fixture_upstream(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> Iterator[Repo]:
+    """A bare origin for the data repo, with a clone to push changes from.
+
+    Args:
+        tmp_path: Fixture containing a tmp directory for the repos and home.
+        monkeypatch: Fixture for patching the settings, home and platform.
+
+    Yields:
+        The clone used to push changes to the origin.
+    """
+    origin = Repo.init(tmp_path / "origin.git", bare=True)
+    upstream = Repo.clone_from(origin.git_dir, tmp_path / "upstream")
+    _commit_files(upstream, {"fish/config.fish": "1", "hyper/.hyper.js": "1"}, "1")
+
+    monkeypatch.setenv("HOME", (tmp_path / "home").as_posix())
+    for var in ("GIT_AUTHOR", "GIT_COMMITTER"):
+        monkeypatch.setenv(f"{var}_NAME", AUTHOR.name)
+        monkeypatch.setenv(f"{var}_EMAIL", AUTHOR.email)
+    monkeypatch.setenv("HWCONFIG_ROOT_DIR", (tmp_path / "hwconfig").as_posix())
+    monkeypatch.setenv("HWCONFIG_DATA_REPO_URL", Path(origin.git_dir).as_uri())
+    monkeypatch.setattr(setup, "in_windows", lambda: False)
+    monkeypatch.setattr(setup, "in_linux", lambda: True)
+    (tmp_path / "home").mkdir()
+    caches = (get_settings, get_source_manifest, get_hash_cache, get_template_cache)
+    for cached in caches:
+        cached.cache_clear()
+
+    yield upstream
+    for cached in caches:
+        cached.cache_clear()
+
+
+def _sync(**kwargs: object) -> tuple[bool, dict[str, Result[str, str]]]:
+    """Run the sync pipeline, collecting the results by step."""
+    results: dict[str, Result[str, str]] = {}
+
+    def on_result(name: str, result: Result[str, str]) -> None:
+        results[name] = result
+
+    ok = asyncio.run(sync(get_settings(), on_result=on_result, **kwargs))
+    return ok, results
+
+
+def test_sync_clones_and_installs(upstream: Repo) -> None:  # noqa: ARG001
+    """Test that the first sync clones the data repo and installs the configs."""
+    ok, results = _sync()
+
+    assert ok
+    assert set(results) == {"pull", "fish", "hyper"}
+    assert (Path.home() / ".config" / "fish" / "config.fish").read_text() == "1"
+
+
+def test_sync_installs_pulled_changes(upstream: Repo) -> None:
+    """Test that changes fetched while resolving the targets are installed."""
+    clone_data_repo(get_settings())
+    _commit_files(upstream, {"fish/config.fish": "2", "fish/new.fish": "2"}, "2")
+
+    ok, _ = _sync(names=["fish"])
+
+    assert ok
+    fish_dir = Path.home() / ".config" / "fish"
+    assert (fish_dir / "config.fish").read_text() == "2"
+    assert (fish_dir / "new.fish").read_text() == "2"
+
+
+def test_sync_pushes_local_changes(upstream: Repo) -> None:
+    """Test that local changes are pushed along with merging upstream changes."""
+    _sync()
+    (Path.home() / ".config" / "fish" / "config.fish").write_text("local")
+    _commit_files(upstream, {"hyper/.hyper.js": "2"}, "2")
+
+    ok, results = _sync(from_local=["fish"], message="Local fish")
+
+    assert ok
+    assert results["push"].is_ok()
+    assert (Path.home() / ".hyper.js").read_text() == "2"
+    upstream.remotes.origin.pull()
+    assert upstream.head.commit.parents[0].message == "Local fish"
+    assert (Path(upstream.working_dir) / "fish" / "config.fish").read_text() == "local"
+
+
+def test_sync_aborts_conflicting_merge(upstream: Repo) -> None:
+    """Test that a conflicting merge is aborted, keeping the local commit."""
+    _sync()
+    (Path.home() / ".config" / "fish" / "config.fish").write_text("local")
+    _commit_files(upstream, {"fish/config.fish": "2"}, "2")
+
+    ok, results = _sync(from_local=["fish"], message="Local fish")
+
+    assert not ok
+    assert "push" not in results
+    repo = Repo(get_settings().data_repo_dir)
+    assert repo.head.commit.message == "Local fish"
+    assert not (Path(repo.git_dir) / "MERGE_HEAD").exists()
+    assert not repo.is_dirty()
+    assert (Path(repo.working_dir) / "fish" / "config.fish").read_text() == "local"
@@ -0,0 +1,159 @@
+"""Data repo tests."""
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+from git import Actor, Repo
+from result import Ok
+
+from configurator.repo import (
+    StatusEntry,
+    clone_data_repo,
+    get_repo_status,
+    parse_porcelain_v2,
+    pull_data_repo,
+)
+from configurator.settings import Settings
+
+AUTHOR = Actor("test", "test@example.com")
+
+
+def _commit_files(repo: Repo, files: dict[str, str], message: str) -> None:
+    """Write files to a repo and commit them."""
+    for name, content in files.items():
+        path = Path(repo.working_dir) / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+    repo.index.add(list(files))
+    repo.index.commit(message, author=AUTHOR, committer=AUTHOR)
+
+
+@pytest.fixture(name="origin_repo")
+def fixture_origin_repo(tmp_path: Path) -> Repo:
+    """A repo with two commits of configs for several platforms.
+
+    Args:
+        tmp_path: Fixture containing a tmp directory for the repo.
+
+    Returns:
+        The origin repo.
+    """
+    repo = Repo.init(tmp_path / "origin")
+    _commit_files(repo, {"fish/config.fish": "1", "powershell/profile.ps1": "1"}, "1")
+    _commit_files(repo, {"fish/config.fish": "2", "hyper/.hyper.js": "2"}, "2")
+    return repo
+
+
+def _settings(tmp_path: Path, origin_repo: Repo, **kwargs: object) -> Settings:
+    """Settings cloning the origin repo into the tmp directory."""
+    return Settings(
+        root_dir=tmp_path / "root",
+        data_repo_url=Path(origin_repo.working_dir).as_uri(),
+        **kwargs,
+    )
+
+
+def test_clone_shallow_sparse(tmp_path: Path, origin_repo: Repo) -> None:
+    """Test a shallow clone only checking out the directories of the platform."""
+    settings = _settings(tmp_path, origin_repo, clone_depth=1, sparse_checkout=True)
+
+    result = clone_data_repo(settings, sparse_dirs=["fish", "hyper"])
+
+    assert isinstance(result, Ok)
+    assert len(list(result.ok_value.iter_commits())) == 1
+    checked_out = {p.name for p in settings.data_repo_dir.iterdir()}
+    assert checked_out == {".git", "fish", "hyper"}
+
+
+def test_clone_from_reference(tmp_path: Path, origin_repo: Repo) -> None:
+    """Test seeding a partial clone from a local reference mirror."""
+    mirror = Repo.clone_from(origin_repo.working_dir, tmp_path / "mirror", mirror=True)
+    settings = _settings(
+        tmp_path,
+        origin_repo,
+        clone_filter="blob:none",
+        reference_repo=Path(mirror.git_dir).as_uri(),
+    )
+
+    result = clone_data_repo(settings)
+
+    assert isinstance(result, Ok)
+    assert (settings.data_repo_dir / "fish" / "config.fish").read_text() == "2"
+    # The objects are copied from the mirror, the clone does not depend on it
+    assert not (Path(result.ok_value.git_dir) / "objects/info/alternates").exists()
+
+
+def test_pull_keeps_depth(tmp_path: Path, origin_repo: Repo) -> None:
+    """Test that pulling into a shallow clone only fetches the new commits."""
+    settings = _settings(tmp_path, origin_repo, clone_depth=1)
+    clone_data_repo(settings)
+    _commit_files(origin_repo, {"fish/config.fish": "3"}, "3")
+
+    result = pull_data_repo(settings)
+
+    assert isinstance(result, Ok)
+    assert (settings.data_repo_dir / "fish" / "config.fish").read_text() == "3"
+    assert len(list(result.ok_value.iter_commits())) == 2  # noqa: PLR2004
+
+
+def test_parse_porcelain_v2() -> None:
+    """Test parsing branch headers, changes, renames and untracked files."""
+    records = [
+        "# branch.oid 1234",
+        "# branch.head main",
+        "# branch.upstream origin/main",
+        "# branch.ab +2 -1",
+        "1 .M N... 100644 100644 100644 abc abc fish/config fish.fish",
+        "2 R. N... 100644 100644 100644 abc abc R100 hyper/new.js",
+        "hyper/old.js",
+        "? fish/functions/ls.fish",
+        "",
+    ]
+    output = "\0".join(records)
+
+    status = parse_porcelain_v2(output)
+
+    assert (status.branch, status.ahead, status.behind) == ("main", 2, 1)
+    assert status.entries == [
+        StatusEntry("fish/config fish.fish", ".", "M"),
+        StatusEntry("hyper/new.js", "R", ".", "hyper/old.js"),
+        StatusEntry("fish/functions/ls.fish", "?", "?"),
+    ]
+    assert [e.short for e in status.entries] == [" M", "R ", "??"]
+
+
+def test_get_repo_status(origin_repo: Repo) -> None:
+    """Test that modified, deleted and untracked files are found in one pass."""
+    root = Path(origin_repo.working_dir)
+    (root / "fish" / "config.fish").write_text("changed")
+    (root / "powershell" / "profile.ps1").unlink()
+    (root / "hyper" / "new.js").write_text("new")
+
+    result = get_repo_status(origin_repo)
+
+    assert isinstance(result, Ok)
+    assert sorted(result.ok_value.paths) == [
+        "fish/config.fish",
+        "hyper/new.js",
+        "powershell/profile.ps1",
+    ]
+
+
+@pytest.mark.parametrize("enabled", [False, True])
+def test_get_repo_status_fsmonitor(
+    origin_repo: Repo,
+    monkeypatch: pytest.MonkeyPatch,
+    enabled: bool,  # noqa: FBT001
+) -> None:
+    """Test that the file system monitor is only used with the setting."""
+    monkeypatch.setattr("configurator.repo.in_macos", lambda: True)
+    monkeypatch.setattr(
+        "configurator.repo.get_settings",
+        lambda: Settings(git_fsmonitor=enabled),
+    )
+    execute = MagicMock(return_value="")
+    monkeypatch.setattr(type(origin_repo.git), "execute", execute)
+
+    assert isinstance(get_repo_status(origin_repo), Ok)
+    assert ("core.fsmonitor=true" in execute.call_args.args[0]) is enabled
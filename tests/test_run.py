@@ -0,0 +1,66 @@
+"""Installer runner tests."""
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING
+from unittest.mock import MagicMock
+
+from result import Err, Ok, Result
+
+from configurator.installer.run import run_installers
+
+if TYPE_CHECKING:
+    from configurator.installer.protocol import Installer
+
+
+def _mock_installer(name: str, delay: float = 0) -> MagicMock:
+    """Create a mock installer whose install sleeps for `delay` seconds."""
+    installer = MagicMock()
+    installer.config.name = name
+
+    def install() -> Result[str, str]:
+        time.sleep(delay)
+        return Ok(f"Installed {name}")
+
+    installer.install.side_effect = install
+    return installer
+
+
+def test_run_installers_keeps_order() -> None:
+    """Test that results are returned in installer order, not completion order."""
+    installers = [_mock_installer("slow", 0.1), _mock_installer("fast")]
+    results = run_installers(installers, lambda i: i.install(), jobs=2)
+    assert results == [Ok("Installed slow"), Ok("Installed fast")]
+
+
+def test_run_installers_collects_failures() -> None:
+    """Test that an exception in one installer does not stop the others."""
+    broken = _mock_installer("broken")
+    broken.install.side_effect = RuntimeError("boom")
+    installers = [broken, _mock_installer("fish")]
+
+    def action(installer: Installer) -> Result[str, str]:
+        return installer.install()
+
+    results = run_installers(installers, action, jobs=2)
+    assert isinstance(results[0], Err)
+    assert "boom" in results[0].err_value
+    assert results[1] == Ok("Installed fish")
+
+
+def test_run_installers_reports_results_as_they_finish() -> None:
+    """Test that results are passed to `on_result` in completion order."""
+    installers = [_mock_installer("slow", 0.1), _mock_installer("fast")]
+    finished: list[tuple[str, float]] = []
+
+    def on_result(
+        installer: Installer,
+        result: Result[str, str],  # noqa: ARG001
+        duration: float,
+    ) -> None:
+        finished.append((installer.config.name, duration))
+
+    run_installers(installers, lambda i: i.install(), jobs=2, on_result=on_result)
+
+    assert [name for name, _ in finished] == ["fast", "slow"]
+    assert finished[1][1] >= 0.1  # noqa: PLR2004
@@ -0,0 +1,68 @@
+"""Installer setup tests."""
+from unittest.mock import MagicMock
+
+import pytest
+from result import Err, Ok
+
+from configurator.installer import names, setup
+
+
+@pytest.fixture(name="linux_platform")
+def fixture_linux_platform(monkeypatch: pytest.MonkeyPatch) -> dict[str, MagicMock]:
+    """Pretend to run on Linux, with mocked installer factories.
+
+    Args:
+        monkeypatch: Fixture for patching the platform checks and factories.
+
+    Returns:
+        The mocked installer factories, by config name.
+    """
+    factories = {"fish": MagicMock(), "hyper": MagicMock()}
+    for name, factory in factories.items():
+        factory.return_value = Ok(name)
+
+    monkeypatch.setattr(setup, "in_windows", lambda: False)
+    monkeypatch.setattr(setup, "in_linux", lambda: True)
+    monkeypatch.setattr(setup, "LINUX_INSTALLERS", factories)
+    return factories
+
+
+def test_get_installer_names_resolves_nothing(
+    linux_platform: dict[str, MagicMock],
+) -> None:
+    """Test that listing the configs does not set up any installers."""
+    assert setup.get_installer_names() == Ok(["fish", "hyper"])
+    for factory in linux_platform.values():
+        factory.assert_not_called()
+
+
+def test_config_names_match_factories() -> None:
+    """Test that the listed configs are the ones with installer factories."""
+    assert tuple(setup.WINDOWS_INSTALLERS) == names.WINDOWS_CONFIGS
+    assert tuple(setup.LINUX_INSTALLERS) == names.LINUX_CONFIGS
+
+
+def test_get_installer_resolves_only_named(
+    linux_platform: dict[str, MagicMock],
+) -> None:
+    """Test that only the requested installer is set up."""
+    assert setup.get_installer("fish") == Ok("fish")
+    linux_platform["hyper"].assert_not_called()
+
+
+def test_get_installer_unknown(linux_platform: dict[str, MagicMock]) -> None:
+    """Test that an unknown config name is an error."""
+    assert isinstance(setup.get_installer("powershell"), Err)
+    assert isinstance(setup.get_installers(["fish", "powershell"]), Err)
+    assert linux_platform["fish"].call_count == 1
+
+
+def test_resolve_installers(linux_platform: dict[str, MagicMock]) -> None:
+    """Test that unknown configs do not stop the others from being set up."""
+    result = setup.resolve_installers(["fish", "powershell", "fish"])
+
+    assert result == Ok(
+        {"fish": Ok("fish"), "powershell": Err("Unknown config: powershell")},
+    )
+    assert linux_platform["fish"].call_count == 1
+    linux_platform["hyper"].assert_not_called()
@@ -0,0 +1,199 @@
+"""Snapshot store tests."""
+from pathlib import Path
+
+import pytest
+from result import Ok
+
+from configurator.hashing import HashCache
+from configurator.installer.config import InstallerConfig
+from configurator.installer.copy import CopyInstaller
+from configurator.installer.json_merge import JsonMergeInstaller
+from configurator.snapshot import SnapshotStore
+
+
+@pytest.fixture(name="store")
+def fixture_store(tmp_path: Path) -> SnapshotStore:
+    """An empty snapshot store.
+
+    Args:
+        tmp_path: Fixture containing a tmp directory for the store.
+
+    Returns:
+        The snapshot store.
+    """
+    return SnapshotStore(tmp_path / "snapshots", retention=2)
+
+
+@pytest.fixture(name="installer")
+def fixture_installer(tmp_path: Path) -> CopyInstaller:
+    """A CopyInstaller whose target has a modified file and lacks a new one.
+
+    Args:
+        tmp_path: Fixture containing a tmp directory for the source and target.
+
+    Returns:
+        The CopyInstaller.
+    """
+    source = tmp_path / "source"
+    target = tmp_path / "target"
+    (source / "conf.d").mkdir(parents=True)
+    target.mkdir()
+    (source / "config.fish").write_text("set -x EDITOR vim")
+    (source / "conf.d" / "abbr.fish").write_text("abbr -a g git")
+    (target / "config.fish").write_text("set -x EDITOR nano")
+
+    config = InstallerConfig(
+        name="fish",
+        source=source,
+        target=target,
+        incremental=True,
+    )
+    return CopyInstaller(config, hash_cache=HashCache())
+
+
+@pytest.mark.parametrize("incremental", [True, False])
+def test_install_snapshots_changed_files(
+    store: SnapshotStore,
+    installer: CopyInstaller,
+    incremental: bool,  # noqa: FBT001
+) -> None:
+    """Test that only the files changed by an install are recorded."""
+    installer.config.incremental = incremental
+    snapshot = store.begin("install")
+    assert isinstance(installer.install(snapshot=snapshot), Ok)
+    assert isinstance(snapshot.save(), Ok)
+
+    target = installer.config.target
+    entries = {
+        Path(p).relative_to(target).as_posix(): e for p, e in snapshot.entries.items()
+    }
+    assert set(entries) == {"config.fish", "conf.d/abbr.fish"}
+    assert entries["conf.d/abbr.fish"].digest is None
+
+    snapshot = store.begin("install")
+    assert isinstance(installer.install(snapshot=snapshot), Ok)
+    assert not snapshot.entries
+
+
+def test_rollback_restores_targets(
+    store: SnapshotStore,
+    installer: CopyInstaller,
+) -> None:
+    """Test that a rollback restores modified files and removes added files."""
+    snapshot = store.begin("install")
+    installer.install(snapshot=snapshot)
+    snapshot.save()
+
+    result = store.rollback()
+
+    assert isinstance(result, Ok)
+    target = installer.config.target
+    assert (target / "config.fish").read_text() == "set -x EDITOR nano"
+    assert not (target / "conf.d" / "abbr.fish").exists()
+    assert store.list_ids() == []
+    assert list(store.blob_dir.glob("*/*")) == []
+
+
+def test_blobs_are_shared(store: SnapshotStore, tmp_path: Path) -> None:
+    """Test that identical content is stored once across snapshots."""
+    for name in ("a", "b"):
+        file = tmp_path / name
+        file.write_text("same content")
+        snapshot = store.begin()
+        snapshot.add(file)
+        snapshot.save()
+
+    assert len(store.list_ids()) == 2  # noqa: PLR2004
+    assert len(list(store.blob_dir.glob("*/*"))) == 1
+
+
+def test_ids_sort_in_order_taken(store: SnapshotStore, tmp_path: Path) -> None:
+    """Test that snapshots taken in the same second sort in the order taken."""
+    file = tmp_path / "config.fish"
+    file.write_text("content")
+    ids = []
+    for _ in range(20):
+        snapshot = store.begin()
+        snapshot.add(file)
+        snapshot.save()
+        ids.append(snapshot.id)
+
+    assert store.list_ids() == ids
+
+
+def test_gc_keeps_retention(store: SnapshotStore, tmp_path: Path) -> None:
+    """Test that gc removes the oldest snapshots and their unused blobs."""
+    file = tmp_path / "config.fish"
+    for i in range(4):
+        file.write_text(f"version {i}")
+        snapshot = store.begin()
+        snapshot.id = f"{i}"
+        snapshot.add(file)
+        snapshot.save()
+
+    assert store.gc() == Ok(2)
+    assert store.list_ids() == ["2", "3"]
+    assert len(list(store.blob_dir.glob("*/*"))) == 2  # noqa: PLR2004
+
+
+def test_rollback_to_snapshot(store: SnapshotStore, tmp_path: Path) -> None:
+    """Test that rolling back to a snapshot also rolls back the later ones."""
+    file = tmp_path / "settings.json"
+    file.write_text("{}")
+    for i in range(2):
+        snapshot = store.begin()
+        snapshot.id = f"{i}"
+        snapshot.add(file)
+        snapshot.save()
+        file.write_text(f'{{"version": {i}}}')
+
+    assert store.rollback("0") == Ok([file.as_posix()])
+    assert file.read_text() == "{}"
+
+
+def test_json_merge_snapshot(store: SnapshotStore, tmp_path: Path) -> None:
+    """Test that the JSON merge installer records the file it changes."""
+    source = tmp_path / "source"
+    target = tmp_path / "target"
+    source.mkdir()
+    target.mkdir()
+    (source / "settings.json").write_text('{"editor.fontSize": 14}')
+    (target / "settings.json").write_text('{"editor.fontSize": 12}')
+
+    config = InstallerConfig(
+        name="code",
+        source=source,
+        target=target,
+        merge_rules=[{"path": "", "strategy": "shallow"}],
+    )
+    snapshot = store.begin()
+    assert isinstance(JsonMergeInstaller(config).install(snapshot=snapshot), Ok)
+    snapshot.save()
+
+    store.rollback()
+    assert (target / "settings.json").read_text() == '{"editor.fontSize": 12}'
+
+
+def test_gc_keeps_blobs_of_snapshots_in_progress(
+    store: SnapshotStore,
+    tmp_path: Path,
+) -> None:
+    """Test that gc does not remove the blobs of a snapshot that is not saved yet."""
+    first_file = tmp_path / "config.fish"
+    second_file = tmp_path / "settings.json"
+    first_file.write_text("first")
+    second_file.write_text("second")
+
+    first = store.begin()
+    first.add(first_file)
+    second = store.begin()
+    second.add(second_file)
+    assert second.save().is_ok()
+
+    assert store.gc() == Ok(0)
+    assert first.save().is_ok()
+
+    first_file.write_text("changed")
+    restored = store.load(first.id).and_then(store.restore)
+    assert restored == Ok([first_file.as_posix()])
+    assert first_file.read_text() == "first"
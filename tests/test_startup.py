@@ -0,0 +1,146 @@
+"""CLI startup time tests."""
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from git import Actor, Repo
+
+import configurator
+
+# Budget for the cumulative import time of the cli module, in microseconds.
+# Importing the heavy dependencies (GitPython, pydantic) takes well over this.
+IMPORT_TIME_BUDGET_US = 150_000
+
+HEAVY_MODULES = ("git", "pydantic", "pydantic_settings", "configurator.installer")
+
+
+def _run_python(
+    code: str,
+    *args: str,
+    env: dict[str, str] | None = None,
+) -> subprocess.CompletedProcess[str]:
+    """Run python code in a fresh interpreter, with configurator importable."""
+    env = {**os.environ, **(env or {})}
+    src_dir = Path(configurator.__file__).parents[1]
+    env["PYTHONPATH"] = os.pathsep.join(
+        [src_dir.as_posix(), env.get("PYTHONPATH", "")],
+    )
+    return subprocess.run(  # noqa: S603
+        [sys.executable, *args, "-c", code],
+        capture_output=True,
+        check=True,
+        encoding="utf-8",
+        env=env,
+    )
+
+
+def _cumulative_import_time(importtime_output: str, module: str) -> int:
+    """Get the cumulative import time of a module from `-X importtime` output."""
+    for line in importtime_output.splitlines():
+        fields = [f.strip() for f in line.removeprefix("import time:").split("|")]
+        if len(fields) == 3 and fields[2] == module:  # noqa: PLR2004
+            return int(fields[1])
+
+    msg = f"{module} not found in import time output"
+    raise AssertionError(msg)
+
+
+@pytest.mark.parametrize("command", [["--help"], ["cache", "--help"]])
+def test_help_does_not_import_heavy_modules(command: list[str]) -> None:
+    """Test that showing help does not import GitPython, pydantic or installers."""
+    code = (
+        "import sys\n"
+        "from configurator.cli import cfg\n"
+        f"cfg({command!r}, standalone_mode=False)\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    result = _run_python(code)
+    assert result.stdout.splitlines()[-1] == ""
+
+
+def _run_main(command: list[str], env: dict[str, str]) -> list[str]:
+    """Run `cfg` through `main`, returning the heavy modules it imported."""
+    code = (
+        "import sys\n"
+        f"sys.argv = ['cfg', *{command!r}]\n"
+        "from configurator.cli import main\n"
+        "try:\n"
+        "    main()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    output = _run_python(code, env={**env, "HWCONFIG_DAEMON": "0"}).stdout
+    return [m for m in output.splitlines()[-1].split(",") if m]
+
+
+@pytest.fixture(name="cli_env")
+def fixture_cli_env(tmp_path: Path) -> dict[str, str]:
+    """Environment for running `cfg` on a committed data repo, on Linux.
+
+    Args:
+        tmp_path: Fixture containing a tmp directory for the home and root dirs.
+
+    Returns:
+        The environment variables to add.
+    """
+    if sys.platform != "linux":
+        pytest.skip("Lists the Linux configs")
+
+    data_repo_dir = tmp_path / "hwconfig" / "data_repo"
+    for name, content in (
+        ("fish/config.fish", "set -x EDITOR vim"),
+        ("hyper/.hyper.js", ""),
+    ):
+        (data_repo_dir / name).parent.mkdir(parents=True, exist_ok=True)
+        (data_repo_dir / name).write_text(content)
+
+    repo = Repo.init(data_repo_dir)
+    repo.index.add(["fish/config.fish", "hyper/.hyper.js"])
+    author = Actor("test", "test@example.com")
+    repo.index.commit("Add configs", author=author, committer=author)
+
+    (tmp_path / "home").mkdir()
+    return {
+        "HOME": (tmp_path / "home").as_posix(),
+        "HWCONFIG_ROOT_DIR": (tmp_path / "hwconfig").as_posix(),
+    }
+
+
+def test_list_does_not_import_heavy_modules(cli_env: dict[str, str]) -> None:
+    """Test that listing the configs imports neither GitPython nor pydantic."""
+    modules = _run_main(["list"], cli_env)
+
+    assert "git" not in modules
+    assert "pydantic" not in modules
+
+
+def test_check_does_not_import_git(cli_env: dict[str, str]) -> None:
+    """Test that checking with a stored manifest does not import GitPython.
+
+    The installer configs are pydantic models, so checking imports pydantic.
+    """
+    # The first run builds the manifest of the data repo
+    assert "git" in _run_main(["check"], cli_env)
+
+    modules = _run_main(["check"], cli_env)
+
+    assert "git" not in modules
+    assert "configurator.installer" in modules
+
+
+def test_cli_import_time_budget() -> None:
+    """Test that importing the cli module stays within the startup budget."""
+    # Take the best of a few runs, to not fail on a single slow run
+    timings = [
+        _cumulative_import_time(
+            _run_python("import configurator.cli", "-X", "importtime").stderr,
+            "configurator.cli",
+        )
+        for _ in range(3)
+    ]
+    assert min(timings) < IMPORT_TIME_BUDGET_US
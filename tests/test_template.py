@@ -0,0 +1,190 @@
+"""Template tests."""
+import json
+from pathlib import Path
+
+import pytest
+from result import Err, Ok
+
+from configurator.installer.config import InstallerConfig, MergeRule
+from configurator.installer.copy import CopyInstaller
+from configurator.installer.json_merge import JsonMergeInstaller
+from configurator.template import Template, TemplateCache, TemplateError
+
+TEMPLATE = """\
+set -x EDITOR {{ env.EDITOR }}
+{% if host.wsl %}
+set -x BROWSER wslview
+{% elif host.name == "work" %}
+set -x BROWSER firefox
+{% else %}
+set -x BROWSER xdg-open
+{% endif %}
+"""
+
+
+@pytest.mark.parametrize(
+    ("variables", "expected"),
+    [
+        ({"host.wsl": True, "host.name": "work"}, "wslview"),
+        ({"host.wsl": False, "host.name": "work"}, "firefox"),
+        ({"host.wsl": False, "host.name": "home"}, "xdg-open"),
+    ],
+)
+def test_render(variables: dict[str, object], expected: str) -> None:
+    """Test rendering substitutions and if blocks."""
+    text = Template(TEMPLATE).render({"env.EDITOR": "vim", **variables})
+    assert text == f"set -x EDITOR vim\nset -x BROWSER {expected}\n"
+
+
+def test_render_conditions() -> None:
+    """Test negated and not equal conditions, and nested blocks."""
+    template = Template(
+        '{% if not host.wsl %}{% if host.name != "work" %}a{% endif %}b{% endif %}',
+    )
+    assert template.names == {"host.wsl", "host.name"}
+    assert template.render({"host.wsl": False, "host.name": "home"}) == "ab"
+    assert template.render({"host.wsl": False, "host.name": "work"}) == "b"
+    assert template.render({"host.wsl": True}) == ""
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "{% if a %}",
+        "{% endif %}",
+        "{% else %}",
+        "{% if a == b %}{% endif %}",
+        "{{ a b }}",
+    ],
+)
+def test_compile_error(text: str) -> None:
+    """Test that invalid syntax fails to compile."""
+    with pytest.raises(TemplateError):
+        Template(text)
+
+
+def test_render_missing_variable() -> None:
+    """Test that substituting a variable that is not set is an error."""
+    with pytest.raises(TemplateError):
+        Template("{{ env.MISSING }}").render({})
+
+
+def test_cache_skips_current_target(tmp_path: Path) -> None:
+    """Test that installs are skipped until the template, variables or target change."""
+    source = tmp_path / "config.tmpl"
+    target = tmp_path / "config"
+    source.write_text("{{ env.EDITOR }}")
+    variables = {"env.EDITOR": "vim", "env.UNUSED": "a"}
+    cache = TemplateCache(variables, file=tmp_path / "templates.json")
+
+    assert cache.install(source, None, target) == Ok(True)  # noqa: FBT003
+    assert target.read_text() == "vim"
+    assert cache.save().is_ok()
+
+    # A new cache loads the records, unused variables do not invalidate them
+    cache = TemplateCache({**variables, "env.UNUSED": "b"}, file=cache.file)
+    assert cache.is_current(source, None, target)
+
+    target.write_text("edited")
+    assert not cache.is_current(source, None, target)
+    assert cache.install(source, None, target) == Ok(True)  # noqa: FBT003
+    assert cache.install(source, None, target) == Ok(False)  # noqa: FBT003
+
+    cache.variables = {"env.EDITOR": "nano"}
+    assert not cache.is_current(source, None, target)
+    assert cache.install(source, None, target) == Ok(True)  # noqa: FBT003
+    assert target.read_text() == "nano"
+
+
+def test_cache_render_error(tmp_path: Path) -> None:
+    """Test that a template that fails to render is an install error."""
+    source = tmp_path / "config.tmpl"
+    source.write_text("{{ env.MISSING }}")
+
+    result = TemplateCache({}).install(source, None, tmp_path / "config")
+
+    assert isinstance(result, Err)
+    assert not (tmp_path / "config").exists()
+
+
+@pytest.fixture(name="template_installer")
+def fixture_template_installer(tmp_path: Path) -> CopyInstaller:
+    """A CopyInstaller with a template and a plain file in its source directory.
+
+    Args:
+        tmp_path: Fixture containing a tmp directory for the source and target.
+
+    Returns:
+        An incremental CopyInstaller rendering templates.
+    """
+    source = tmp_path / "source"
+    (source / "conf.d").mkdir(parents=True)
+    (source / "conf.d" / "env.fish.tmpl").write_text("set -x EDITOR {{ env.EDITOR }}")
+    (source / "config.fish").write_text("plain")
+    (tmp_path / "target").mkdir()
+
+    config = InstallerConfig(
+        name="test",
+        source=source,
+        target=tmp_path / "target",
+        incremental=True,
+    )
+    return CopyInstaller(config, template_cache=TemplateCache({"env.EDITOR": "vim"}))
+
+
+@pytest.mark.parametrize("incremental", [True, False])
+def test_copy_installer_renders_templates(
+    template_installer: CopyInstaller,
+    incremental: bool,  # noqa: FBT001
+) -> None:
+    """Test that templates are rendered to the target without their suffix."""
+    template_installer.config.incremental = incremental
+    target = template_installer.config.target
+
+    assert template_installer.install().is_ok()
+
+    assert (target / "conf.d" / "env.fish").read_text() == "set -x EDITOR vim"
+    assert (target / "config.fish").read_text() == "plain"
+    assert not (target / "conf.d" / "env.fish.tmpl").exists()
+
+    assert template_installer.install().is_ok()
+    assert template_installer.stats.copied == (0 if incremental else 1)
+
+
+def test_copy_installer_check_templates(template_installer: CopyInstaller) -> None:
+    """Test that drift checks compare the target with the rendered template."""
+    template_installer.install()
+    rendered = template_installer.config.target / "conf.d" / "env.fish"
+
+    report = template_installer.check().unwrap()
+    assert not report.missing
+    assert not report.modified
+    assert not report.extra
+
+    rendered.write_text("set -x EDITOR nano")
+    assert template_installer.check().unwrap().modified == ["conf.d/env.fish"]
+
+    rendered.unlink()
+    assert template_installer.check().unwrap().missing == ["conf.d/env.fish"]
+
+
+def test_json_merge_installer_template(tmp_path: Path) -> None:
+    """Test that a merged source file can be rendered from a template."""
+    (tmp_path / "source").mkdir()
+    (tmp_path / "target").mkdir()
+    template = '{"editor": "{{ env.EDITOR }}", "wsl": {{ host.wsl }}}'
+    (tmp_path / "source" / "settings.json.tmpl").write_text(template)
+    config = InstallerConfig(
+        name="test",
+        source=tmp_path / "source",
+        target=tmp_path / "target",
+        merge_file="settings.json",
+        merge_rules=[MergeRule(path="", strategy="shallow")],
+    )
+    cache = TemplateCache({"env.EDITOR": "vim", "host.wsl": False})
+
+    assert JsonMergeInstaller(config).install().is_err()
+    assert JsonMergeInstaller(config, template_cache=cache).install().is_ok()
+
+    data = json.loads((tmp_path / "target" / "settings.json").read_text())
+    assert data == {"editor": "vim", "wsl": False}
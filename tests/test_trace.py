@@ -0,0 +1,78 @@
+"""Trace tests."""
+import json
+from collections.abc import Iterator
+from pathlib import Path
+from threading import Thread
+
+import pytest
+
+from configurator import trace
+
+
+@pytest.fixture(name="tracer")
+def fixture_tracer() -> Iterator[trace.Tracer]:
+    """An active tracer, stopped after the test.
+
+    Yields:
+        The tracer.
+    """
+    tracer = trace.start()
+    yield tracer
+    trace.stop()
+
+
+def test_nested_spans(tracer: trace.Tracer) -> None:
+    """Test that spans record their parent and attributes."""
+    with trace.span("install") as outer, trace.span("installer.run", installer="fish"):
+        trace.set_attrs(files=2, bytes=10)
+
+    inner = tracer.spans[0]
+    assert outer is not None
+    assert inner.parent_id == outer.id
+    assert inner.attrs == {"installer": "fish", "files": 2, "bytes": 10}
+    assert outer.duration_ns >= inner.duration_ns
+
+
+def test_threads_start_new_root(tracer: trace.Tracer) -> None:
+    """Test that spans in other threads do not inherit the current span."""
+
+    def run() -> None:
+        with trace.span("thread"):
+            pass
+
+    with trace.span("install"):
+        thread = Thread(target=run)
+        thread.start()
+        thread.join()
+
+    assert [s.parent_id for s in tracer.spans] == [None, None]
+
+
+def test_chrome_trace(tracer: trace.Tracer) -> None:
+    """Test the Chrome trace event format."""
+    with trace.span("settings.load"):
+        pass
+
+    events = json.loads(tracer.to_chrome_trace())["traceEvents"]
+    assert events[0]["name"] == "settings.load"
+    assert events[0]["ph"] == "X"
+
+
+@pytest.mark.parametrize(("name", "lines"), [("trace.jsonl", 2), ("trace.json", 1)])
+def test_write(tracer: trace.Tracer, tmp_path: Path, name: str, lines: int) -> None:
+    """Test that JSON lines are appended, and a Chrome trace replaces the file."""
+    with trace.span("install"):
+        pass
+
+    tracer.write(tmp_path / name)
+    tracer.write(tmp_path / name)
+
+    assert len((tmp_path / name).read_text().splitlines()) == lines
+
+
+def test_no_tracer() -> None:
+    """Test that spans are not recorded without an active tracer."""
+    with trace.span("install") as span:
+        trace.set_attrs(files=1)
+
+    assert span is None
@@ -0,0 +1,157 @@
+"""Watch mode tests."""
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+from threading import Event, Thread
+
+import pytest
+from result import Ok, Result
+
+from configurator.hashing import HashCache
+from configurator.installer.config import InstallerConfig
+from configurator.installer.copy import CopyInstaller
+from configurator.watch import (
+    InotifyWatcher,
+    PollingWatcher,
+    Watcher,
+    add_watches,
+    group_changes,
+    watch,
+)
+
+linux_only = pytest.mark.skipif(sys.platform != "linux", reason="inotify is Linux only")
+
+
+@pytest.fixture(name="installer")
+def fixture_installer(tmp_path: Path) -> CopyInstaller:
+    """An installed CopyInstaller with a target shared with untracked files.
+
+    Args:
+        tmp_path: Fixture containing a tmp directory for the source and target.
+
+    Returns:
+        The CopyInstaller.
+    """
+    source = tmp_path / "source"
+    target = tmp_path / "target"
+    (source / "functions").mkdir(parents=True)
+    target.mkdir()
+    (source / "config.fish").write_text("set -x EDITOR vim")
+    (source / "functions" / "ll.fish").write_text("function ll; ls -l; end")
+    (target / "fish_history").write_text("- cmd: ls")
+
+    config = InstallerConfig(name="fish", source=source, target=target)
+    installer = CopyInstaller(config, hash_cache=HashCache())
+    installer.install()
+    return installer
+
+
+def wait_for(condition: Callable[[], bool], timeout: float = 5.0) -> bool:
+    """Wait until a condition is true.
+
+    Args:
+        condition: The condition to wait for.
+        timeout: Seconds to wait before giving up.
+
+    Returns:
+        True if the condition became true in time.
+    """
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+
+    return True
+
+
+@linux_only
+def test_inotify_watcher_new_directory(tmp_path: Path) -> None:
+    """Test that files in new subdirectories are watched."""
+    watcher = InotifyWatcher()
+    try:
+        watcher.add(tmp_path, recursive=True)
+        (tmp_path / "conf.d").mkdir()
+        assert tmp_path / "conf.d" in watcher.read(1.0)
+
+        (tmp_path / "conf.d" / "abbr.fish").write_text("abbr -a g git")
+        assert tmp_path / "conf.d" / "abbr.fish" in watcher.read(1.0)
+        assert watcher.read(0.05) == set()
+    finally:
+        watcher.close()
+
+
+def test_polling_watcher(tmp_path: Path) -> None:
+    """Test that the polling watcher reports changed files."""
+    file = tmp_path / "config.fish"
+    file.write_text("set -x EDITOR vim")
+
+    watcher = PollingWatcher(interval=0.01)
+    watcher.add(tmp_path, recursive=True)
+    assert watcher.read(0.05) == set()
+
+    file.write_text("set -x EDITOR nano")
+    assert watcher.read(1.0) == {file}
+
+
+def test_group_changes(installer: CopyInstaller) -> None:
+    """Test that target changes only count for files tracked in the source."""
+    source, target = installer.config.source, installer.config.target
+    changes = group_changes(
+        [installer],
+        [
+            source / "functions",
+            target / "config.fish",
+            target / "fish_history",
+        ],
+    )
+
+    assert changes["fish"].source == {"functions/ll.fish"}
+    assert changes["fish"].target == {"config.fish"}
+
+
+@pytest.mark.parametrize(
+    "make_watcher",
+    [
+        pytest.param(InotifyWatcher, marks=linux_only, id="inotify"),
+        pytest.param(lambda: PollingWatcher(interval=0.02), id="poll"),
+    ],
+)
+def test_watch_syncs_both_ways(
+    installer: CopyInstaller,
+    make_watcher: Callable[[], Watcher],
+) -> None:
+    """Test that source changes are installed and target changes copied back."""
+    source, target = installer.config.source, installer.config.target
+    results: list[tuple[str, Result[str, str]]] = []
+    stop = Event()
+    watcher = make_watcher()
+    # Watch before the thread starts, so the first change is not missed
+    add_watches(watcher, [installer])
+    thread = Thread(
+        target=watch,
+        args=([installer], watcher, lambda n, r: results.append((n, r))),
+        kwargs={"debounce": 0.05, "stop": stop},
+    )
+    thread.start()
+
+    try:
+        (source / "functions" / "ll.fish").write_text("function ll; ls -la; end")
+        assert wait_for(
+            lambda: (
+                (target / "functions" / "ll.fish").read_text()
+                == "function ll; ls -la; end"
+            ),
+        )
+
+        (target / "config.fish").write_text("set -x EDITOR hx")
+        assert wait_for(
+            lambda: (source / "config.fish").read_text() == "set -x EDITOR hx",
+        )
+    finally:
+        stop.set()
+        thread.join()
+        watcher.close()
+
+    assert all(isinstance(r, Ok) for _, r in results)
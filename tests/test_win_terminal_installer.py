@@ -1,8 +1,10 @@
 """Windows Terminal installer tests."""
+import json
 from pathlib import Path
+from unittest.mock import MagicMock
 
 import pytest
-from result import Ok
+from result import Err, Ok
 
 from configurator.installer.config import InstallerConfig
 from configurator.installer.terminal import TerminalInstaller
@@ -46,3 +48,58 @@ def test_install(installer: TerminalInstaller) -> None:
     """Test installing the config files."""
     result = installer.install()
     assert isinstance(result, Ok)
+
+
+def test_install_merges_schemes(installer: TerminalInstaller) -> None:
+    """Test that source schemes replace or extend the target schemes in order."""
+    installer.install()
+
+    target_file = installer.config.target / "settings.json"
+    with target_file.open(encoding="utf-8") as f:
+        names = [s["name"] for s in json.load(f)["schemes"]]
+
+    assert names[:9] == [
+        "Campbell",
+        "Campbell Powershell",
+        "One Half Dark",
+        "One Half Light",
+        "Solarized Dark",
+        "Solarized Light",
+        "Tango Dark",
+        "Tango Light",
+        "Vintage",
+    ]
+    assert names[9:] == [
+        "Dracula",
+        "Monokai Pro",
+        "Monokai Pro (Filter Octagon)",
+        "Monokai Pro (Filter Ristretto)",
+    ]
+
+
+def test_install_twice_skips_write(installer: TerminalInstaller) -> None:
+    """Test that the target file is not rewritten when nothing changed."""
+    target_file = installer.config.target / "settings.json"
+    installer.install()
+    mtime = target_file.stat().st_mtime_ns
+
+    result = installer.install()
+
+    assert result == Ok("test config file already up to date")
+    assert target_file.stat().st_mtime_ns == mtime
+
+
+def test_install_write_fail_keeps_target(
+    monkeypatch: pytest.MonkeyPatch,
+    installer: TerminalInstaller,
+) -> None:
+    """Test that a failed write leaves the target file intact."""
+    target_file = installer.config.target / "settings.json"
+    content = target_file.read_bytes()
+    monkeypatch.setattr("os.fsync", MagicMock(side_effect=OSError("disk full")))
+
+    result = installer.install()
+
+    assert isinstance(result, Err)
+    assert target_file.read_bytes() == content
+    assert list(installer.config.target.iterdir()) == [target_file]